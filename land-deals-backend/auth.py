@@ -0,0 +1,34 @@
+# auth.py - JWT authentication helpers shared by all blueprints
+from functools import wraps
+
+import jwt
+from flask import current_app, jsonify, request
+
+
+# JWT token decorator
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return jsonify({'error': 'Token is missing'}), 401
+        
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            # expose decoded user on request for permission checks
+            try:
+                request.user = {
+                    'id': data.get('user_id'),
+                    'username': data.get('username'),
+                    'role': data.get('role')
+                }
+            except Exception:
+                request.user = {'id': data.get('user_id')}
+            current_user = data['user_id']
+        except:
+            return jsonify({'error': 'Token is invalid'}), 401
+        
+        return f(current_user, *args, **kwargs)
+    return decorated
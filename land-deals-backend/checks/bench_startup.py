@@ -0,0 +1,105 @@
+"""
+Cold-start benchmark: time `import app` in fresh interpreters and record an
+import-time profile (python -X importtime) of the slowest modules.
+
+Usage (from land-deals-backend/):
+    python checks/bench_startup.py                 # 5 runs, top 25 modules
+    python checks/bench_startup.py --runs 10 --top 40 --output startup_profile.json
+
+No database is needed: connections are opened lazily on the first request.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports that must stay off the cold-start path (loaded lazily by the endpoints using them)
+LAZY_MODULES = ['reportlab', 'pypdf', 'requests', 'dotenv', 'numpy']
+
+
+def time_import(module):
+    """Wall-clock seconds for a fresh interpreter to import `module` and exit."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], cwd=BACKEND_DIR, check=True)
+    return time.perf_counter() - start
+
+
+def import_profile(module):
+    """Run `python -X importtime` and return [(cumulative_us, self_us, name)]."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            # drop the separator space; remaining indentation encodes nesting depth
+            rows.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure backend cold-start import time')
+    parser.add_argument('--module', default='app', help='module to import (default: app)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=25, help='number of slowest modules to report')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    # Baseline: bare interpreter start-up, subtracted to isolate the app's share
+    baseline = statistics.median(time_import('sys') for _ in range(args.runs))
+    samples = [time_import(args.module) for _ in range(args.runs)]
+    profile = import_profile(args.module)
+
+    # direct imports of the target module (one indentation level below it)
+    children = [r for r in profile if len(r[2]) - len(r[2].lstrip()) == 2]
+    slowest = sorted(children, reverse=True)[:args.top]
+    loaded = {r[2].strip() for r in profile}
+    eager_heavy = [m for m in LAZY_MODULES if any(n == m or n.startswith(m + '.') for n in loaded)]
+
+    result = {
+        'module': args.module,
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'interpreter_baseline_ms': round(baseline * 1000, 1),
+        'import_median_ms': round(statistics.median(samples) * 1000, 1),
+        'import_min_ms': round(min(samples) * 1000, 1),
+        'import_max_ms': round(max(samples) * 1000, 1),
+        'app_share_ms': round((statistics.median(samples) - baseline) * 1000, 1),
+        'total_import_time_ms': round(sum(r[1] for r in profile) / 1000, 1),
+        'modules_loaded': len(profile),
+        'unexpected_eager_imports': eager_heavy,
+        'slowest_imports': [
+            {'module': name.strip(), 'cumulative_ms': round(cum / 1000, 2), 'self_ms': round(own / 1000, 2)}
+            for cum, own, name in slowest
+        ],
+    }
+
+    print(f"import {args.module}: median {result['import_median_ms']} ms "
+          f"(interpreter {result['interpreter_baseline_ms']} ms, app share {result['app_share_ms']} ms) "
+          f"over {args.runs} runs, {result['modules_loaded']} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for row in result['slowest_imports']:
+        print(f"{row['cumulative_ms']:>14} {row['self_ms']:>9}  {row['module']}")
+    if eager_heavy:
+        print('WARNING: imported at start-up but expected to be lazy:', ', '.join(eager_heavy))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print('Profile written to', args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# coalesce.py - Single-flight coalescing of identical concurrent GET requests
+#
+# Usage: decorate an idempotent view with @coalesced(scope=...). While one
+# request for a given route + query string + authorization scope is running,
+# identical requests wait for it and get a copy of its response instead of
+# running the same queries again. The finished response is also reused for
+# COALESCE_TTL_MS afterwards (0 = only share in-flight executions).
+#
+# scope decides who may share a response: 'user' (default) per user id,
+# 'role' per role - for views whose output doesn't depend on who asks - or
+# 'public'. COALESCE_ENDPOINTS limits coalescing to the listed endpoint
+# names ('all' = every decorated view, '' = off).
+#
+# Not shared: streamed responses, failures (waiters run the view themselves)
+# and clients that just wrote (sticky cookie), which must read their writes.
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+
+import metrics
+from config import env_int
+from db import STICKY_COOKIE
+
+COALESCE_TTL_MS = env_int('COALESCE_TTL_MS', 250)
+COALESCE_WAIT_SECONDS = env_int('COALESCE_WAIT_SECONDS', 30)
+COALESCE_ENDPOINTS = os.environ.get('COALESCE_ENDPOINTS', 'all')
+
+_enabled_endpoints = {e.strip() for e in COALESCE_ENDPOINTS.split(',') if e.strip()}
+
+_lock = threading.Lock()
+_flights = {}   # key -> _Flight
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None      # (body, status, headers) when shareable
+        self.expires = 0.0
+
+
+def _enabled(endpoint):
+    return 'all' in _enabled_endpoints or endpoint in _enabled_endpoints
+
+
+def _key(scope):
+    user = getattr(request, 'user', None) or {}
+    who = {'user': user.get('id'), 'role': user.get('role')}.get(scope, '')
+    args = sorted(request.args.items(multi=True))
+    return (request.endpoint, tuple(sorted((request.view_args or {}).items())), tuple(args), scope, who)
+
+
+def _replay(result, how):
+    body, status, headers = result
+    response = current_app.response_class(body, status=status, headers=headers)
+    response.headers['X-Coalesced'] = how
+    return response
+
+
+def _purge(now):
+    for key in [k for k, f in _flights.items() if f.done.is_set() and f.expires <= now]:
+        del _flights[key]
+
+
+def coalesced(scope='user'):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != 'GET' or not _enabled(request.endpoint) or request.cookies.get(STICKY_COOKIE):
+                return f(*args, **kwargs)
+
+            key = _key(scope)
+            now = time.monotonic()
+            with _lock:
+                flight = _flights.get(key)
+                if flight is not None and flight.done.is_set() and flight.expires <= now:
+                    flight = None
+                leader = flight is None
+                if leader:
+                    flight = _flights[key] = _Flight()
+
+            if not leader:
+                if flight.done.is_set():
+                    if flight.result is not None:
+                        metrics.incr('coalesce.ttl_hits')
+                        metrics.incr('coalesce.saved')
+                        return _replay(flight.result, 'cached')
+                elif flight.done.wait(COALESCE_WAIT_SECONDS) and flight.result is not None:
+                    metrics.incr('coalesce.shared')
+                    metrics.incr('coalesce.saved')
+                    return _replay(flight.result, 'shared')
+                # leader failed, streamed or took too long: run it ourselves
+                return f(*args, **kwargs)
+
+            metrics.incr('coalesce.executions')
+            try:
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code < 400 and not response.is_streamed and not response.direct_passthrough:
+                    headers = [(k, v) for k, v in response.headers.items() if k.lower() != 'content-length']
+                    flight.result = (response.get_data(), response.status_code, headers)
+                return response
+            finally:
+                with _lock:
+                    flight.expires = time.monotonic() + COALESCE_TTL_MS / 1000
+                    flight.done.set()
+                    if flight.result is None or COALESCE_TTL_MS <= 0:
+                        if _flights.get(key) is flight:
+                            del _flights[key]
+                    _purge(time.monotonic())
+        return decorated
+    return decorator
+
+
+def coalesce_stats():
+    with _lock:
+        in_flight = sum(1 for f in _flights.values() if not f.done.is_set())
+        return {'in_flight': in_flight, 'cached': len(_flights) - in_flight, 'ttl_ms': COALESCE_TTL_MS}
+
+
+metrics.register_gauge('coalesce', coalesce_stats)
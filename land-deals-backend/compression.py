@@ -0,0 +1,272 @@
+# compression.py - Accept-Encoding negotiated gzip/brotli response compression
+#
+# Usage: init_compression(app). Buffered responses above COMPRESS_MIN_SIZE are
+# compressed in one shot; streamed (generator based) responses are wrapped and
+# compressed chunk by chunk. Bodies of cacheable responses with an ETag are
+# kept compressed in a small LRU so repeat hits skip the CPU.
+#
+# A compressed body is not byte-identical to the identity one, so its ETag is
+# made weak (W/"..."), as nginx does: a strong ETag shared by both encodings
+# would let caches and range requests mix them up, while If-None-Match, which
+# compares weakly, keeps answering 304 for either.
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+import metrics
+from config import env_int
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Brotli is optional; gzip is always available
+
+COMPRESS_MIN_SIZE = env_int('COMPRESS_MIN_SIZE', 1024)
+COMPRESS_GZIP_LEVEL = env_int('COMPRESS_GZIP_LEVEL', 6)
+COMPRESS_BROTLI_QUALITY = env_int('COMPRESS_BROTLI_QUALITY', 5)
+COMPRESS_CACHE_BYTES = env_int('COMPRESS_CACHE_BYTES', 8 * 1024 * 1024)
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'text/csv',
+    'text/plain',
+    'text/html',
+    'text/css',
+    'application/javascript',
+    'image/svg+xml',
+}
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header value."""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+
+    def quality(enc):
+        if enc in offered:
+            return offered[enc]
+        return offered.get('*', 0.0)
+
+    candidates = []
+    if brotli is not None:
+        candidates.append('br')
+    candidates.append('gzip')
+    best = None
+    best_q = 0.0
+    for enc in candidates:
+        q = quality(enc)
+        # strictly greater keeps server preference order on ties
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def _compress_bytes(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    co = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return co.compress(data) + co.flush()
+
+
+class _StreamEncoder:
+    """Incremental compressor with a common compress()/finish() interface."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._c = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self._c.process(chunk)
+        return self._c.compress(chunk)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._c.finish()
+        return self._c.flush()
+
+
+class CompressedBodyCache:
+    """Byte-bounded LRU of compressed bodies keyed by (validator, encoding)."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._data.get(key)
+            if body is not None:
+                self._data.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._data[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes and self._data:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._data), 'bytes': self._size, 'max_bytes': self.max_bytes}
+
+
+_cache = CompressedBodyCache(COMPRESS_CACHE_BYTES)
+
+
+def _is_cacheable(response):
+    # only an ETag says which body this is; anything else would need a hash of it
+    if request.method != 'GET' or response.status_code != 200 or not response.headers.get('ETag'):
+        return False
+    cc = response.headers.get('Cache-Control', '').lower()
+    return 'no-store' not in cc and 'private' not in cc
+
+
+def _set_encoding(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def _add_vary(response):
+    vary = response.headers.get('Vary')
+    if not vary:
+        response.headers['Vary'] = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower():
+        response.headers['Vary'] = f'{vary}, Accept-Encoding'
+
+
+def _record(encoding, bytes_in, bytes_out, cpu_seconds):
+    metrics.incr(f'compression.{encoding}.responses')
+    metrics.incr(f'compression.{encoding}.bytes_in', bytes_in)
+    metrics.incr(f'compression.{encoding}.bytes_out', bytes_out)
+    metrics.observe(f'compression.{encoding}.cpu_seconds', cpu_seconds)
+
+
+def _stream(chunks, encoding):
+    encoder = _StreamEncoder(encoding)
+    bytes_in = 0
+    bytes_out = 0
+    cpu = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            bytes_in += len(chunk)
+            t0 = time.thread_time()
+            out = encoder.compress(chunk)
+            cpu += time.thread_time() - t0
+            if out:
+                bytes_out += len(out)
+                yield out
+        t0 = time.thread_time()
+        tail = encoder.finish()
+        cpu += time.thread_time() - t0
+        bytes_out += len(tail)
+        yield tail
+        _record(encoding, bytes_in, bytes_out, cpu)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """after_request hook: compress the response body if the client allows it."""
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if request.method == 'HEAD' or 'Content-Encoding' in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    _add_vary(response)
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        if response.direct_passthrough:
+            # send_file() style file wrappers are served as-is
+            return response
+        response.response = _stream(response.response, encoding)
+        _set_encoding(response, encoding)
+        response.headers.pop('Content-Length', None)
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        metrics.incr('compression.skipped_small')
+        return response
+
+    cache_key = None
+    if _is_cacheable(response):
+        cache_key = (request.path, response.headers['ETag'], encoding)
+        body = _cache.get(cache_key)
+        if body is not None:
+            metrics.incr('compression.cache_hits')
+            response.set_data(body)
+            _set_encoding(response, encoding)
+            return response
+        metrics.incr('compression.cache_misses')
+
+    t0 = time.thread_time()
+    body = _compress_bytes(data, encoding)
+    _record(encoding, len(data), len(body), time.thread_time() - t0)
+    if cache_key is not None:
+        _cache.put(cache_key, body)
+
+    response.set_data(body)
+    _set_encoding(response, encoding)
+    return response
+
+
+def compression_stats():
+    """Summary used by /api/metrics: ratio per encoding plus cache usage."""
+    counters = metrics.snapshot()['counters']
+    stats = {'brotli_available': brotli is not None, 'cache': _cache.stats()}
+    for enc in ('gzip', 'br'):
+        bytes_in = counters.get(f'compression.{enc}.bytes_in', 0)
+        bytes_out = counters.get(f'compression.{enc}.bytes_out', 0)
+        stats[enc] = {
+            'responses': counters.get(f'compression.{enc}.responses', 0),
+            'ratio': round(bytes_out / bytes_in, 4) if bytes_in else None,
+        }
+    return stats
+
+
+def init_compression(app):
+    app.after_request(compress_response)
+    metrics.register_gauge('compression', compression_stats)
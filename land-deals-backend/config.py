@@ -0,0 +1,47 @@
+# config.py - Environment loading shared by the app and the production server config
+import os
+
+
+# Load environment variables from .env file if it exists
+def load_env_file():
+    """Load environment variables from .env file"""
+    env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    os.environ[key.strip()] = value.strip()
+
+
+def env_int(name, default):
+    """Read an integer setting, falling back to `default` when unset or invalid."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Ignoring invalid integer for {name}: {value!r}")
+        return default
+
+
+def env_float(name, default):
+    """Read a float setting, falling back to `default` when unset or invalid."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Ignoring invalid number for {name}: {value!r}")
+        return default
+
+
+def env_bool(name, default):
+    """Read a boolean setting (1/true/yes/on)."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
@@ -0,0 +1,231 @@
+# dashboard/aggregates.py - Maintain the aggregate tables behind /api/dashboard and /api/cashflow
+#
+# dashboard_deal_totals holds one row of money totals per deal and
+# dashboard_deal_payments the payments per deal by mode/type/status (see
+# migrations/20261019_dashboard_aggregates.sql). The dashboard only groups
+# these small tables, so it costs the same however much history there is.
+#
+# cashflow_daily (migrations/20261019_cashflow_daily.sql) rolls settled
+# payments, expenses and payment_parties shares up to one row per deal, day
+# and mode/type/role, which /api/cashflow re-buckets by week/month/quarter.
+#
+# They are kept current two ways:
+#   - refresh_deal() after a successful write to a deal (see routes.py), and
+#   - refresh_all() once the last full rebuild is older than
+#     DASHBOARD_REFRESH_SECONDS, which also picks up writes that don't name a
+#     deal (investor or party edits, new deals). A MySQL named lock makes sure
+#     only one worker rebuilds at a time.
+#
+# Rebuild by hand / from cron:  python -m dashboard.aggregates
+import sys
+import time
+
+import mysql.connector
+
+import metrics
+from config import env_int
+
+DASHBOARD_REFRESH_SECONDS = env_int('DASHBOARD_REFRESH_SECONDS', 300)
+
+_LOCK_NAME = 'land_deals_dashboard_refresh'
+
+_optional_columns = None   # columns added by later migrations that exist here
+
+
+def _columns(cursor):
+    """{'payments.payment_type', 'payments.status', 'payment_parties.role', ...} present here."""
+    global _optional_columns
+    if _optional_columns is None:
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ('payments', 'payment_parties')
+        """)
+        _optional_columns = {
+            '.'.join(row if not isinstance(row, dict) else (row['TABLE_NAME'], row['COLUMN_NAME']))
+            for row in cursor.fetchall()
+        }
+    return _optional_columns
+
+
+def _statements(cursor, deal_filter):
+    """(totals, payments) INSERT ... SELECT statements, optionally for one deal."""
+    cols = _columns(cursor)
+    payment_type = "p.payment_type" if 'payments.payment_type' in cols else "NULL"
+    status = "p.status" if 'payments.status' in cols else "NULL"
+    where_deal = "WHERE d.id = %s" if deal_filter else ""
+    where_child = "WHERE deal_id = %s" if deal_filter else ""
+
+    totals = f"""
+        INSERT INTO dashboard_deal_totals
+            (deal_id, project_name, status, state, district, purchase_amount, selling_amount,
+             invested_amount, investor_count, expenses_amount, payments_amount, payment_count,
+             pending_amount, overdue_amount, land_purchase_paid, last_payment_date)
+        SELECT d.id, d.project_name, COALESCE(d.status, ''), COALESCE(d.state, ''), COALESCE(d.district, ''),
+               COALESCE(d.purchase_amount, 0), COALESCE(d.selling_amount, 0),
+               COALESCE(i.invested, 0), COALESCE(i.investors, 0), COALESCE(e.expenses, 0),
+               COALESCE(p.total, 0), COALESCE(p.payments, 0), COALESCE(p.pending, 0), COALESCE(p.overdue, 0),
+               COALESCE(p.land_purchase, 0), p.last_date
+        FROM deals d
+        LEFT JOIN (SELECT deal_id, SUM(investment_amount) AS invested, COUNT(*) AS investors
+                   FROM investors {where_child} GROUP BY deal_id) i ON i.deal_id = d.id
+        LEFT JOIN (SELECT deal_id, SUM(amount) AS expenses
+                   FROM expenses {where_child} GROUP BY deal_id) e ON e.deal_id = d.id
+        LEFT JOIN (SELECT p.deal_id, SUM(p.amount) AS total, COUNT(*) AS payments,
+                          SUM(CASE WHEN {status} = 'pending' THEN p.amount ELSE 0 END) AS pending,
+                          SUM(CASE WHEN {status} = 'overdue' THEN p.amount ELSE 0 END) AS overdue,
+                          SUM(CASE WHEN {payment_type} = 'land_purchase' AND COALESCE({status}, 'paid') = 'paid'
+                                   THEN p.amount ELSE 0 END) AS land_purchase,
+                          MAX(p.payment_date) AS last_date
+                   FROM payments p {where_child.replace('deal_id', 'p.deal_id')} GROUP BY p.deal_id) p ON p.deal_id = d.id
+        {where_deal}
+    """
+    payments = f"""
+        INSERT INTO dashboard_deal_payments
+            (deal_id, payment_mode, payment_type, payment_status, payment_count, amount)
+        SELECT p.deal_id, COALESCE(p.payment_mode, ''), COALESCE({payment_type}, ''), COALESCE({status}, ''),
+               COUNT(*), SUM(p.amount)
+        FROM payments p
+        JOIN deals d ON d.id = p.deal_id
+        {where_deal}
+        GROUP BY 1, 2, 3, 4
+    """
+    return totals, payments
+
+
+def _cashflow_statements(cursor, deal_filter):
+    """INSERT ... SELECT statements filling cashflow_daily, optionally for one deal.
+
+    Only money that moved counts: payments marked pending/overdue are left
+    out, and expenses without an expense_date can't be placed on a day.
+    """
+    cols = _columns(cursor)
+    payment_type = "p.payment_type" if 'payments.payment_type' in cols else "NULL"
+    settled = "COALESCE(p.status, 'paid') = 'paid'" if 'payments.status' in cols else "1 = 1"
+    deal = "AND p.deal_id = %s" if deal_filter else ""
+    statements = [
+        f"""
+        INSERT INTO cashflow_daily (deal_id, day, source, payment_mode, payment_type, party_role, entry_count, amount)
+        SELECT p.deal_id, p.payment_date, 'payment', COALESCE(p.payment_mode, ''), COALESCE({payment_type}, ''), '',
+               COUNT(*), SUM(p.amount)
+        FROM payments p
+        WHERE {settled} {deal}
+        GROUP BY 1, 2, 3, 4, 5, 6
+        """,
+        f"""
+        INSERT INTO cashflow_daily (deal_id, day, source, payment_mode, payment_type, party_role, entry_count, amount)
+        SELECT e.deal_id, e.expense_date, 'expense', '', COALESCE(e.expense_type, ''), '', COUNT(*), SUM(e.amount)
+        FROM expenses e
+        WHERE e.expense_date IS NOT NULL AND e.amount IS NOT NULL {deal.replace('p.', 'e.')}
+        GROUP BY 1, 2, 3, 4, 5, 6
+        """,
+    ]
+    if 'payment_parties.role' in cols:
+        # each party's share: its own amount, else its percentage of the payment
+        statements.append(f"""
+        INSERT INTO cashflow_daily (deal_id, day, source, payment_mode, payment_type, party_role, entry_count, amount)
+        SELECT p.deal_id, p.payment_date, 'party', COALESCE(p.payment_mode, ''), COALESCE({payment_type}, ''),
+               pp.role, COUNT(*), SUM(COALESCE(pp.amount, p.amount * pp.percentage / 100, p.amount))
+        FROM payment_parties pp
+        JOIN payments p ON p.id = pp.payment_id
+        WHERE pp.role IS NOT NULL AND {settled} {deal}
+        GROUP BY 1, 2, 3, 4, 5, 6
+        """)
+    return statements
+
+
+def refresh_deal(conn, deal_id):
+    """Recompute one deal's rows (removing them if the deal is gone) and commit."""
+    cursor = conn.cursor()
+    try:
+        totals, payments = _statements(cursor, deal_filter=True)
+        cursor.execute("DELETE FROM dashboard_deal_totals WHERE deal_id = %s", (deal_id,))
+        cursor.execute("DELETE FROM dashboard_deal_payments WHERE deal_id = %s", (deal_id,))
+        cursor.execute(totals, (deal_id, deal_id, deal_id, deal_id))
+        cursor.execute(payments, (deal_id,))
+        cursor.execute("DELETE FROM cashflow_daily WHERE deal_id = %s", (deal_id,))
+        for statement in _cashflow_statements(cursor, deal_filter=True):
+            cursor.execute(statement, (deal_id,))
+        conn.commit()
+        metrics.incr('dashboard.deal_refreshes')
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def refresh_all(conn):
+    """Rebuild all aggregate tables in one transaction. False if another worker is already at it."""
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (_LOCK_NAME,))
+        if not cursor.fetchone()[0]:
+            return False
+        try:
+            totals, payments = _statements(cursor, deal_filter=False)
+            # readers keep seeing the previous rows until the commit
+            cursor.execute("DELETE FROM dashboard_deal_totals")
+            cursor.execute("DELETE FROM dashboard_deal_payments")
+            cursor.execute(totals)
+            deal_count = cursor.rowcount
+            cursor.execute(payments)
+            cursor.execute("DELETE FROM cashflow_daily")
+            for statement in _cashflow_statements(cursor, deal_filter=False):
+                cursor.execute(statement)
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            cursor.execute("""
+                INSERT INTO dashboard_refresh_state (id, refreshed_at, duration_ms, deal_count)
+                VALUES (1, CURRENT_TIMESTAMP, %s, %s)
+                ON DUPLICATE KEY UPDATE refreshed_at = VALUES(refreshed_at),
+                    duration_ms = VALUES(duration_ms), deal_count = VALUES(deal_count)
+            """, (duration_ms, deal_count))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+            cursor.fetchone()
+        metrics.observe('dashboard.refresh_seconds', time.perf_counter() - started)
+        return True
+    finally:
+        cursor.close()
+
+
+def refresh_age(cursor):
+    """Seconds since the last full rebuild, or None if there never was one."""
+    cursor.execute("""
+        SELECT TIMESTAMPDIFF(SECOND, refreshed_at, CURRENT_TIMESTAMP) AS age
+        FROM dashboard_refresh_state WHERE id = 1
+    """)
+    row = cursor.fetchone()
+    if not row:
+        return None
+    age = row['age'] if isinstance(row, dict) else row[0]
+    return None if age is None else int(age)
+
+
+def main():
+    from config import load_env_file
+    load_env_file()
+    from db import get_db_connection
+    conn = get_db_connection()
+    if conn is None:
+        print('Database connection failed')
+        return 1
+    try:
+        if refresh_all(conn):
+            print('Dashboard aggregates rebuilt')
+        else:
+            print('Another process is rebuilding the dashboard aggregates')
+        return 0
+    except mysql.connector.Error as e:
+        print(f'Dashboard refresh failed: {e}')
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
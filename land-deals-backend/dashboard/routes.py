@@ -0,0 +1,284 @@
+# dashboard/routes.py - Portfolio dashboard and cash-flow series served from the aggregate tables
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import mysql.connector
+from flask import Blueprint, g, jsonify, request
+
+import metrics
+from auth import token_required
+from dashboard import aggregates
+from db import get_db, get_db_connection, read_only, written_deals
+
+bp = Blueprint('dashboard', __name__)
+
+_rebuild_lock = threading.Lock()
+_tables_missing = False   # migration not applied yet: skip the write hook quietly
+
+_MONEY_COLUMNS = ['purchase_amount', 'selling_amount', 'invested_amount', 'expenses_amount',
+                  'payments_amount', 'pending_amount', 'overdue_amount']
+
+
+def _num(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _rows(cursor):
+    return [{k: _num(v) for k, v in row.items()} for row in cursor.fetchall()]
+
+
+def _rebuild():
+    conn = get_db_connection()
+    if conn is None:
+        return
+    try:
+        aggregates.refresh_all(conn)
+    except Exception as e:
+        print(f"Dashboard refresh failed: {e}")
+        metrics.incr('dashboard.refresh_failures')
+    finally:
+        conn.close()
+
+
+def _rebuild_in_background():
+    # one rebuild thread per process; GET_LOCK keeps the workers from overlapping
+    if not _rebuild_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            _rebuild()
+        finally:
+            _rebuild_lock.release()
+
+    threading.Thread(target=run, name='dashboard-refresh', daemon=True).start()
+
+
+def _grouped(cursor, group_by):
+    sums = ', '.join(f'SUM({c}) AS {c}' for c in _MONEY_COLUMNS)
+    cursor.execute(f"""
+        SELECT {group_by}, COUNT(*) AS deals, {sums}
+        FROM dashboard_deal_totals
+        GROUP BY {group_by}
+        ORDER BY SUM(purchase_amount) DESC
+    """)
+    return _rows(cursor)
+
+
+def _payments_by(cursor, column):
+    cursor.execute(f"""
+        SELECT {column}, SUM(payment_count) AS payments, SUM(amount) AS amount
+        FROM dashboard_deal_payments
+        GROUP BY {column}
+        ORDER BY SUM(amount) DESC
+    """)
+    return _rows(cursor)
+
+
+@bp.route('/api/dashboard', methods=['GET'])
+@token_required
+@read_only
+def get_dashboard(current_user):
+    """Portfolio totals by status, state and district, payment breakdowns,
+    outstanding balances and recent activity in one response."""
+    try:
+        cursor = get_db().cursor(dictionary=True)
+
+        age = aggregates.refresh_age(cursor)
+        if age is None:
+            # first use: build in the background rather than hold this request
+            # (and a worker thread) for a full rebuild
+            _rebuild_in_background()
+            cursor.close()
+            response = jsonify({'error': 'Dashboard is being prepared, retry shortly', 'building': True})
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+        if age >= aggregates.DASHBOARD_REFRESH_SECONDS:
+            _rebuild_in_background()
+
+        sums = ', '.join(f'SUM({c}) AS {c}' for c in _MONEY_COLUMNS)
+        cursor.execute(f"""
+            SELECT COUNT(*) AS deals, {sums}, SUM(investor_count) AS investors,
+                   SUM(payment_count) AS payments,
+                   SUM(GREATEST(purchase_amount - land_purchase_paid, 0)) AS purchase_outstanding,
+                   SUM(CASE WHEN selling_amount > 0 AND purchase_amount > 0
+                            THEN selling_amount - purchase_amount - expenses_amount ELSE 0 END) AS expected_profit
+            FROM dashboard_deal_totals
+        """)
+        totals = {k: _num(v) if v is not None else 0 for k, v in cursor.fetchone().items()}
+
+        by_status = _grouped(cursor, 'status')
+        by_state = _grouped(cursor, 'state')
+        by_district = _grouped(cursor, 'state, district')
+
+        # deals with money still due, largest first
+        cursor.execute("""
+            SELECT deal_id, project_name, status, pending_amount, overdue_amount,
+                   GREATEST(purchase_amount - land_purchase_paid, 0) AS purchase_outstanding
+            FROM dashboard_deal_totals
+            WHERE pending_amount > 0 OR overdue_amount > 0 OR purchase_amount > land_purchase_paid
+            ORDER BY overdue_amount DESC, pending_amount + GREATEST(purchase_amount - land_purchase_paid, 0) DESC
+            LIMIT 10
+        """)
+        outstanding = _rows(cursor)
+
+        payments_by_mode = _payments_by(cursor, 'payment_mode')
+        payments_by_type = _payments_by(cursor, 'payment_type')
+        payments_by_status = _payments_by(cursor, 'payment_status')
+
+        # recent activity is read live; newest rows by primary key are cheap
+        limit = min(max(request.args.get('recent', 10, type=int), 1), 50)
+        cursor.execute("""
+            SELECT p.id, p.deal_id, d.project_name, p.amount, p.payment_date, p.payment_mode, p.created_at
+            FROM payments p LEFT JOIN deals d ON d.id = p.deal_id
+            ORDER BY p.id DESC LIMIT %s
+        """, (limit,))
+        recent_payments = _rows(cursor)
+        cursor.execute("""
+            SELECT id, project_name, status, state, district, created_at
+            FROM deals ORDER BY id DESC LIMIT %s
+        """, (limit,))
+        recent_deals = _rows(cursor)
+        cursor.close()
+
+        return jsonify({
+            'totals': totals,
+            'by_status': by_status,
+            'by_state': by_state,
+            'by_district': by_district,
+            'outstanding': outstanding,
+            'payments_by_mode': payments_by_mode,
+            'payments_by_type': payments_by_type,
+            'payments_by_status': payments_by_status,
+            'recent_activity': {'payments': recent_payments, 'deals': recent_deals},
+            'aggregates_age_seconds': age,
+            'aggregates_stale': age >= aggregates.DASHBOARD_REFRESH_SECONDS,
+        })
+    except mysql.connector.Error as e:
+        if e.errno == 1146:
+            return jsonify({'error': 'Dashboard tables missing: run migrations/20261019_dashboard_aggregates.sql'}), 500
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.after_app_request
+def refresh_written_deal(response):
+    """Keep the written deals' aggregate rows current after a successful write."""
+    global _tables_missing
+    if (_tables_missing or request.method in ('GET', 'HEAD', 'OPTIONS')
+            or response.status_code >= 400 or 'db_conn' not in g or g.get('db_replica')):
+        return response
+    deal_ids = written_deals()
+    conn = g.db_conn
+    if not deal_ids or conn is None or conn.in_transaction:
+        # nothing written, or the handler left work uncommitted; don't commit it on its behalf
+        return response
+    for deal_id in deal_ids:
+        try:
+            aggregates.refresh_deal(conn, deal_id)
+        except mysql.connector.Error as e:
+            print(f"Dashboard refresh for deal {deal_id} failed: {e}")
+            if e.errno == 1146:
+                _tables_missing = True
+                break
+    return response
+
+
+# Period start for each bucket size, computed from the daily rollup
+_BUCKETS = {
+    'day': "day",
+    'week': "DATE_SUB(day, INTERVAL WEEKDAY(day) DAY)",                        # Monday
+    'month': "DATE_SUB(day, INTERVAL DAYOFMONTH(day) - 1 DAY)",
+    'quarter': "MAKEDATE(YEAR(day), 1) + INTERVAL QUARTER(day) - 1 QUARTER",
+}
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+@bp.route('/api/cashflow', methods=['GET'])
+@token_required
+@read_only
+def get_cashflow(current_user):
+    """Payments and expenses per day/week/month/quarter, split by payment mode,
+    payment type and party role, for one deal (?deal_id=) or the portfolio.
+
+    Query: bucket=day|week|month|quarter (default month), from/to=YYYY-MM-DD.
+    """
+    bucket = request.args.get('bucket', 'month')
+    if bucket not in _BUCKETS:
+        return jsonify({'error': f"bucket must be one of {', '.join(_BUCKETS)}"}), 400
+    try:
+        start = _parse_date(request.args.get('from'))
+        end = _parse_date(request.args.get('to'))
+    except ValueError:
+        return jsonify({'error': 'from/to must be YYYY-MM-DD'}), 400
+    deal_id = request.args.get('deal_id', type=int)
+
+    filters, params = [], []
+    if deal_id:
+        filters.append("deal_id = %s")
+        params.append(deal_id)
+    if start:
+        filters.append("day >= %s")
+        params.append(start)
+    if end:
+        filters.append("day <= %s")
+        params.append(end)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    try:
+        cursor = get_db().cursor(dictionary=True)
+        cursor.execute(f"""
+            SELECT {_BUCKETS[bucket]} AS period, source, payment_mode, payment_type, party_role,
+                   SUM(entry_count) AS entries, SUM(amount) AS amount
+            FROM cashflow_daily
+            {where}
+            GROUP BY 1, 2, 3, 4, 5
+            ORDER BY 1
+        """, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    except mysql.connector.Error as e:
+        if e.errno == 1146:
+            return jsonify({'error': 'Cash-flow table missing: run migrations/20261019_cashflow_daily.sql'}), 500
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    series = {}
+    for row in rows:
+        period = row['period'].isoformat() if hasattr(row['period'], 'isoformat') else str(row['period'])
+        point = series.get(period)
+        if point is None:
+            point = series[period] = {
+                'period': period, 'payments': 0.0, 'payment_count': 0, 'expenses': 0.0, 'expense_count': 0,
+                'by_mode': {}, 'by_type': {}, 'expenses_by_type': {}, 'by_role': {},
+            }
+        amount = float(row['amount'] or 0)
+        if row['source'] == 'payment':
+            point['payments'] += amount
+            point['payment_count'] += int(row['entries'])
+            mode = row['payment_mode'] or 'unspecified'
+            kind = row['payment_type'] or 'unspecified'
+            point['by_mode'][mode] = point['by_mode'].get(mode, 0.0) + amount
+            point['by_type'][kind] = point['by_type'].get(kind, 0.0) + amount
+        elif row['source'] == 'expense':
+            point['expenses'] += amount
+            point['expense_count'] += int(row['entries'])
+            kind = row['payment_type'] or 'unspecified'
+            point['expenses_by_type'][kind] = point['expenses_by_type'].get(kind, 0.0) + amount
+        else:
+            point['by_role'][row['party_role']] = point['by_role'].get(row['party_role'], 0.0) + amount
+
+    return jsonify({
+        'bucket': bucket,
+        'deal_id': deal_id,
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'series': list(series.values()),
+    })
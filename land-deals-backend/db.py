@@ -0,0 +1,546 @@
+# db.py - Database configuration, connection pools and read-replica routing
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import mysql.connector
+from flask import g, has_app_context, jsonify, request, stream_with_context
+from mysql.connector import pooling
+
+import metrics
+from config import env_int, env_bool
+
+# Database configuration (primary). The DB_* overrides exist mainly for
+# running against local instances; the defaults are the production server.
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'mysql-3ca7d4a2-romitmeher-d46c.g.aivencloud.com'),
+    'port': env_int('DB_PORT', 17231),
+    'user': os.environ.get('DB_USER', 'avnadmin'),
+    'password': os.environ.get('DB_PASSWORD', 'YOUR_DB_PASSWORD_HERE'),
+    'database': os.environ.get('DB_NAME', 'land_deals_db'),
+    'ssl_ca': os.path.join(os.path.dirname(__file__), 'ca-certificate.pem'),
+    'ssl_verify_cert': True,
+    'ssl_verify_identity': True,
+    # Fail fast instead of tying a worker thread up in TCP timeouts (seconds; 0 = no limit)
+    'connection_timeout': env_int('DB_CONNECT_TIMEOUT', 5),
+    'read_timeout': env_int('DB_READ_TIMEOUT', 30) or None,
+    'write_timeout': env_int('DB_WRITE_TIMEOUT', 30) or None,
+}
+if not env_bool('DB_SSL', True):
+    for _key in ('ssl_ca', 'ssl_verify_cert', 'ssl_verify_identity'):
+        DB_CONFIG.pop(_key)
+
+# Connections per worker process. The production server sizes its thread
+# count from this (see gunicorn.conf.py); 0 disables pooling.
+DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+
+# Read replicas: comma separated "host[:port]" entries sharing the primary's
+# credentials. The replica user needs REPLICATION CLIENT for the lag check.
+DB_REPLICAS = [e.strip() for e in os.environ.get('DB_REPLICAS', '').split(',') if e.strip()]
+DB_REPLICA_MAX_LAG = env_int('DB_REPLICA_MAX_LAG', 5)                 # seconds behind the primary
+DB_REPLICA_CHECK_INTERVAL = env_int('DB_REPLICA_CHECK_INTERVAL', 5)   # seconds between lag checks
+DB_REPLICA_RETRY_AFTER = env_int('DB_REPLICA_RETRY_AFTER', 30)        # seconds a failed replica is skipped
+# After a write, the writer's reads stay on the primary this long (read-your-writes)
+DB_STICKY_SECONDS = env_int('DB_STICKY_SECONDS', 10)
+STICKY_COOKIE = 'db_primary'
+
+# Connection acquisition: transient failures are retried with jittered
+# exponential backoff; after DB_BREAKER_THRESHOLD consecutive failed
+# acquisitions the breaker opens and requests fail fast with 503 for
+# DB_BREAKER_RESET seconds, after which a single trial request probes the DB.
+DB_CONNECT_RETRIES = env_int('DB_CONNECT_RETRIES', 2)
+DB_RETRY_BACKOFF_MS = env_int('DB_RETRY_BACKOFF_MS', 100)
+DB_BREAKER_THRESHOLD = env_int('DB_BREAKER_THRESHOLD', 5)
+DB_BREAKER_RESET = env_int('DB_BREAKER_RESET', 30)
+
+# Too many connections, can't connect, server gone away, lost connection
+_TRANSIENT_ERRNOS = {1040, 1203, 2003, 2006, 2013, 2055}
+
+
+class DatabaseUnavailable(Exception):
+    """The primary database can't be reached, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    closed -> open after `threshold` failures in a row; open -> half_open once
+    `reset_after` seconds have passed, letting one trial call through; the
+    trial's outcome closes or re-opens it. A threshold of 0 disables it.
+    """
+
+    def __init__(self, name, threshold, reset_after):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if self.threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = 'half_open'
+                self._trial_running = False
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                metrics.incr(f'{self.name}.closed')
+                print(f"{self.name}: closed")
+            self.state = 'closed'
+            self.failures = 0
+            self.last_error = None
+            self._trial_running = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.threshold > 0 and (self.state == 'half_open' or self.failures >= self.threshold):
+                if self.state != 'open':
+                    metrics.incr(f'{self.name}.opened')
+                    print(f"{self.name}: open for {self.reset_after}s after {self.failures} failures: {error}")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self._trial_running = False
+
+    def retry_after(self):
+        """Seconds until the next trial is allowed (0 when not open)."""
+        if self.state != 'open':
+            return 0
+        return max(0, int(self.reset_after - (time.monotonic() - self.opened_at)) + 1)
+
+    def status(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'retry_after_seconds': self.retry_after(),
+            'last_error': self.last_error,
+        }
+
+
+db_breaker = CircuitBreaker('db.breaker', DB_BREAKER_THRESHOLD, DB_BREAKER_RESET)
+
+_db_pools = {}
+_db_pool_pid = None
+_db_pool_lock = threading.Lock()
+
+
+def _get_db_pool(name='primary', config=None):
+    """Return this process's pool for `name`, creating it on first use.
+
+    Pools are keyed by pid so a pool inherited through fork() (preloaded app)
+    is never shared between worker processes.
+    """
+    global _db_pool_pid
+    pid = os.getpid()
+    pool = _db_pools.get(name) if _db_pool_pid == pid else None
+    if pool is None:
+        with _db_pool_lock:
+            if _db_pool_pid != pid:
+                _db_pools.clear()
+                _db_pool_pid = pid
+            pool = _db_pools.get(name)
+            if pool is None:
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f'land_deals_{name}_{pid}',
+                    pool_size=min(DB_POOL_SIZE, pooling.CNX_POOL_MAXSIZE),
+                    pool_reset_session=True,
+                    **(config or DB_CONFIG)
+                )
+                _db_pools[name] = pool
+    return pool
+
+
+def close_db_pool():
+    """Drop this process's pools (used on worker shutdown)."""
+    global _db_pool_pid
+    with _db_pool_lock:
+        _db_pools.clear()
+        _db_pool_pid = None
+
+
+def _connect(name, config):
+    """Pooled connection to `config`, or a dedicated one when the pool is exhausted."""
+    if DB_POOL_SIZE > 0:
+        try:
+            return _get_db_pool(name, config).get_connection()
+        except pooling.PoolError:
+            # pool exhausted: serve this request with a dedicated connection
+            metrics.incr('db.pool_exhausted')
+    return mysql.connector.connect(**config)
+
+
+def _connect_primary():
+    """Connection to the primary through the breaker, retrying transient errors.
+
+    Raises DatabaseUnavailable when the breaker is open or every attempt failed.
+    """
+    if not db_breaker.allow():
+        metrics.incr('db.breaker.rejected')
+        raise DatabaseUnavailable(f'database unavailable (circuit open): {db_breaker.last_error}')
+    for attempt in range(DB_CONNECT_RETRIES + 1):
+        try:
+            conn = _connect('primary', DB_CONFIG)
+        except mysql.connector.Error as err:
+            if err.errno not in _TRANSIENT_ERRNOS or attempt == DB_CONNECT_RETRIES:
+                metrics.incr('db.connect_failures')
+                db_breaker.record_failure(err)
+                raise DatabaseUnavailable(str(err)) from err
+            metrics.incr('db.connect_retries')
+            # full jitter: spread retries from concurrent requests apart
+            time.sleep(random.uniform(0, DB_RETRY_BACKOFF_MS * 2 ** attempt) / 1000)
+        except Exception as err:
+            db_breaker.record_failure(err)
+            raise
+        else:
+            db_breaker.record_success()
+            return conn
+
+
+# Database connection function
+def get_db_connection():
+    try:
+        return _connect_primary()
+    except DatabaseUnavailable as err:
+        print(f"Database error: {err}")
+        return None
+
+
+class _Replica:
+    def __init__(self, index, entry):
+        host, _, port = entry.partition(':')
+        self.name = f'replica{index}'
+        self.config = dict(DB_CONFIG, host=host, port=int(port) if port else DB_CONFIG['port'])
+        self.down_until = 0.0
+        self.checked_at = 0.0
+        self.lag = None
+        self.error = None
+
+    def mark_down(self, reason, seconds):
+        self.down_until = time.monotonic() + seconds
+        self.error = str(reason)
+        metrics.incr(f'db.{self.name}.down')
+        print(f"Read replica {self.name} ({self.config['host']}) skipped for {seconds}s: {reason}")
+
+
+_replicas = [_Replica(i, entry) for i, entry in enumerate(DB_REPLICAS)]
+_replica_turn = itertools.count()
+_recent_writers = {}
+
+
+def _replica_lag(conn):
+    """Seconds the replica is behind its source; None when it is not replicating."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except mysql.connector.Error:
+            cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row:
+        return None
+    return row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+
+
+def _replica_connection():
+    """Connection to the next healthy replica in rotation, or (None, None).
+
+    Lag is re-checked on the acquired connection every
+    DB_REPLICA_CHECK_INTERVAL seconds; a replica that is unreachable, not
+    replicating or too far behind is skipped until it is due again.
+    """
+    if not _replicas:
+        return None, None
+    start = next(_replica_turn) % len(_replicas)
+    for replica in _replicas[start:] + _replicas[:start]:
+        now = time.monotonic()
+        if replica.down_until > now:
+            continue
+        try:
+            conn = _connect(replica.name, replica.config)
+        except mysql.connector.Error as err:
+            replica.mark_down(err, DB_REPLICA_RETRY_AFTER)
+            continue
+        if now - replica.checked_at >= DB_REPLICA_CHECK_INTERVAL:
+            try:
+                lag = _replica_lag(conn)
+            except mysql.connector.Error as err:
+                _release(conn)
+                replica.mark_down(err, DB_REPLICA_RETRY_AFTER)
+                continue
+            replica.checked_at = now
+            replica.lag = lag
+            if lag is None or lag > DB_REPLICA_MAX_LAG:
+                _release(conn)
+                replica.mark_down('not replicating' if lag is None else f'{lag}s behind',
+                                  DB_REPLICA_CHECK_INTERVAL)
+                continue
+            replica.error = None
+        return replica, conn
+    return None, None
+
+
+def max_replica_lag():
+    """Largest lag across the configured replicas, measured now; None without replicas.
+
+    Replicas that can't be reached or aren't replicating are left out (and
+    reported), so one broken replica doesn't stall callers that throttle on this.
+    """
+    lags = []
+    for replica in _replicas:
+        try:
+            conn = _connect(replica.name, replica.config)
+        except mysql.connector.Error as err:
+            print(f"Lag check on {replica.name} failed: {err}")
+            continue
+        try:
+            lag = _replica_lag(conn)
+        except mysql.connector.Error as err:
+            print(f"Lag check on {replica.name} failed: {err}")
+            lag = None
+        finally:
+            _release(conn)
+        replica.lag = lag
+        if lag is not None:
+            lags.append(lag)
+    return max(lags) if lags else None
+
+
+def replica_status():
+    """Health of each configured read replica (for /api/status and /api/metrics)."""
+    now = time.monotonic()
+    return [{
+        'name': r.name,
+        'host': f"{r.config['host']}:{r.config['port']}",
+        'healthy': r.down_until <= now,
+        'lag_seconds': r.lag,
+        'error': r.error,
+    } for r in _replicas]
+
+
+def _request_user_id():
+    user = getattr(request, 'user', None) or {}
+    return user.get('id')
+
+
+def _sticky_to_primary():
+    """True when this client wrote recently and must read its own writes."""
+    if request.cookies.get(STICKY_COOKIE):
+        return True
+    user_id = _request_user_id()
+    return user_id is not None and _recent_writers.get(user_id, 0) > time.monotonic()
+
+
+def read_only(f):
+    """Mark a handler as read-only so get_db() may serve it from a replica.
+
+    Place it below @token_required so the caller is known when routing.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.db_read_only = True
+        return f(*args, **kwargs)
+    return decorated
+
+
+def get_db():
+    """Connection for the current request.
+
+    Acquired lazily on first use, stored on flask.g and shared by everything
+    that runs during the request (handlers, helpers, hooks); released in
+    teardown by release_db(). Handlers must not close it themselves. Handlers
+    marked @read_only get a healthy replica when one is configured, unless
+    the caller wrote within DB_STICKY_SECONDS. Raises DatabaseUnavailable
+    when the primary can't be reached. Outside an application context
+    (scripts) a fresh connection, or None, is returned instead.
+    """
+    if not has_app_context():
+        return get_db_connection()
+    if 'db_conn' not in g:
+        conn = None
+        if g.get('db_read_only') and _replicas:
+            if _sticky_to_primary():
+                metrics.incr('db.reads.sticky')
+            else:
+                replica, conn = _replica_connection()
+                if conn is not None:
+                    g.db_replica = replica.name
+                    metrics.incr('db.reads.replica')
+                else:
+                    metrics.incr('db.reads.failover')
+        if conn is None:
+            try:
+                conn = _connect_primary()
+            except DatabaseUnavailable as err:
+                # handlers' own error responses are replaced with a 503 (see init_db)
+                g.db_unavailable = str(err)
+                raise
+        g.db_conn = conn
+    return g.db_conn
+
+
+def _release(conn):
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except Exception:
+        pass
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def release_db(exc=None):
+    """Teardown hook: roll back anything left uncommitted and return the
+    connection to the pool."""
+    conn = g.pop('db_conn', None)
+    g.pop('db_uow_depth', None)
+    g.pop('db_replica', None)
+    if conn is not None:
+        _release(conn)
+
+
+def stream_with_db(generator):
+    """stream_with_context() for generators that read from the request connection.
+
+    Flask tears the app context down when the view returns, before a streamed
+    body is consumed, so the connection is detached from g here and released
+    by the generator itself once the last chunk has been produced.
+    """
+    conn = g.pop('db_conn', None)
+
+    def wrapped():
+        try:
+            yield from generator
+        finally:
+            if conn is not None:
+                _release(conn)
+
+    return stream_with_context(wrapped())
+
+
+@contextmanager
+def unit_of_work():
+    """Commit on success, roll back on exception, on the request connection.
+
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            ...
+
+    Units of work nest: only the outermost one commits or rolls back, so
+    helpers can open their own without splitting the caller's transaction.
+    Returning from inside the block commits whatever was executed; call
+    conn.rollback() first to discard it.
+    """
+    conn = get_db()
+    if has_app_context() and g.get('db_replica'):
+        raise RuntimeError('unit_of_work() used in a @read_only handler')
+    depth = g.get('db_uow_depth', 0) if has_app_context() else 0
+    if has_app_context():
+        g.db_uow_depth = depth + 1
+    try:
+        yield conn
+        if depth == 0:
+            conn.commit()
+    except Exception:
+        if depth == 0:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        raise
+    finally:
+        if has_app_context():
+            g.db_uow_depth = depth
+        elif depth == 0:
+            conn.close()
+
+
+def note_written_deals(*deal_ids):
+    """Record the deals the current write request changes.
+
+    The after-request hooks that keep derived data current (dashboard
+    aggregates, search index, investor returns) refresh these deals; call it
+    from every handler whose URL doesn't carry the <deal_id> it writes.
+    """
+    written = g.setdefault('written_deals', [])
+    for deal_id in deal_ids:
+        try:
+            deal_id = int(deal_id)
+        except (TypeError, ValueError):
+            continue
+        if deal_id not in written:
+            written.append(deal_id)
+
+
+def written_deals():
+    """Deals changed by the current request: those noted with
+    note_written_deals(), else the <deal_id> of the URL, else []."""
+    if g.get('written_deals'):
+        return list(g.written_deals)
+    deal_id = (request.view_args or {}).get('deal_id')
+    return [deal_id] if deal_id is not None else []
+
+
+def _remember_writes(response):
+    """Keep a client that just wrote on the primary for DB_STICKY_SECONDS."""
+    if (_replicas and 'db_conn' in g and request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and response.status_code < 400):
+        user_id = _request_user_id()
+        if user_id is not None:
+            _recent_writers[user_id] = time.monotonic() + DB_STICKY_SECONDS
+        # the cookie covers the other workers, which don't share _recent_writers
+        response.set_cookie(STICKY_COOKIE, '1', max_age=DB_STICKY_SECONDS, httponly=True, samesite='Lax')
+    return response
+
+
+def _unavailable_response():
+    response = jsonify({
+        'error': 'Database temporarily unavailable',
+        'database': 'unavailable',
+        'breaker': db_breaker.status(),
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, db_breaker.retry_after()))
+    return response
+
+
+def _replace_failed_response(response):
+    """Turn whatever a handler returned after DatabaseUnavailable into a 503.
+
+    Most handlers catch every exception and answer 500; a DB outage is a
+    temporary condition clients should retry, so it is reported as such.
+    """
+    if g.get('db_unavailable'):
+        return _unavailable_response()
+    return response
+
+
+def init_db(app):
+    app.after_request(_remember_writes)
+    app.after_request(_replace_failed_response)
+    app.register_error_handler(DatabaseUnavailable, lambda e: _unavailable_response())
+    app.teardown_appcontext(release_db)
+    metrics.register_gauge('db.replicas', replica_status)
+    metrics.register_gauge('db.breaker', db_breaker.status)
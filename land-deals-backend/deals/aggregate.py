@@ -0,0 +1,197 @@
+# deals/aggregate.py - Load a deal with all related rows for GET /api/deals/<id>
+#
+# The aggregate path fetches the deal, owners, buyers, investors, expenses
+# (with the paying investor's name) and documents in one statement using
+# JSON_OBJECT / JSON_ARRAYAGG subqueries, so a page view costs one round trip
+# instead of six. Servers without the JSON functions (old MySQL/MariaDB) fall
+# back to the original multi-query path. Both paths return the same shape.
+#
+# The statement lists the columns explicitly, so it is rebuilt from
+# information_schema every DEAL_COLUMNS_TTL_SECONDS: a column added by a
+# migration shows up in the response without a restart, and a dropped one
+# (error 1054) triggers an immediate reload.
+import json
+import os
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import mysql.connector
+
+import metrics
+from config import env_int
+
+# 'aggregate' (default) tries the single statement first; 'multi' forces the
+# per-table queries.
+DEAL_FETCH_MODE = os.environ.get('DEAL_FETCH_MODE', 'aggregate').lower()
+DEAL_COLUMNS_TTL_SECONDS = env_int('DEAL_COLUMNS_TTL_SECONDS', 300)
+
+# (response key, table, alias) for the child collections of a deal
+_CHILD_TABLES = [
+    ('owners', 'owners', 'o'),
+    ('buyers', 'buyers', 'b'),
+    ('investors', 'investors', 'i'),
+    ('expenses', 'expenses', 'e'),
+    ('documents', 'documents', 'doc'),
+]
+
+# MySQL errors meaning "this server can't run the aggregate statement"
+_UNSUPPORTED_ERRNOS = {1064, 1305}  # syntax error, FUNCTION does not exist
+
+_columns = None          # {table: [(column, data_type), ...]}, None when a reload is due
+_columns_loaded_at = 0.0  # time.monotonic() of the last load
+_statement = None        # aggregate SELECT built from _columns
+_json_supported = None   # None until the first attempt decides
+
+
+def _load_columns(cursor):
+    global _columns, _columns_loaded_at, _statement
+    if _columns is None or time.monotonic() - _columns_loaded_at >= DEAL_COLUMNS_TTL_SECONDS:
+        tables = ['deals'] + [t for _, t, _ in _CHILD_TABLES]
+        placeholders = ','.join(['%s'] * len(tables))
+        cursor.execute(f"""
+            SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name, DATA_TYPE AS data_type
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """, tables)
+        cols = {}
+        for row in cursor.fetchall():
+            cols.setdefault(row['table_name'], []).append((row['column_name'], row['data_type'].lower()))
+        _columns, _statement = cols, _build_statement(cols)
+        _columns_loaded_at = time.monotonic()
+    return _columns
+
+
+def _json_object(alias, columns, extra=None):
+    pairs = [f"'{name}', {alias}.`{name}`" for name, _ in columns]
+    if extra:
+        pairs.extend(extra)
+    return f"JSON_OBJECT({', '.join(pairs)})"
+
+
+def _build_statement(columns):
+    parts = [f"{_json_object('d', columns['deals'])} AS deal"]
+    for key, table, alias in _CHILD_TABLES:
+        if key == 'expenses':
+            obj = _json_object(alias, columns[table], ["'paid_by_name', pi.investor_name"])
+            source = "expenses e LEFT JOIN investors pi ON e.paid_by = pi.id"
+        else:
+            obj = _json_object(alias, columns[table])
+            source = f"{table} {alias}"
+        parts.append(f"(SELECT JSON_ARRAYAGG({obj}) FROM {source} WHERE {alias}.deal_id = d.id) AS {key}")
+    return "SELECT " + ",\n       ".join(parts) + "\nFROM deals d WHERE d.id = %s"
+
+
+def _converters(columns):
+    """Map column name -> function turning the JSON value into what the
+    multi-query path would have produced after its datetime conversion."""
+    conv = {}
+    for name, data_type in columns:
+        if data_type in ('datetime', 'timestamp'):
+            conv[name] = lambda v: datetime.fromisoformat(v).isoformat()
+        elif data_type == 'date':
+            conv[name] = lambda v: date.fromisoformat(v[:10])
+        elif data_type in ('float', 'double'):
+            conv[name] = float
+    return conv
+
+
+def _decode(value, columns):
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    # parse_float=Decimal keeps DECIMAL scale ("1500.00") like the connector does
+    data = json.loads(value, parse_float=Decimal)
+    conv = _converters(columns)
+    items = data if isinstance(data, list) else [data]
+    for item in items:
+        for name, fn in conv.items():
+            v = item.get(name)
+            if v is not None:
+                item[name] = fn(v)
+    return data
+
+
+def _fetch_aggregate(cursor, deal_id):
+    columns = _load_columns(cursor)
+    cursor.execute(_statement, (deal_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    result = {'deal': _decode(row['deal'], columns['deals'])}
+    for key, table, _ in _CHILD_TABLES:
+        result[key] = _decode(row[key], columns[table]) or []
+    return result
+
+
+def fetch_deal_multi(cursor, deal_id):
+    """Original one-query-per-table loader. Returns None if the deal is missing."""
+    cursor.execute("SELECT * FROM deals WHERE id = %s", (deal_id,))
+    deal = cursor.fetchone()
+    if not deal:
+        return None
+
+    cursor.execute("SELECT * FROM owners WHERE deal_id = %s", (deal_id,))
+    owners = cursor.fetchall()
+
+    cursor.execute("SELECT * FROM buyers WHERE deal_id = %s", (deal_id,))
+    buyers = cursor.fetchall()
+
+    cursor.execute("SELECT * FROM investors WHERE deal_id = %s", (deal_id,))
+    investors = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT e.*, i.investor_name as paid_by_name
+        FROM expenses e
+        LEFT JOIN investors i ON e.paid_by = i.id
+        WHERE e.deal_id = %s
+    """, (deal_id,))
+    expenses = cursor.fetchall()
+
+    cursor.execute("SELECT * FROM documents WHERE deal_id = %s", (deal_id,))
+    documents = cursor.fetchall()
+
+    # Convert datetime objects
+    for item in [deal] + owners + buyers + investors + expenses + documents:
+        if item:
+            for key, value in item.items():
+                if isinstance(value, datetime):
+                    item[key] = value.isoformat()
+
+    return {
+        'deal': deal,
+        'owners': owners,
+        'buyers': buyers,
+        'investors': investors,
+        'expenses': expenses,
+        'documents': documents
+    }
+
+
+def fetch_deal(cursor, deal_id):
+    """Return {'deal', 'owners', 'buyers', 'investors', 'expenses', 'documents'}
+    for a deal, or None if it doesn't exist. `cursor` must be a dictionary cursor."""
+    global _json_supported, _columns
+    if DEAL_FETCH_MODE != 'multi' and _json_supported is not False:
+        for attempt in range(2):
+            try:
+                result = _fetch_aggregate(cursor, deal_id)
+                _json_supported = True
+                metrics.incr('deal_fetch.aggregate')
+                return result
+            except mysql.connector.Error as e:
+                errno = getattr(e, 'errno', None)
+                if errno == 1054 and attempt == 0:
+                    # schema changed since the column list was cached; reload once
+                    _columns = None
+                    continue
+                if errno in _UNSUPPORTED_ERRNOS:
+                    print(f"JSON aggregation unavailable, using multi-query deal fetch: {e}")
+                    _json_supported = False
+                    metrics.incr('deal_fetch.fallback')
+                    break
+                raise
+    metrics.incr('deal_fetch.multi')
+    return fetch_deal_multi(cursor, deal_id)
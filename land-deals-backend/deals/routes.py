@@ -0,0 +1,782 @@
+# deals/routes.py - Deals, expenses, deal documents and orphan cleanup
+import os
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.utils import secure_filename
+
+import export_cache
+from auth import token_required
+from coalesce import coalesced
+from db import get_db, note_written_deals, unit_of_work, read_only
+from deals import search
+from deals.aggregate import fetch_deal
+from locations.registry import registry
+
+bp = Blueprint('deals', __name__)
+
+
+@bp.route('/api/deals', methods=['GET'])
+@token_required
+@coalesced(scope='role')  # same list for everyone
+@read_only
+def get_deals(current_user):
+    try:
+        connection = get_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        cursor.execute("""
+            SELECT d.*, u.full_name as created_by_name 
+            FROM deals d 
+            LEFT JOIN users u ON d.created_by = u.id 
+            ORDER BY d.created_at DESC
+        """)
+        deals = cursor.fetchall()
+        
+        # Convert datetime objects to strings for JSON serialization
+        for deal in deals:
+            for key, value in deal.items():
+                if isinstance(value, datetime):
+                    deal[key] = value.isoformat()
+        
+        return jsonify(deals)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/deals/search', methods=['GET'])
+@token_required
+@coalesced(scope='role')
+@read_only
+def search_deals(current_user):
+    """Filtered, sorted page of deals with facet counts; parameters in deals/search.py."""
+    try:
+        cursor = get_db().cursor(dictionary=True)
+        result = search.search(cursor, request.args)
+        cursor.close()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    for deal in result['deals']:
+        for key, value in deal.items():
+            if isinstance(value, datetime):
+                deal[key] = value.isoformat()
+    return jsonify(result)
+
+
+@bp.route('/api/deals', methods=['POST'])
+@token_required
+def create_deal(current_user):
+    try:
+        data = request.get_json()
+        
+        with unit_of_work() as connection:
+            cursor = connection.cursor()
+        
+            # Handle empty strings for numeric fields
+            total_area = data.get('total_area') if data.get('total_area') != '' else None
+            purchase_amount = data.get('purchase_amount') if data.get('purchase_amount') != '' else None
+            selling_amount = data.get('selling_amount') if data.get('selling_amount') != '' else None
+
+            # Resolve normalized state_id and district_id (idempotent)
+            state_name = data.get('state')
+            district_name = data.get('district')
+            state_id = None
+            district_id = None
+            try:
+                # Resolved from the in-process registry; inserts the name if missing
+                state_id = registry.state_id(cursor, state_name)
+                if state_id:
+                    district_id = registry.district_id(cursor, state_id, district_name)
+            except Exception:
+                # Non-fatal: continue without normalized ids if any issue
+                state_id = None
+                district_id = None
+
+            # Insert deal with new fields including normalized ids and keep legacy text
+            cursor.execute("""
+                INSERT INTO deals (project_name, survey_number, location, state, district, 
+                                 taluka, village, total_area, area_unit, purchase_date, 
+                                 purchase_amount, selling_amount, created_by, status, payment_mode, profit_allocation, state_id, district_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                data.get('project_name'),
+                data.get('survey_number'),
+                data.get('location'),
+                data.get('state'),
+                data.get('district'),
+                data.get('taluka'),
+                data.get('village'),
+                total_area,
+                data.get('area_unit'),
+                data.get('purchase_date'),
+                purchase_amount,
+                selling_amount,
+                current_user,
+                data.get('status'),
+                data.get('payment_mode'),
+                data.get('profit_allocation'),
+                state_id,
+                district_id
+            ))
+            deal_id = cursor.lastrowid
+            note_written_deals(deal_id)
+            # Insert owners
+            owners = data.get('owners', [])
+            for owner in owners:
+                if owner.get('existing_owner_id'):
+                    # Associate existing owner with this deal
+                    cursor.execute("""
+                        INSERT INTO owners (deal_id, name, mobile, email, aadhar_card, pan_card)
+                        SELECT %s, name, mobile, email, aadhar_card, pan_card
+                        FROM owners 
+                        WHERE id = %s
+                        LIMIT 1
+                    """, (deal_id, owner.get('existing_owner_id')))
+                elif owner.get('name'):
+                    # Create new owner
+                    cursor.execute("""
+                        INSERT INTO owners (deal_id, name, mobile, email, aadhar_card, pan_card)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, (
+                        deal_id,
+                        owner.get('name'),
+                        owner.get('mobile'),
+                        owner.get('email'),
+                        owner.get('aadhar_card'),
+                        owner.get('pan_card')
+                    ))
+
+            # Insert buyers
+            buyers = data.get('buyers', [])
+            for buyer in buyers:
+                if buyer.get('name'):
+                    cursor.execute("""
+                        INSERT INTO buyers (deal_id, name, mobile, email, aadhar_card, pan_card)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, (
+                        deal_id,
+                        buyer.get('name'),
+                        buyer.get('mobile'),
+                        buyer.get('email'),
+                        buyer.get('aadhar_card'),
+                        buyer.get('pan_card')
+                    ))
+        
+            # Insert investors
+            investors = data.get('investors', [])
+            for investor in investors:
+                if investor.get('investor_name'):
+                    cursor.execute("""
+                        INSERT INTO investors (deal_id, investor_name, investment_amount, 
+                                             investment_percentage, mobile, email, 
+                                             aadhar_card, pan_card)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    """, (
+                        deal_id,
+                        investor.get('investor_name'),
+                        investor.get('investment_amount'),
+                        investor.get('investment_percentage'),
+                        investor.get('mobile'),
+                        investor.get('email'),
+                        investor.get('aadhar_card'),
+                        investor.get('pan_card')
+                    ))
+
+            # Insert expenses
+            expenses = data.get('expenses', [])
+            for expense in expenses:
+                if expense.get('expense_type') and expense.get('amount'):
+                    cursor.execute("""
+                        INSERT INTO expenses (deal_id, expense_type, expense_description, amount, paid_by, expense_date, receipt_number)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, (
+                        deal_id,
+                        expense.get('expense_type'),
+                        expense.get('expense_description'),
+                        expense.get('amount'),
+                        expense.get('paid_by'),
+                        expense.get('expense_date'),
+                        expense.get('receipt_number')
+                    ))
+
+
+        return jsonify({'message': 'Deal created successfully', 'deal_id': deal_id})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/deals/<int:deal_id>', methods=['GET'])
+@token_required
+@read_only
+def get_deal(current_user, deal_id):
+    try:
+        connection = get_db()
+        cursor = connection.cursor(dictionary=True)
+
+        # Deal, owners, buyers, investors, expenses and documents in one round
+        # trip where the server supports JSON aggregation
+        deal_data = fetch_deal(cursor, deal_id)
+        if not deal_data:
+            return jsonify({'error': 'Deal not found'}), 404
+
+        return jsonify(deal_data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/deals/<int:deal_id>', methods=['PUT'])
+@token_required
+def update_deal(current_user, deal_id):
+    """Update an existing deal with all its related data"""
+    try:
+        data = request.get_json()
+        
+        with unit_of_work() as connection:
+            cursor = connection.cursor()
+        
+            # Check if deal exists
+            cursor.execute("SELECT id FROM deals WHERE id = %s", (deal_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Deal not found'}), 404
+        
+            # Handle empty strings for numeric fields
+            total_area = data.get('total_area') if data.get('total_area') != '' else None
+            purchase_amount = data.get('purchase_amount') if data.get('purchase_amount') != '' else None
+            selling_amount = data.get('selling_amount') if data.get('selling_amount') != '' else None
+
+            # Resolve normalized state_id and district_id (idempotent)
+            state_name = data.get('state')
+            district_name = data.get('district')
+            state_id = None
+            district_id = None
+            try:
+                # Resolved from the in-process registry; inserts the name if missing
+                state_id = registry.state_id(cursor, state_name)
+                if state_id:
+                    district_id = registry.district_id(cursor, state_id, district_name)
+            except Exception:
+                # Non-fatal: continue without normalized ids if any issue
+                state_id = None
+                district_id = None
+
+            # Update main deal record
+            cursor.execute("""
+                UPDATE deals SET 
+                    project_name = %s, survey_number = %s, location = %s, state = %s, 
+                    district = %s, taluka = %s, village = %s, total_area = %s, area_unit = %s, 
+                    purchase_date = %s, purchase_amount = %s, selling_amount = %s, 
+                    status = %s, payment_mode = %s, profit_allocation = %s, 
+                    state_id = %s, district_id = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (
+                data.get('project_name'),
+                data.get('survey_number'),
+                data.get('location'),
+                data.get('state'),
+                data.get('district'),
+                data.get('taluka'),
+                data.get('village'),
+                total_area,
+                data.get('area_unit'),
+                data.get('purchase_date'),
+                purchase_amount,
+                selling_amount,
+                data.get('status'),
+                data.get('payment_mode'),
+                data.get('profit_allocation'),
+                state_id,
+                district_id,
+                deal_id
+            ))
+
+            # Update owners - delete existing and insert new ones
+            cursor.execute("DELETE FROM owners WHERE deal_id = %s", (deal_id,))
+            owners = data.get('owners', [])
+            for owner in owners:
+                if owner.get('name'):
+                    cursor.execute("""
+                        INSERT INTO owners (deal_id, name, mobile, email, aadhar_card, pan_card, address)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, (
+                        deal_id,
+                        owner.get('name'),
+                        owner.get('mobile'),
+                        owner.get('email'),
+                        owner.get('aadhar_card'),
+                        owner.get('pan_card'),
+                        owner.get('address')
+                    ))
+
+            # Update buyers - delete existing and insert new ones
+            cursor.execute("DELETE FROM buyers WHERE deal_id = %s", (deal_id,))
+            buyers = data.get('buyers', [])
+            for buyer in buyers:
+                if buyer.get('name'):
+                    cursor.execute("""
+                        INSERT INTO buyers (deal_id, name, mobile, email, aadhar_card, pan_card)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, (
+                        deal_id,
+                        buyer.get('name'),
+                        buyer.get('mobile'),
+                        buyer.get('email'),
+                        buyer.get('aadhar_card'),
+                        buyer.get('pan_card')
+                    ))
+        
+            # Update investors - delete existing and insert new ones
+            cursor.execute("DELETE FROM investors WHERE deal_id = %s", (deal_id,))
+            investors = data.get('investors', [])
+            for investor in investors:
+                if investor.get('investor_name'):
+                    cursor.execute("""
+                        INSERT INTO investors (deal_id, investor_name, investment_amount, 
+                                             investment_percentage, mobile, email, 
+                                             aadhar_card, pan_card)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    """, (
+                        deal_id,
+                        investor.get('investor_name'),
+                        investor.get('investment_amount'),
+                        investor.get('investment_percentage'),
+                        investor.get('mobile'),
+                        investor.get('email'),
+                        investor.get('aadhar_card'),
+                        investor.get('pan_card')
+                    ))
+
+            # Update expenses - delete existing and insert new ones
+            cursor.execute("DELETE FROM expenses WHERE deal_id = %s", (deal_id,))
+            expenses = data.get('expenses', [])
+            for expense in expenses:
+                if expense.get('expense_type') and expense.get('amount'):
+                    cursor.execute("""
+                        INSERT INTO expenses (deal_id, expense_type, expense_description, amount, paid_by, expense_date, receipt_number)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, (
+                        deal_id,
+                        expense.get('expense_type'),
+                        expense.get('expense_description'),
+                        expense.get('amount'),
+                        expense.get('paid_by'),
+                        expense.get('expense_date'),
+                        expense.get('receipt_number')
+                    ))
+
+        return jsonify({'message': 'Deal updated successfully', 'deal_id': deal_id})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/deals/<int:deal_id>', methods=['DELETE'])
+@token_required
+def delete_deal(current_user, deal_id):
+    """
+    Delete a deal and all its associated data (owners, buyers, investors, expenses, documents)
+    """
+    try:
+        # all deletes commit together or not at all
+        with unit_of_work() as connection:
+            cursor = connection.cursor()
+        
+            # First check if deal exists
+            cursor.execute("SELECT id FROM deals WHERE id = %s", (deal_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Deal not found'}), 404
+        
+            # Delete all associated data in the correct order (foreign key constraints)
+        
+            # 1. Delete owner documents first (if table exists)
+            try:
+                cursor.execute("""
+                    DELETE od FROM owner_documents od 
+                    INNER JOIN owners o ON od.owner_id = o.id 
+                    WHERE o.deal_id = %s
+                """, (deal_id,))
+            except Exception as e:
+                # Table might not exist, continue
+                pass
+        
+            # 2. Delete deal documents (if table exists)
+            try:
+                cursor.execute("DELETE FROM deal_documents WHERE deal_id = %s", (deal_id,))
+            except Exception as e:
+                # Table might not exist, continue
+                pass
+        
+            # 3. Delete owners associated with this deal
+            cursor.execute("DELETE FROM owners WHERE deal_id = %s", (deal_id,))
+        
+            # 4. Delete buyers associated with this deal  
+            cursor.execute("DELETE FROM buyers WHERE deal_id = %s", (deal_id,))
+        
+            # 5. Delete investors associated with this deal
+            cursor.execute("DELETE FROM investors WHERE deal_id = %s", (deal_id,))
+        
+            # 6. Delete expenses associated with this deal
+            cursor.execute("DELETE FROM expenses WHERE deal_id = %s", (deal_id,))
+        
+            # 7. Finally delete the deal itself
+            cursor.execute("DELETE FROM deals WHERE id = %s", (deal_id,))
+        
+        return jsonify({
+            'message': 'Deal and all associated data deleted successfully',
+            'deleted_deal_id': deal_id
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to delete deal: {str(e)}'}), 500
+
+
+@bp.route('/api/deals/<int:deal_id>/expenses', methods=['POST'])
+@token_required
+def add_expense(current_user, deal_id):
+    try:
+        data = request.get_json()
+        
+        with unit_of_work() as connection:
+            cursor = connection.cursor()
+        
+            cursor.execute("""
+                INSERT INTO expenses (deal_id, expense_type, expense_description, 
+                                    amount, paid_by, expense_date, receipt_number)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                deal_id,
+                data.get('expense_type'),
+                data.get('expense_description'),
+                data.get('amount'),
+                data.get('paid_by'),
+                data.get('expense_date'),
+                data.get('receipt_number')
+            ))
+        
+        return jsonify({'message': 'Expense added successfully'})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/deals/<int:deal_id>/financials', methods=['GET'])
+@token_required
+@read_only
+def deal_financials(current_user, deal_id):
+    """Return a financial summary for a deal: totals for payments by mode, total expenses, investments, owners' shares (if profit_allocation set), and simple P&L estimate."""
+    try:
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+
+        # total payments grouped by payment_mode
+        cursor.execute("SELECT payment_mode, SUM(amount) as total FROM payments WHERE deal_id = %s GROUP BY payment_mode", (deal_id,))
+        payments_by_mode = cursor.fetchall() or []
+
+        # total payments overall
+        cursor.execute("SELECT SUM(amount) as total_payments FROM payments WHERE deal_id = %s", (deal_id,))
+        total_pay = cursor.fetchone() or {}
+
+        # total expenses
+        cursor.execute("SELECT SUM(amount) as total_expenses FROM expenses WHERE deal_id = %s", (deal_id,))
+        total_exp = cursor.fetchone() or {}
+
+        # total investments
+        cursor.execute("SELECT SUM(investment_amount) as total_invested FROM investors WHERE deal_id = %s", (deal_id,))
+        total_inv = cursor.fetchone() or {}
+
+        # owners count and basic split if profit_allocation exists on deals
+        cursor.execute("SELECT profit_allocation, purchase_amount, selling_amount FROM deals WHERE id = %s", (deal_id,))
+        deal = cursor.fetchone() or {}
+
+        # basic profit calculation if selling and purchase present
+        profit = None
+        try:
+            pur = float(deal.get('purchase_amount') or 0)
+            sell = float(deal.get('selling_amount') or 0)
+            profit = sell - pur if (pur and sell) else None
+        except Exception:
+            profit = None
+
+        return jsonify({
+            'payments_by_mode': payments_by_mode,
+            'total_payments': total_pay.get('total_payments'),
+            'total_expenses': total_exp.get('total_expenses'),
+            'total_invested': total_inv.get('total_invested'),
+            'deal_profit_estimate': profit,
+            'profit_allocation': deal.get('profit_allocation')
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/deals/<int:deal_id>/statement.pdf', methods=['GET'])
+@token_required
+@read_only
+def deal_statement(current_user, deal_id):
+    """Deal statement PDF: summary, owners, buyers, investors, expenses and payments with parties."""
+    # reports.engine imports ReportLab on the first statement, not at startup
+    from reports import statement
+    from reports.engine import ReportsUnavailable
+    try:
+        cursor = get_db().cursor(dictionary=True)
+        data = statement.load(cursor, deal_id)
+        cursor.close()
+        if data is None:
+            return jsonify({'error': 'Deal not found'}), 404
+
+        key = export_cache.cache.key('statement', request.args, statement.version(data))
+        response = export_cache.not_modified(key)
+        if response is not None:
+            return response
+        path = export_cache.cache.lookup(key, 'pdf')
+        if path is None:
+            path = export_cache.cache.render(key, 'pdf', lambda p: statement.render(p, data, current_app.root_path))
+        return export_cache.send(path, key, 'application/pdf', f'deal-{deal_id}-statement.pdf')
+    except ReportsUnavailable:
+        return jsonify({'error': 'reportlab not available on server'}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/upload', methods=['POST'])
+@token_required
+def upload_file(current_user):
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        deal_id = request.form.get('deal_id')
+        document_type = request.form.get('document_type')
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        # Get project_name for the deal
+        with unit_of_work() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT project_name FROM deals WHERE id = %s", (deal_id,))
+            deal = cursor.fetchone()
+            project_folder_name = f"deal_{deal_id}"
+            note_written_deals(deal_id)
+
+            # Create folder for the deal
+            deal_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(project_folder_name))
+            os.makedirs(deal_folder, exist_ok=True)
+
+            filename = secure_filename(file.filename)
+            filepath = os.path.join(deal_folder, filename)
+            file.save(filepath)
+
+            # Save to database
+            cursor = connection.cursor()
+            cursor.execute("""
+                INSERT INTO documents (deal_id, document_type, document_name, 
+                                     file_path, file_size, uploaded_by)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (
+                deal_id,
+                document_type,
+                filename,
+                os.path.relpath(filepath, current_app.config['UPLOAD_FOLDER']),
+                os.path.getsize(filepath),
+                current_user
+            ))
+        
+        return jsonify({'message': 'File uploaded successfully', 'filename': filename})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/cleanup/orphaned-owners', methods=['DELETE'])
+@token_required  
+def cleanup_orphaned_owners(current_user):
+    """
+    Clean up orphaned owners whose associated deals have been deleted
+    """
+    try:
+        with unit_of_work() as connection:
+            cursor = connection.cursor()
+        
+            # Find owners whose deal_id no longer exists in deals table
+            cursor.execute("""
+                SELECT o.id, o.name, o.deal_id 
+                FROM owners o 
+                LEFT JOIN deals d ON o.deal_id = d.id 
+                WHERE d.id IS NULL
+            """)
+            orphaned_owners = cursor.fetchall()
+        
+            if not orphaned_owners:
+                return jsonify({
+                    'message': 'No orphaned owners found',
+                    'deleted_count': 0
+                })
+        
+            orphaned_owner_ids = [owner[0] for owner in orphaned_owners]
+        
+            # Delete documents for orphaned owners (if table exists)
+            try:
+                if orphaned_owner_ids:
+                    placeholders = ','.join(['%s'] * len(orphaned_owner_ids))
+                    cursor.execute(f"""
+                        DELETE FROM owner_documents 
+                        WHERE owner_id IN ({placeholders})
+                    """, orphaned_owner_ids)
+            except Exception as e:
+                # Table might not exist, continue
+                pass
+        
+            # Delete the orphaned owners
+            if orphaned_owner_ids:
+                placeholders = ','.join(['%s'] * len(orphaned_owner_ids))
+                cursor.execute(f"""
+                    DELETE FROM owners 
+                    WHERE id IN ({placeholders})
+                """, orphaned_owner_ids)
+        
+        return jsonify({
+            'message': f'Successfully cleaned up {len(orphaned_owners)} orphaned owners',
+            'deleted_count': len(orphaned_owners),
+            'deleted_owners': [{'id': owner[0], 'name': owner[1], 'deal_id': owner[2]} for owner in orphaned_owners]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to cleanup orphaned owners: {str(e)}'}), 500
+
+
+@bp.route('/api/cleanup/all-orphaned-data', methods=['DELETE'])
+@token_required
+def cleanup_all_orphaned_data(current_user):
+    """
+    Clean up all orphaned data (owners, buyers, investors, expenses) whose deals have been deleted
+    """
+    try:
+        with unit_of_work() as connection:
+            cursor = connection.cursor()
+        
+            cleanup_results = {}
+        
+            # 1. Clean up orphaned owners
+            cursor.execute("""
+                SELECT o.id, o.name, o.deal_id 
+                FROM owners o 
+                LEFT JOIN deals d ON o.deal_id = d.id 
+                WHERE d.id IS NULL
+            """)
+            orphaned_owners = cursor.fetchall()
+        
+            if orphaned_owners:
+                orphaned_owner_ids = [owner[0] for owner in orphaned_owners]
+            
+                # Delete owner documents first
+                try:
+                    placeholders = ','.join(['%s'] * len(orphaned_owner_ids))
+                    cursor.execute(f"""
+                        DELETE FROM owner_documents 
+                        WHERE owner_id IN ({placeholders})
+                    """, orphaned_owner_ids)
+                except Exception:
+                    pass
+            
+                # Delete orphaned owners
+                placeholders = ','.join(['%s'] * len(orphaned_owner_ids))
+                cursor.execute(f"""
+                    DELETE FROM owners 
+                    WHERE id IN ({placeholders})
+                """, orphaned_owner_ids)
+            
+                cleanup_results['owners'] = {
+                    'count': len(orphaned_owners),
+                    'names': [owner[1] for owner in orphaned_owners]
+                }
+            else:
+                cleanup_results['owners'] = {'count': 0, 'names': []}
+        
+            # 2. Clean up orphaned buyers
+            cursor.execute("""
+                SELECT b.id, b.name, b.deal_id 
+                FROM buyers b 
+                LEFT JOIN deals d ON b.deal_id = d.id 
+                WHERE d.id IS NULL
+            """)
+            orphaned_buyers = cursor.fetchall()
+        
+            if orphaned_buyers:
+                orphaned_buyer_ids = [buyer[0] for buyer in orphaned_buyers]
+                placeholders = ','.join(['%s'] * len(orphaned_buyer_ids))
+                cursor.execute(f"""
+                    DELETE FROM buyers 
+                    WHERE id IN ({placeholders})
+                """, orphaned_buyer_ids)
+            
+                cleanup_results['buyers'] = {
+                    'count': len(orphaned_buyers),
+                    'names': [buyer[1] for buyer in orphaned_buyers]
+                }
+            else:
+                cleanup_results['buyers'] = {'count': 0, 'names': []}
+        
+            # 3. Clean up orphaned investors
+            cursor.execute("""
+                SELECT i.id, i.investor_name, i.deal_id 
+                FROM investors i 
+                LEFT JOIN deals d ON i.deal_id = d.id 
+                WHERE d.id IS NULL
+            """)
+            orphaned_investors = cursor.fetchall()
+        
+            if orphaned_investors:
+                orphaned_investor_ids = [investor[0] for investor in orphaned_investors]
+                placeholders = ','.join(['%s'] * len(orphaned_investor_ids))
+                cursor.execute(f"""
+                    DELETE FROM investors 
+                    WHERE id IN ({placeholders})
+                """, orphaned_investor_ids)
+            
+                cleanup_results['investors'] = {
+                    'count': len(orphaned_investors),
+                    'names': [investor[1] for investor in orphaned_investors]
+                }
+            else:
+                cleanup_results['investors'] = {'count': 0, 'names': []}
+        
+            # 4. Clean up orphaned expenses
+            cursor.execute("""
+                SELECT e.id, e.expense_type, e.deal_id 
+                FROM expenses e 
+                LEFT JOIN deals d ON e.deal_id = d.id 
+                WHERE d.id IS NULL
+            """)
+            orphaned_expenses = cursor.fetchall()
+        
+            if orphaned_expenses:
+                orphaned_expense_ids = [expense[0] for expense in orphaned_expenses]
+                placeholders = ','.join(['%s'] * len(orphaned_expense_ids))
+                cursor.execute(f"""
+                    DELETE FROM expenses 
+                    WHERE id IN ({placeholders})
+                """, orphaned_expense_ids)
+            
+                cleanup_results['expenses'] = {
+                    'count': len(orphaned_expenses),
+                    'types': [expense[1] for expense in orphaned_expenses]
+                }
+            else:
+                cleanup_results['expenses'] = {'count': 0, 'types': []}
+        
+        total_cleaned = sum(result['count'] for result in cleanup_results.values())
+        
+        return jsonify({
+            'message': f'Successfully cleaned up {total_cleaned} orphaned records',
+            'cleanup_results': cleanup_results,
+            'total_deleted': total_cleaned
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to cleanup orphaned data: {str(e)}'}), 500
@@ -0,0 +1,263 @@
+# deals/search.py - Filtered, sorted, keyset-paginated deal list for GET /api/deals/search
+#
+# Filtering happens in SQL on indexed columns (see
+# migrations/20261019_deal_search.sql) instead of shipping every deal to the
+# browser. State and district filters are resolved to the normalized
+# state_id/district_id through the location registry, so no name matching
+# happens per row.
+#
+# Pages are addressed with an opaque cursor holding the sort value and id of
+# the last row returned, so page N costs the same as page 1 (no OFFSET scan)
+# and rows inserted meanwhile don't shift later pages.
+#
+# Facet counts (status, state, district, area_unit) come back with the first
+# page. Each facet ignores its own filter, so the screen can show how many
+# deals picking another value would give; `total` applies every filter.
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from locations.registry import registry
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# sort key -> column; every sort is tie-broken by d.id in the same direction
+SORTS = {
+    'created_at': 'd.created_at',
+    'purchase_date': 'd.purchase_date',
+    'purchase_amount': 'd.purchase_amount',
+    'total_area': 'd.total_area',
+    'project_name': 'd.project_name',
+}
+
+# facet -> (value expression, label join)
+_FACETS = {
+    'status': ("d.status", None),
+    'state': ("d.state_id", "LEFT JOIN states s ON s.id = d.state_id"),
+    'district': ("d.district_id", "LEFT JOIN districts s ON s.id = d.district_id"),
+    'area_unit': ("d.area_unit", None),
+}
+
+
+def _values(args, name):
+    """All values of a repeatable / comma-separated query parameter."""
+    values = []
+    for raw in args.getlist(name):
+        values.extend(v.strip() for v in raw.split(',') if v.strip())
+    return values
+
+
+def _ints(args, name):
+    try:
+        return [int(v) for v in _values(args, name)]
+    except ValueError:
+        raise ValueError(f'{name} must be a list of integers')
+
+
+def _number(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{name} must be a number')
+
+
+def _date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{name} must be YYYY-MM-DD')
+
+
+def _like_prefix(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _in(column, values):
+    return f"{column} IN ({','.join(['%s'] * len(values))})", list(values)
+
+
+def build_filters(cursor, args):
+    """[(facet or None, sql, params)] for the query string; raises ValueError on bad input.
+
+    Query: status, state / state_id, district / district_id, area_unit (each
+    repeatable or comma-separated), taluka, village, q (prefixes),
+    purchased_from / purchased_to (YYYY-MM-DD), min_amount / max_amount
+    (purchase amount), min_area / max_area (total_area).
+    """
+    filters = []
+
+    statuses = _values(args, 'status')
+    if statuses:
+        filters.append(('status',) + _in('d.status', statuses))
+
+    state_ids = _ints(args, 'state_id')
+    for name in _values(args, 'state'):
+        # an unknown name matches nothing rather than being ignored
+        state_ids.append(registry.find_state_id(cursor, name) or 0)
+    if state_ids:
+        filters.append(('state',) + _in('d.state_id', state_ids))
+
+    district_ids = _ints(args, 'district_id')
+    for name in _values(args, 'district'):
+        district_ids.extend(registry.find_district_ids(cursor, name, set(state_ids) or None) or [0])
+    if district_ids:
+        filters.append(('district',) + _in('d.district_id', district_ids))
+
+    units = _values(args, 'area_unit')
+    if units:
+        filters.append(('area_unit',) + _in('d.area_unit', units))
+
+    for name in ('taluka', 'village'):
+        value = (args.get(name) or '').strip()
+        if value:
+            filters.append((None, f"d.{name} LIKE %s", [_like_prefix(value)]))
+
+    q = (args.get('q') or '').strip()
+    if q:
+        filters.append((None, "(d.project_name LIKE %s OR d.survey_number LIKE %s)", [_like_prefix(q)] * 2))
+
+    ranges = [
+        ('purchased_from', _date, "d.purchase_date >= %s"),
+        ('purchased_to', _date, "d.purchase_date <= %s"),
+        ('min_amount', _number, "d.purchase_amount >= %s"),
+        ('max_amount', _number, "d.purchase_amount <= %s"),
+        ('min_area', _number, "d.total_area >= %s"),
+        ('max_area', _number, "d.total_area <= %s"),
+    ]
+    for name, parse, sql in ranges:
+        value = parse(args, name)
+        if value is not None:
+            filters.append((None, sql, [value]))
+    return filters
+
+
+def _where(filters, skip=None):
+    parts = [sql for facet, sql, _ in filters if facet != skip or skip is None]
+    params = [p for facet, _, ps in filters if facet != skip or skip is None for p in ps]
+    return (f"WHERE {' AND '.join(parts)}" if parts else ""), params
+
+
+def _cursor_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(sort, order, row):
+    token = json.dumps([sort, order, _cursor_value(row[sort]), row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort, order):
+    """(last value, last id) from a cursor made for the same sort; raises ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        c_sort, c_order, value, last_id = json.loads(raw)
+        last_id = int(last_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError('invalid cursor')
+    if (c_sort, c_order) != (sort, order):
+        raise ValueError('cursor belongs to a different sort order')
+    return value, last_id
+
+
+def _after(column, order, value, last_id):
+    """Rows after (value, last_id) in ORDER BY column <order>, id <order>.
+
+    MySQL sorts NULL first ascending and last descending, which the NULL
+    branches follow.
+    """
+    if order == 'asc':
+        if value is None:
+            return f"(({column} IS NULL AND d.id > %s) OR {column} IS NOT NULL)", [last_id]
+        return f"({column} > %s OR ({column} = %s AND d.id > %s))", [value, value, last_id]
+    if value is None:
+        return f"({column} IS NULL AND d.id < %s)", [last_id]
+    return f"({column} < %s OR ({column} = %s AND d.id < %s) OR {column} IS NULL)", [value, value, last_id]
+
+
+def facet_counts(cursor, filters):
+    """{'total': n, facet: [{'value', 'label', 'count'}, ...]} in one UNION round trip."""
+    selects, params = [], []
+    where, where_params = _where(filters)
+    selects.append(f"SELECT 'total' AS facet, NULL AS value, NULL AS label, COUNT(*) AS n FROM deals d {where}")
+    params.extend(where_params)
+    for facet, (expr, join) in _FACETS.items():
+        where, where_params = _where(filters, skip=facet)
+        label = "s.name" if join else "NULL"
+        selects.append(f"""
+            SELECT '{facet}', CAST({expr} AS CHAR), {label}, COUNT(*)
+            FROM deals d {join or ''} {where}
+            GROUP BY {expr}{', ' + label if join else ''}
+        """)
+        params.extend(where_params)
+    cursor.execute(" UNION ALL ".join(selects), params)
+
+    result = {'total': 0}
+    result.update({facet: [] for facet in _FACETS})
+    for row in cursor.fetchall():
+        if row['facet'] == 'total':
+            result['total'] = int(row['n'])
+            continue
+        value = row['value']
+        if value is not None and _FACETS[row['facet']][1]:
+            value = int(value)
+        result[row['facet']].append({'value': value, 'label': row['label'] or value, 'count': int(row['n'])})
+    for facet in _FACETS:
+        result[facet].sort(key=lambda f: -f['count'])
+    return result
+
+
+def search(cursor, args):
+    """One page of deals for the query string `args`; raises ValueError on bad input.
+
+    Returns {'deals', 'next_cursor', 'limit', 'sort', 'order'} plus 'facets'
+    on the first page (or with facets=1); facets=0 skips them.
+    """
+    sort = args.get('sort', 'created_at')
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+    order = args.get('order', 'desc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+    limit = min(max(args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    token = args.get('cursor')
+
+    filters = build_filters(cursor, args)
+    page_filters = list(filters)
+    if token:
+        value, last_id = decode_cursor(token, sort, order)
+        page_filters.append((None,) + _after(SORTS[sort], order, value, last_id))
+
+    where, params = _where(page_filters)
+    direction = order.upper()
+    cursor.execute(f"""
+        SELECT d.*, u.full_name AS created_by_name
+        FROM deals d
+        LEFT JOIN users u ON d.created_by = u.id
+        {where}
+        ORDER BY {SORTS[sort]} {direction}, d.id {direction}
+        LIMIT %s
+    """, params + [limit + 1])
+    rows = cursor.fetchall()
+
+    result = {'deals': rows[:limit], 'next_cursor': None, 'limit': limit, 'sort': sort, 'order': order}
+    if len(rows) > limit:
+        result['next_cursor'] = encode_cursor(sort, order, rows[limit - 1])
+    want_facets = args.get('facets')
+    if want_facets == '1' or (want_facets != '0' and not token):
+        result['facets'] = facet_counts(cursor, filters)
+    return result
@@ -0,0 +1,217 @@
+# export_cache.py - On-disk cache of rendered exports (ledger CSV/PDF, ...)
+#
+# Usage: decorate an export view with
+#     @cached_export('ledger', 'csv', 'text/csv', 'ledger.csv', version=ledger_version)
+# where version(args) returns a token that changes whenever the data behind
+# the export changes (or None to skip the cache for this request). The cache
+# key - and the ETag - is a hash of the export kind, the normalized query
+# string and that token, so a changed payment simply produces a new key and
+# stale files are never served; they age out of the LRU instead.
+#
+# A request carrying the current ETag gets 304 without rendering; a cached
+# file is sent straight from disk; otherwise the view runs and its output
+# (buffered or streamed) is written to the cache on the way out. Files live
+# in EXPORT_CACHE_DIR, shared by all workers (written to a temp file, then
+# renamed), and the least recently used are deleted once the directory holds
+# more than EXPORT_CACHE_BYTES.
+import hashlib
+import os
+import tempfile
+import threading
+from functools import wraps
+
+from flask import request, send_file
+
+import metrics
+from config import env_int
+
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'land-deals-exports'))
+EXPORT_CACHE_BYTES = env_int('EXPORT_CACHE_BYTES', 256 * 1024 * 1024)
+
+
+class ExportCache:
+    def __init__(self, directory=EXPORT_CACHE_DIR, max_bytes=EXPORT_CACHE_BYTES, name='export_cache'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.name = name   # metrics prefix
+        self._evict_lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, args, version):
+        """Hex key for `kind` + normalized query args (blank values dropped, order ignored) + data version."""
+        items = sorted((k, v.strip()) for k, v in args.items(multi=True) if v and v.strip())
+        raw = repr((kind, items, version)).encode('utf-8')
+        return hashlib.sha256(raw).hexdigest()[:32]
+
+    def path(self, key, ext):
+        return os.path.join(self.directory, f'{key}.{ext}')
+
+    def lookup(self, key, ext):
+        """Path of the cached file, marked as just used; None on a miss."""
+        path = self.path(key, ext)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def _temp(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        return os.fdopen(fd, 'wb'), tmp
+
+    def _commit(self, tmp, key, ext):
+        os.replace(tmp, self.path(key, ext))
+        metrics.incr(f'{self.name}.stores')
+        self._evict()
+
+    def store(self, key, ext, data):
+        f, tmp = self._temp()
+        try:
+            with f:
+                f.write(data)
+            self._commit(tmp, key, ext)
+        except OSError:
+            _discard(tmp)
+
+    def render(self, key, ext, write):
+        """Path of the file write(path) produces, rendered straight into the cache directory."""
+        f, tmp = self._temp()
+        f.close()
+        try:
+            write(tmp)
+            self._commit(tmp, key, ext)
+        except BaseException:
+            _discard(tmp)
+            raise
+        return self.path(key, ext)
+
+    def tee(self, key, ext, chunks):
+        """Yield `chunks` unchanged, keeping the file only if all of them went out."""
+        try:
+            f, tmp = self._temp()
+        except OSError:
+            yield from chunks
+            return
+        complete = False
+        try:
+            with f:
+                for chunk in chunks:
+                    f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                try:
+                    self._commit(tmp, key, ext)
+                except OSError:
+                    _discard(tmp)
+            else:
+                _discard(tmp)   # client went away or rendering failed
+
+    def _evict(self):
+        """Delete least recently used files until the directory fits in max_bytes."""
+        if not self._evict_lock.acquire(blocking=False):
+            return   # another thread is already at it
+        try:
+            entries, total = [], 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.part'):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                _discard(path)
+                total -= size
+                metrics.incr(f'{self.name}.evictions')
+        except OSError:
+            pass
+        finally:
+            self._evict_lock.release()
+
+    def stats(self):
+        files, total = 0, 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith('.part'):
+                        files += 1
+                        total += entry.stat().st_size
+        except OSError:
+            pass
+        return {'files': files, 'bytes': total, 'max_bytes': self.max_bytes}
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+cache = ExportCache()
+
+
+def not_modified(key):
+    """304 for a request that already has the export with ETag `key`, else None."""
+    if request.if_none_match.contains_weak(key):   # weak: compressed copies carry W/"key"
+        metrics.incr('export_cache.not_modified')
+        return '', 304, {'ETag': f'"{key}"', 'Cache-Control': 'private, no-cache'}
+    return None
+
+
+def send(path, key, mimetype, download_name):
+    """Download response for a cached export file."""
+    response = send_file(path, mimetype=mimetype, as_attachment=True,
+                         download_name=download_name, etag=key, max_age=0)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cached_export(kind, ext, mimetype, download_name, version):
+    """Serve the decorated export view through the cache; see the module docstring."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                token = version(request.args)
+            except Exception as e:
+                print(f"Export version check failed ({kind}): {e}")
+                token = None
+            if token is None:
+                metrics.incr('export_cache.bypass')
+                return f(*args, **kwargs)
+
+            key = cache.key(kind, request.args, token)
+            response = not_modified(key)
+            if response is not None:
+                return response
+            path = cache.lookup(key, ext)
+            if path is not None:
+                metrics.incr('export_cache.hits')
+                return send(path, key, mimetype, download_name)
+
+            metrics.incr('export_cache.misses')
+            response = f(*args, **kwargs)
+            if getattr(response, 'status_code', None) != 200:
+                return response   # errors come back as (body, status) tuples or non-200 responses
+            if response.is_streamed:
+                response.response = cache.tee(key, ext, response.response)
+            else:
+                cache.store(key, ext, response.get_data())
+            response.set_etag(key)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated
+    return decorator
+
+
+metrics.register_gauge('export_cache', cache.stats)
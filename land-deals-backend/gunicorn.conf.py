@@ -0,0 +1,75 @@
+# gunicorn.conf.py - Production server settings
+#
+# Run from land-deals-backend/:  gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Every setting can be overridden from the environment (including the .env
+# file read by load_env_file()). Defaults:
+#   threads = DB_POOL_SIZE           one pooled connection per request thread
+#   workers = min(2 * CPUs + 1, DB_MAX_CONNECTIONS // DB_POOL_SIZE)
+# so the total number of DB connections stays within what the server allows.
+import gc
+import multiprocessing
+import os
+
+from config import load_env_file, env_int, env_bool
+
+load_env_file()
+
+_cpus = multiprocessing.cpu_count()
+_pool_size = max(1, env_int('DB_POOL_SIZE', 5))
+_db_max_connections = env_int('DB_MAX_CONNECTIONS', 20)
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+worker_class = 'gthread'
+threads = env_int('WEB_THREADS', _pool_size)
+workers = env_int('WEB_CONCURRENCY', max(1, min(2 * _cpus + 1, _db_max_connections // _pool_size)))
+
+# Import the app once in the master so workers share its memory copy-on-write
+preload_app = env_bool('WEB_PRELOAD', True)
+
+# Recycle workers periodically to bound memory growth; jitter avoids all
+# workers restarting at the same moment
+max_requests = env_int('WEB_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('WEB_MAX_REQUESTS_JITTER', 100)
+
+timeout = env_int('WEB_TIMEOUT', 60)
+graceful_timeout = env_int('WEB_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('WEB_KEEPALIVE', 5)
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = os.environ.get('WEB_ERROR_LOG', '-')
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    server.log.info(f"Serving with {workers} workers x {threads} threads (DB pool {_pool_size}, {_cpus} CPUs)")
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far (the preloaded app) into the permanent
+    # generation: the collector then never touches those objects, so their
+    # pages are not dirtied and stay shared with the master after fork.
+    gc.collect()
+    gc.freeze()
+
+
+def worker_int(worker):
+    worker.log.info(f"Worker {worker.pid} interrupted, finishing in-flight requests")
+
+
+def worker_exit(server, worker):
+    try:
+        from db import close_db_pool
+        close_db_pool()
+    except Exception as e:
+        server.log.warning(f"Failed to release DB pool for worker {worker.pid}: {e}")
+    try:
+        from users.passwords import shutdown
+        shutdown()
+    except Exception as e:
+        server.log.warning(f"Failed to stop password hashing pool for worker {worker.pid}: {e}")
+    try:
+        from reports.consolidated import shutdown
+        shutdown()
+    except Exception as e:
+        server.log.warning(f"Failed to stop report rendering pool for worker {worker.pid}: {e}")
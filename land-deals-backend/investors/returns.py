@@ -0,0 +1,254 @@
+# investors/returns.py - Investor returns: XIRR, MOIC, realized/unrealized profit
+#
+# Cash flows come from payment_parties rows with party_type 'investor'
+# (party_id = investors.id): role 'payer' is money the investor put in,
+# 'payee' money paid out to them. An investor with no such rows is treated as
+# having contributed investment_amount on the day the row was created.
+#
+# While a deal is open the investor's position is valued at its
+# investment_percentage of the deal's selling (else purchase) amount, less
+# what was already paid out; that value is the final flow of the XIRR and the
+# unrealized part of the profit. Closed deals have nothing left unrealized.
+#
+# XIRR for every investor is solved at once: flows are padded into a matrix
+# and a vectorized Newton iteration runs on all rows, with a vectorized
+# bisection for rows where Newton does not converge.
+#
+# Results are cached per deal and invalidated when the deal is written to
+# (bump()) or after RETURNS_CACHE_SECONDS, which bounds staleness for writes
+# made by other workers.
+import threading
+import time
+from datetime import date, datetime
+
+import mysql.connector
+
+import metrics
+from config import env_int
+
+RETURNS_CACHE_SECONDS = env_int('RETURNS_CACHE_SECONDS', 60)
+
+# Deals in these states have no remaining (unrealized) value
+CLOSED_STATUSES = {'closed', 'completed', 'sold', 'cancelled'}
+
+_lock = threading.Lock()
+_versions = {}     # deal_id -> version, bumped on writes
+_epoch = 0         # bumped by bump(None): part of every deal's version
+_generation = 0    # bumped with every deal version; keys the all-investors entry
+_cache = {}        # deal_id -> ((epoch, version), expires_at, {investor_id: result})
+_all = None        # (generation, expires_at, {investor_id: result}) for every deal
+
+
+def bump(deal_id=None):
+    """Invalidate the cached returns of `deal_id` (None: every deal)."""
+    global _generation, _epoch, _all
+    with _lock:
+        if deal_id is None:
+            _epoch += 1
+            _cache.clear()
+        else:
+            _versions[deal_id] = _versions.get(deal_id, 0) + 1
+            _cache.pop(deal_id, None)
+        _generation += 1
+        _all = None
+
+
+def xirr(amounts, years, tol=1e-7, max_newton=50, max_bisect=200):
+    """Vectorized XIRR.
+
+    amounts, years: 2-D arrays (one row per investor, zero-padded) of flow
+    amounts and their time in years from the row's first flow. Returns an
+    array of annual rates, NaN where no rate exists (flows all one sign).
+    """
+    import numpy as np  # only the returns endpoints need it; keep it off the cold-start path
+
+    amounts = np.asarray(amounts, dtype=float)
+    years = np.asarray(years, dtype=float)
+    n = amounts.shape[0]
+    rate = np.full(n, 0.1)
+    has_root = (amounts > 0).any(axis=1) & (amounts < 0).any(axis=1)
+    done = ~has_root
+
+    def npv(r):
+        return (amounts * (1.0 + r[:, None]) ** -years).sum(axis=1)
+
+    with np.errstate(all='ignore'):
+        for _ in range(max_newton):
+            if done.all():
+                break
+            growth = (1.0 + rate[:, None]) ** -years
+            f = (amounts * growth).sum(axis=1)
+            df = (-years * amounts * growth / (1.0 + rate[:, None])).sum(axis=1)
+            step = np.where(done | (df == 0), 0.0, f / df)
+            rate = np.clip(rate - step, -0.999999, 1e6)
+            done |= np.abs(step) < tol
+
+        # Newton can wander off for unusual flow patterns: bisect those rows
+        bad = has_root & (~done | ~np.isfinite(rate) | (np.abs(npv(rate)) > 1e-4 * np.abs(amounts).sum(axis=1)))
+        if bad.any():
+            lo = np.full(n, -0.999999)
+            hi = np.full(n, 1e4)
+            f_lo = npv(lo)
+            bad &= np.sign(f_lo) != np.sign(npv(hi))
+            for _ in range(max_bisect):
+                mid = (lo + hi) / 2
+                f_mid = npv(mid)
+                left = np.sign(f_mid) == np.sign(f_lo)
+                lo = np.where(left, mid, lo)
+                f_lo = np.where(left, f_mid, f_lo)
+                hi = np.where(left, hi, mid)
+            rate = np.where(bad, (lo + hi) / 2, rate)
+            done |= bad
+
+    rate[~(has_root & done)] = np.nan
+    return rate
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else None
+
+
+def _load(cursor, deal_ids):
+    """Investor rows and their cash flows for `deal_ids` (None = all deals)."""
+    deal_filter, params = '', []
+    if deal_ids is not None:
+        deal_filter = f"WHERE i.deal_id IN ({','.join(['%s'] * len(deal_ids))})"
+        params = list(deal_ids)
+    cursor.execute(f"""
+        SELECT i.id, i.deal_id, i.investment_amount, i.investment_percentage, i.created_at,
+               d.status, d.purchase_amount, d.selling_amount
+        FROM investors i JOIN deals d ON d.id = i.deal_id
+        {deal_filter}
+    """, params)
+    investors = cursor.fetchall()
+
+    flow_sql = """
+        SELECT pp.party_id AS investor_id, p.payment_date, pp.role,
+               COALESCE(pp.amount, p.amount * pp.percentage / 100, p.amount) AS amount
+        FROM payment_parties pp
+        JOIN payments p ON p.id = pp.payment_id
+        JOIN investors i ON i.id = pp.party_id AND i.deal_id = p.deal_id
+        WHERE pp.party_type = 'investor' AND pp.role IN ('payer', 'payee') {settled}
+        {deal_filter}
+    """.replace('{deal_filter}', deal_filter.replace('WHERE', 'AND'))
+    try:
+        # only settled payments count when the status column exists
+        cursor.execute(flow_sql.format(settled="AND COALESCE(p.status, 'paid') = 'paid'"), params)
+    except mysql.connector.Error as e:
+        if e.errno != 1054:
+            raise
+        cursor.execute(flow_sql.format(settled=''), params)
+    flows = {}
+    for row in cursor.fetchall():
+        day = _as_date(row['payment_date'])
+        if day is None or row['amount'] is None:
+            continue
+        sign = -1.0 if row['role'] == 'payer' else 1.0
+        flows.setdefault(row['investor_id'], []).append((day, sign * float(row['amount'])))
+    return investors, flows
+
+
+def compute(investors, flows, as_of=None):
+    """{investor_id: returns} for investor rows and {investor_id: [(date, amount)]}."""
+    import numpy as np
+
+    as_of = as_of or date.today()
+    ids, rows = [], []
+    results = {}
+    for inv in investors:
+        inv_flows = list(flows.get(inv['id'], []))
+        if not any(a < 0 for _, a in inv_flows) and inv['investment_amount']:
+            # no recorded contributions: fall back to the declared investment
+            inv_flows.append((_as_date(inv['created_at']) or as_of, -float(inv['investment_amount'])))
+        contributed = -sum((a for _, a in inv_flows if a < 0), 0.0)
+        distributed = sum((a for _, a in inv_flows if a > 0), 0.0)
+
+        closed = (inv['status'] or '').lower() in CLOSED_STATUSES
+        deal_value = float(inv['selling_amount'] or inv['purchase_amount'] or 0)
+        share = float(inv['investment_percentage'] or 0) / 100
+        unrealized_value = 0.0 if closed else max(share * deal_value - distributed, 0.0)
+
+        # cost basis is split between the realized and unrealized parts in
+        # proportion to their value
+        total_value = distributed + unrealized_value
+        realized_cost = contributed * (distributed / total_value) if total_value else contributed
+        results[inv['id']] = {
+            'contributed': round(contributed, 2),
+            'distributed': round(distributed, 2),
+            'unrealized_value': round(unrealized_value, 2),
+            'realized_profit': round(distributed - realized_cost, 2),
+            'unrealized_profit': round(unrealized_value - (contributed - realized_cost), 2),
+            'moic': round(total_value / contributed, 4) if contributed else None,
+            'xirr': None,
+            'cash_flows': len(inv_flows),
+            'as_of': as_of.isoformat(),
+        }
+        if unrealized_value > 0:
+            inv_flows.append((as_of, unrealized_value))
+        if inv_flows:
+            ids.append(inv['id'])
+            rows.append(sorted(inv_flows))
+
+    if rows:
+        width = max(len(r) for r in rows)
+        amounts = np.zeros((len(rows), width))
+        years = np.zeros((len(rows), width))
+        for i, r in enumerate(rows):
+            start = r[0][0]
+            amounts[i, :len(r)] = [a for _, a in r]
+            years[i, :len(r)] = [(d - start).days / 365.0 for d, _ in r]
+        for investor_id, rate in zip(ids, xirr(amounts, years)):
+            results[investor_id]['xirr'] = None if np.isnan(rate) else round(float(rate), 6)
+    return results
+
+
+def returns_for(cursor, deal_ids=None):
+    """{investor_id: returns} for the investors of `deal_ids` (None = all deals).
+
+    Cached deals are served from memory; the rest are loaded and solved in
+    one batch.
+    """
+    global _all
+    now = time.monotonic()
+    with _lock:
+        generation, epoch, versions = _generation, _epoch, dict(_versions)
+        if deal_ids is None:
+            if _all and _all[0] == generation and _all[1] > now:
+                metrics.incr('returns.cache_hits')
+                return dict(_all[2])
+            stale = None
+            results = {}
+        else:
+            results, stale = {}, []
+            for deal_id in deal_ids:
+                entry = _cache.get(deal_id)
+                if entry and entry[0] == (epoch, versions.get(deal_id, 0)) and entry[1] > now:
+                    results.update(entry[2])
+                else:
+                    stale.append(deal_id)
+            if not stale:
+                metrics.incr('returns.cache_hits')
+                return results
+
+    metrics.incr('returns.cache_misses')
+    started = time.perf_counter()
+    investors, flows = _load(cursor, stale)
+    computed = compute(investors, flows)
+    metrics.observe('returns.compute_seconds', time.perf_counter() - started)
+
+    by_deal = {deal_id: {} for deal_id in (stale or [])}
+    for inv in investors:
+        by_deal.setdefault(inv['deal_id'], {})[inv['id']] = computed[inv['id']]
+    expires = time.monotonic() + RETURNS_CACHE_SECONDS
+    with _lock:
+        for deal_id, deal_results in by_deal.items():
+            # a deal written to (or bump(None)) while we were computing stays uncached
+            version = (epoch, versions.get(deal_id, 0))
+            if (_epoch, _versions.get(deal_id, 0)) == version:
+                _cache[deal_id] = (version, expires, deal_results)
+        if stale is None and _generation == generation:
+            _all = (generation, expires, computed)
+    results.update(computed)
+    return results
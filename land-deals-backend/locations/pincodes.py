@@ -0,0 +1,261 @@
+# locations/pincodes.py - Offline pincode -> district -> state resolver
+#
+# The dataset is a compact binary file (locations/data/pincodes.bin) opened
+# with mmap, so lookups never leave the process and workers share its pages.
+# Layout (little endian):
+#
+#   header    '<4sHHHII'  magic, format version, #states, #districts, #pincodes, #string bytes
+#   states    '<IH'       name offset, name length                   (sorted by name)
+#   districts '<HIH'      state index, name offset, name length      (sorted by normalized name)
+#   pincodes  '<IH'       pincode, district index                    (sorted by pincode)
+#   strings   UTF-8 names
+#
+# States and districts (a few hundred entries) are decoded into lists when the
+# file is opened; the pincode table is binary searched in place.
+#
+# Rebuild it from CSV files (India Post "All India Pincode Directory" exports
+# or simple pincode,district,state files; blank pincodes add a district only):
+#
+#   python -m locations.pincodes build locations/data/pincodes_seed.csv all_india_pincode.csv
+#
+# Running workers keep the file they opened; restart them to pick up a rebuild.
+#
+# The bundled file is built from pincodes_seed.csv alone: every district, but
+# only a sample of pincodes. An index with fewer than PINCODE_COMPLETE_COUNT
+# pincodes (the India Post directory lists about 19,000) is flagged
+# incomplete, and a pincode missing from it may well exist.
+import argparse
+import bisect
+import csv
+import mmap
+import os
+import struct
+import sys
+import threading
+from collections import Counter
+
+from config import env_int
+from locations.registry import normalize
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+PINCODE_DATA = os.environ.get('PINCODE_DATA', os.path.join(DATA_DIR, 'pincodes.bin'))
+PINCODE_COMPLETE_COUNT = env_int('PINCODE_COMPLETE_COUNT', 19000)
+
+MAGIC = b'LDPC'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sHHHII')
+_STATE = struct.Struct('<IH')
+_DISTRICT = struct.Struct('<HIH')
+_PINCODE = struct.Struct('<IH')
+
+# Accepted CSV headers (compared case-insensitively)
+_PINCODE_COLUMNS = ('pincode', 'pin', 'pin_code')
+_DISTRICT_COLUMNS = ('district', 'districtname', 'district_name')
+_STATE_COLUMNS = ('statename', 'state', 'state_name')
+
+
+def _display(name):
+    # India Post exports are upper case; store them title-cased like the rest of the app
+    name = ' '.join(name.split())
+    return name.title() if name.isupper() else name
+
+
+class PincodeIndex:
+    def __init__(self, path=PINCODE_DATA):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_states, n_districts, n_pincodes, n_strings = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a pincode index (format {FORMAT_VERSION})')
+        offset = _HEADER.size
+        strings = offset + n_states * _STATE.size + n_districts * _DISTRICT.size + n_pincodes * _PINCODE.size
+
+        def text(off, length):
+            return self._mm[strings + off:strings + off + length].decode('utf-8')
+
+        self.states = []
+        for i in range(n_states):
+            self.states.append(text(*_STATE.unpack_from(self._mm, offset + i * _STATE.size)))
+        offset += n_states * _STATE.size
+
+        self.districts = []        # [(name, state index)], sorted by normalized name
+        for i in range(n_districts):
+            state_idx, off, length = _DISTRICT.unpack_from(self._mm, offset + i * _DISTRICT.size)
+            self.districts.append((text(off, length), state_idx))
+        offset += n_districts * _DISTRICT.size
+
+        self._district_keys = [normalize(name) for name, _ in self.districts]
+        self._state_by_key = {normalize(name): i for i, name in enumerate(self.states)}
+        self._districts_by_state = {}
+        for name, state_idx in self.districts:
+            self._districts_by_state.setdefault(state_idx, []).append(name)
+        self._pincodes_at = offset
+        self.pincode_count = n_pincodes
+        self.complete = n_pincodes >= PINCODE_COMPLETE_COUNT
+        if not self.complete:
+            print(f"Pincode index {path} lists only {n_pincodes} pincodes; rebuild it from the "
+                  f"India Post directory (see locations/pincodes.py) for full coverage")
+
+    def close(self):
+        self._mm.close()
+
+    def lookup(self, pincode):
+        """{'pincode', 'district', 'state'} for a 6 digit pincode, or None."""
+        try:
+            pincode = int(str(pincode).strip())
+        except ValueError:
+            return None
+        lo, hi = 0, self.pincode_count
+        base, size, unpack = self._pincodes_at, _PINCODE.size, _PINCODE.unpack_from
+        while lo < hi:
+            mid = (lo + hi) // 2
+            code, district_idx = unpack(self._mm, base + mid * size)
+            if code < pincode:
+                lo = mid + 1
+            elif code > pincode:
+                hi = mid
+            else:
+                district, state_idx = self.districts[district_idx]
+                return {'pincode': f'{code:06d}', 'district': district, 'state': self.states[state_idx]}
+        return None
+
+    def districts_by_prefix(self, prefix, state=None, limit=20):
+        """Districts whose name starts with `prefix`, optionally within one state."""
+        key = normalize(prefix)
+        state_idx = self._state_by_key.get(normalize(state)) if state else None
+        if state and state_idx is None:
+            return []
+        results = []
+        i = bisect.bisect_left(self._district_keys, key)
+        while i < len(self._district_keys) and self._district_keys[i].startswith(key) and len(results) < limit:
+            name, s = self.districts[i]
+            if state_idx is None or s == state_idx:
+                results.append({'district': name, 'state': self.states[s]})
+            i += 1
+        return results
+
+    def districts_in_state(self, state):
+        """District names of `state` (any case/spacing); None for an unknown state."""
+        state_idx = self._state_by_key.get(normalize(state))
+        if state_idx is None:
+            return None
+        return list(self._districts_by_state.get(state_idx, []))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide index for PINCODE_DATA, opened on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PincodeIndex(PINCODE_DATA)
+    return _index
+
+
+def _column(fieldnames, candidates):
+    lowered = {name.strip().lower(): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def read_rows(path):
+    """Yield (pincode or None, district, state) from a CSV file."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        pin_col = _column(reader.fieldnames or [], _PINCODE_COLUMNS)
+        district_col = _column(reader.fieldnames or [], _DISTRICT_COLUMNS)
+        state_col = _column(reader.fieldnames or [], _STATE_COLUMNS)
+        if not district_col or not state_col:
+            raise ValueError(f'{path}: needs district and state columns, found {reader.fieldnames}')
+        for row in reader:
+            district = _display(row.get(district_col) or '')
+            state = _display(row.get(state_col) or '')
+            if not district or not state:
+                continue
+            raw_pin = (row.get(pin_col) or '').strip() if pin_col else ''
+            pincode = int(raw_pin) if raw_pin.isdigit() and len(raw_pin) == 6 else None
+            yield pincode, district, state
+
+
+def build(rows, output=PINCODE_DATA):
+    """Write the binary index for `rows` of (pincode, district, state).
+
+    A pincode listed under several districts (post offices on a boundary) is
+    assigned to the district with the most rows. The file is replaced
+    atomically, so a worker opening it never sees a partial write.
+    """
+    states = {}       # key -> display name (first spelling wins)
+    districts = {}    # (state key, district key) -> display name
+    votes = {}        # pincode -> Counter((state key, district key))
+    for pincode, district, state in rows:
+        s_key, d_key = normalize(state), normalize(district)
+        states.setdefault(s_key, state)
+        districts.setdefault((s_key, d_key), district)
+        if pincode is not None:
+            votes.setdefault(pincode, Counter())[(s_key, d_key)] += 1
+
+    strings = bytearray()
+
+    def add_string(value):
+        data = value.encode('utf-8')
+        off = len(strings)
+        strings.extend(data)
+        return off, len(data)
+
+    state_keys = sorted(states, key=lambda k: (k, states[k]))
+    state_idx = {k: i for i, k in enumerate(state_keys)}
+    district_keys = sorted(districts, key=lambda k: (k[1], k[0]))
+    district_idx = {k: i for i, k in enumerate(district_keys)}
+    if len(state_keys) > 0xFFFF or len(district_keys) > 0xFFFF:
+        raise ValueError('too many states/districts for the index format')
+
+    body = bytearray()
+    for k in state_keys:
+        body += _STATE.pack(*add_string(states[k]))
+    for k in district_keys:
+        body += _DISTRICT.pack(state_idx[k[0]], *add_string(districts[k]))
+    for pincode in sorted(votes):
+        body += _PINCODE.pack(pincode, district_idx[votes[pincode].most_common(1)[0][0]])
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(state_keys), len(district_keys), len(votes), len(strings))
+    tmp = f'{output}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header + body + strings)
+    os.replace(tmp, output)
+    return {'states': len(state_keys), 'districts': len(district_keys), 'pincodes': len(votes),
+            'bytes': len(header) + len(body) + len(strings)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query the offline pincode index')
+    sub = parser.add_subparsers(dest='command', required=True)
+    b = sub.add_parser('build', help='rebuild the index from CSV files')
+    b.add_argument('sources', nargs='+', help='CSV files with pincode/district/state columns')
+    b.add_argument('--output', default=PINCODE_DATA)
+    q = sub.add_parser('lookup', help='resolve a pincode or district prefix')
+    q.add_argument('query')
+    q.add_argument('--data', default=PINCODE_DATA)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        def rows():
+            for source in args.sources:
+                yield from read_rows(source)
+        stats = build(rows(), args.output)
+        print(f"Wrote {args.output}: {stats['pincodes']} pincodes, {stats['districts']} districts, "
+              f"{stats['states']} states ({stats['bytes']} bytes)")
+    else:
+        index = PincodeIndex(args.data)
+        result = index.lookup(args.query) if args.query.isdigit() else index.districts_by_prefix(args.query)
+        print(result)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
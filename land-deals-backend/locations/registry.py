@@ -0,0 +1,154 @@
+# locations/registry.py - In-process cache of the states and districts tables
+#
+# Both tables are tiny and almost never change, so each process keeps them in
+# dictionaries keyed by normalized name (case and whitespace insensitive) and
+# resolves names without a query. Missing names are inserted with a single
+# INSERT ... ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id), which returns
+# the id of either the new or the already existing row, so concurrent saves
+# of the same name converge on one row without a SELECT first.
+import hashlib
+import json
+import threading
+import time
+
+import metrics
+from config import env_int
+
+# Reload interval, so rows added by other workers show up in the lists (seconds)
+LOCATIONS_REFRESH_SECONDS = env_int('LOCATIONS_REFRESH_SECONDS', 300)
+
+
+def normalize(name):
+    """Lookup key for a location name: trimmed, inner whitespace collapsed, casefolded."""
+    return ' '.join(str(name).split()).casefold()
+
+
+def _clean(name):
+    return ' '.join(str(name).split())
+
+
+def _pair(row, *keys):
+    # cursor may be dictionary or tuple depending on cursor type
+    return tuple(row[k] for k in keys) if isinstance(row, dict) else tuple(row)
+
+
+class LocationRegistry:
+    def __init__(self, refresh_seconds=LOCATIONS_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._states = {}        # key -> (id, name)
+        self._districts = {}     # (state_id, key) -> (id, name)
+        self._loaded_at = None
+        self._stale = True
+        self._payload = None     # cached list payload, rebuilt after a change
+
+    def needs_load(self):
+        return (self._stale or self._loaded_at is None
+                or time.monotonic() - self._loaded_at >= self.refresh_seconds)
+
+    def load(self, cursor):
+        """(Re)load both tables through `cursor`."""
+        cursor.execute("SELECT id, name FROM states")
+        states = {}
+        for state_id, name in (_pair(r, 'id', 'name') for r in cursor.fetchall()):
+            states[normalize(name)] = (state_id, name)
+        cursor.execute("SELECT id, state_id, name FROM districts")
+        districts = {}
+        for district_id, state_id, name in (_pair(r, 'id', 'state_id', 'name') for r in cursor.fetchall()):
+            districts[(state_id, normalize(name))] = (district_id, name)
+        with self._lock:
+            changed = states != self._states or districts != self._districts
+            self._states = states
+            self._districts = districts
+            self._loaded_at = time.monotonic()
+            self._stale = False
+            if changed:
+                self._payload = None
+        metrics.incr('locations.loads')
+
+    def _ensure_loaded(self, cursor):
+        if self.needs_load():
+            self.load(cursor)
+
+    def state_id(self, cursor, name):
+        """Id of state `name`, inserting it when missing. None for a blank name."""
+        if not name or not str(name).strip():
+            return None
+        self._ensure_loaded(cursor)
+        key = normalize(name)
+        hit = self._states.get(key)
+        if hit:
+            metrics.incr('locations.hits')
+            return hit[0]
+        cursor.execute(
+            "INSERT INTO states (name) VALUES (%s) ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)",
+            (_clean(name),)
+        )
+        return self._remember(cursor, self._states, key, name)
+
+    def district_id(self, cursor, state_id, name):
+        """Id of district `name` in `state_id`, inserting it when missing."""
+        if not state_id or not name or not str(name).strip():
+            return None
+        self._ensure_loaded(cursor)
+        key = (state_id, normalize(name))
+        hit = self._districts.get(key)
+        if hit:
+            metrics.incr('locations.hits')
+            return hit[0]
+        cursor.execute(
+            "INSERT INTO districts (state_id, name) VALUES (%s, %s) ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)",
+            (state_id, _clean(name))
+        )
+        return self._remember(cursor, self._districts, key, name)
+
+    def find_state_id(self, cursor, name):
+        """Id of an existing state called `name`, None when there is none (never inserts)."""
+        self._ensure_loaded(cursor)
+        hit = self._states.get(normalize(name))
+        return hit[0] if hit else None
+
+    def find_district_ids(self, cursor, name, state_ids=None):
+        """Ids of the existing districts called `name`, in any of `state_ids` when given."""
+        self._ensure_loaded(cursor)
+        key = normalize(name)
+        with self._lock:
+            return [district_id for (state_id, k), (district_id, _) in self._districts.items()
+                    if k == key and (state_ids is None or state_id in state_ids)]
+
+    def _remember(self, cursor, table, key, name):
+        row_id = cursor.lastrowid
+        metrics.incr('locations.misses')
+        with self._lock:
+            if cursor.rowcount == 1:
+                # A new row only exists once the caller's transaction commits,
+                # so it is not cached here; the next lookup reloads instead.
+                self._stale = True
+            else:
+                # 0 affected rows: the row already existed (and is committed)
+                table[key] = (row_id, _clean(name))
+                self._payload = None
+        return row_id
+
+    def payload(self):
+        """(etag, body) for the location list: states with their districts.
+
+        The ETag is a hash of the content, so every worker hands out the same
+        one for the same data.
+        """
+        with self._lock:
+            if self._payload is None:
+                by_state = {}
+                for (state_id, _), (district_id, name) in self._districts.items():
+                    by_state.setdefault(state_id, []).append({'id': district_id, 'name': name})
+                states = []
+                for state_id, name in sorted(self._states.values(), key=lambda s: s[1].casefold()):
+                    districts = sorted(by_state.get(state_id, []), key=lambda d: d['name'].casefold())
+                    states.append({'id': state_id, 'name': name, 'districts': districts})
+                body = json.dumps({'states': states}, separators=(',', ':'))
+                version = hashlib.sha1(body.encode('utf-8')).hexdigest()[:16]
+                self._payload = (version, states)
+            return self._payload
+
+
+registry = LocationRegistry()
@@ -0,0 +1,96 @@
+# locations/routes.py - State/district lists served from the location registry
+from flask import Blueprint, jsonify, request
+
+from db import get_db, read_only
+from locations.pincodes import get_index as get_pincode_index
+from locations.registry import normalize, registry
+
+bp = Blueprint('locations', __name__)
+
+
+def _loaded_registry():
+    # only touches the database when the cached tables are due for a reload
+    if registry.needs_load():
+        cursor = get_db().cursor()
+        try:
+            registry.load(cursor)
+        finally:
+            cursor.close()
+    return registry
+
+
+def _conditional(version, body):
+    """JSON response tagged with the registry version; 304 when the client has it."""
+    response = jsonify(dict(body, version=version))
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response.make_conditional(request)
+
+
+@bp.route('/api/locations', methods=['GET'])
+@read_only
+def get_locations():
+    """All states with their districts."""
+    try:
+        version, states = _loaded_registry().payload()
+        return _conditional(version, {'states': states})
+    except Exception as e:
+        return jsonify({'error': f'Failed to load locations: {str(e)}'}), 500
+
+
+@bp.route('/api/locations/states', methods=['GET'])
+@read_only
+def get_states():
+    try:
+        version, states = _loaded_registry().payload()
+        return _conditional(version, {'states': [{'id': s['id'], 'name': s['name']} for s in states]})
+    except Exception as e:
+        return jsonify({'error': f'Failed to load states: {str(e)}'}), 500
+
+
+@bp.route('/api/locations/districts', methods=['GET'])
+@read_only
+def get_districts():
+    """Districts of one state, selected by ?state_id= or ?state= (name)."""
+    state_id = request.args.get('state_id', type=int)
+    state_name = request.args.get('state')
+    if not state_id and not state_name:
+        return jsonify({'error': 'state_id or state is required'}), 400
+    try:
+        version, states = _loaded_registry().payload()
+        for s in states:
+            if s['id'] == state_id or (state_name and normalize(s['name']) == normalize(state_name)):
+                return _conditional(version, {'state': {'id': s['id'], 'name': s['name']},
+                                              'districts': s['districts']})
+        return jsonify({'error': 'State not found'}), 404
+    except Exception as e:
+        return jsonify({'error': f'Failed to load districts: {str(e)}'}), 500
+
+
+@bp.route('/api/locations/pincode/<pincode>', methods=['GET'])
+def resolve_pincode(pincode):
+    """District and state for a pincode, from the bundled offline index."""
+    if not (pincode.isdigit() and len(pincode) == 6):
+        return jsonify({'error': 'pincode must be 6 digits'}), 400
+    index = get_pincode_index()
+    result = index.lookup(pincode)
+    if result is None and not index.complete:
+        # maybe not "no such pincode": the bundled dataset only has a sample of them. Still a
+        # 404, as retrying won't help until the index is rebuilt from the full directory
+        return jsonify({'error': 'Pincode not in the bundled dataset, which is incomplete',
+                        'dataset_incomplete': True, 'pincodes_known': index.pincode_count}), 404
+    if result is None:
+        return jsonify({'error': 'Pincode not found'}), 404
+    response = jsonify(result)
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+@bp.route('/api/locations/districts/search', methods=['GET'])
+def search_districts():
+    """Districts starting with ?q=, optionally limited to ?state=."""
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    return jsonify({'districts': get_pincode_index().districts_by_prefix(q, request.args.get('state'), limit)})
@@ -0,0 +1,65 @@
+# metrics.py - Lightweight in-process metrics registry
+#
+# Counters, timers and gauges are kept per process (each WSGI worker reports
+# its own numbers) and exposed as JSON through /api/metrics.
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_timers = {}
+_gauges = {}
+
+
+def incr(name, value=1):
+    """Increment counter `name` by `value`."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, seconds):
+    """Record one timing sample (in seconds) for timer `name`."""
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            t = _timers[name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+        t['count'] += 1
+        t['total'] += seconds
+        if seconds > t['max']:
+            t['max'] = seconds
+
+
+def register_gauge(name, fn):
+    """Register a callable evaluated on every snapshot (e.g. a queue depth)."""
+    with _lock:
+        _gauges[name] = fn
+
+
+def snapshot():
+    """Return a JSON-serializable copy of all metrics."""
+    with _lock:
+        counters = dict(_counters)
+        timers = {}
+        for name, t in _timers.items():
+            timers[name] = {
+                'count': t['count'],
+                'total': round(t['total'], 6),
+                'avg': round(t['total'] / t['count'], 6) if t['count'] else 0.0,
+                'max': round(t['max'], 6),
+            }
+        gauges = dict(_gauges)
+
+    gauge_values = {}
+    for name, fn in gauges.items():
+        try:
+            gauge_values[name] = fn()
+        except Exception as e:
+            gauge_values[name] = f'error: {e}'
+
+    return {'counters': counters, 'timers': timers, 'gauges': gauge_values}
+
+
+def reset():
+    """Clear all counters and timers (gauges stay registered)."""
+    with _lock:
+        _counters.clear()
+        _timers.clear()
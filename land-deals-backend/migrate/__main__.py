@@ -0,0 +1,10 @@
+# python -m migrate - see migrate/runner.py
+import sys
+
+from config import load_env_file
+
+load_env_file()  # before anything reads DB_* / MIGRATE_* settings
+
+from migrate.runner import main  # noqa: E402
+
+sys.exit(main())
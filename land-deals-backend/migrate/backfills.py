@@ -0,0 +1,104 @@
+# migrate/backfills.py - Data backfills run by migrate/runner.py, in version order with migrations/*.sql
+#
+# Each is applied per primary-key range; add new ones to BACKFILLS with a
+# version that sorts after the schema migration it depends on.
+from migrate.runner import Backfill, sql_batch
+
+
+def _payment_categories(conn, start, end):
+    from payments import classifier
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT {classifier.payment_fields(cursor)} FROM payments p WHERE p.id BETWEEN %s AND %s",
+                       (start, end))
+        changes = classifier.classify_rows(cursor, cursor.fetchall())
+        return classifier.store(cursor, changes)
+    finally:
+        cursor.close()
+
+
+def _deal_location_ids(conn, start, end):
+    # Deals saved before the normalized columns existed only carry the names;
+    # add any missing states/districts, then point the deals at them.
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT IGNORE INTO states (name)
+            SELECT DISTINCT TRIM(state) FROM deals
+            WHERE id BETWEEN %s AND %s AND state_id IS NULL AND TRIM(COALESCE(state, '')) <> ''
+        """, (start, end))
+        cursor.execute("""
+            UPDATE deals d JOIN states s ON s.name = TRIM(d.state)
+            SET d.state_id = s.id
+            WHERE d.id BETWEEN %s AND %s AND d.state_id IS NULL
+        """, (start, end))
+        changed = cursor.rowcount
+        cursor.execute("""
+            INSERT IGNORE INTO districts (state_id, name)
+            SELECT DISTINCT state_id, TRIM(district) FROM deals
+            WHERE id BETWEEN %s AND %s AND state_id IS NOT NULL AND district_id IS NULL
+              AND TRIM(COALESCE(district, '')) <> ''
+        """, (start, end))
+        cursor.execute("""
+            UPDATE deals d JOIN districts x ON x.state_id = d.state_id AND x.name = TRIM(d.district)
+            SET d.district_id = x.id
+            WHERE d.id BETWEEN %s AND %s AND d.district_id IS NULL
+        """, (start, end))
+        return changed + cursor.rowcount
+    finally:
+        cursor.close()
+
+
+BACKFILLS = [
+    # was scripts/backfill_payments.py (step 1)
+    Backfill(
+        '20250829_payment_proof_file_names',
+        'payment_proofs.file_name from the basename of file_path',
+        'payment_proofs',
+        sql_batch("""
+            UPDATE payment_proofs
+            SET file_name = SUBSTRING_INDEX(REPLACE(file_path, '\\\\', '/'), '/', -1)
+            WHERE id BETWEEN %s AND %s
+              AND (file_name IS NULL OR file_name = '') AND file_path IS NOT NULL AND file_path <> ''
+        """),
+    ),
+    # was migrate_add_status_and_pay_to.py: paid if the payment date has passed, else pending
+    Backfill(
+        '20250902_payment_status',
+        'payments.status for rows without one',
+        'payments',
+        sql_batch("""
+            UPDATE payments
+            SET status = IF(payment_date <= CURDATE(), 'paid', 'pending')
+            WHERE id BETWEEN %s AND %s AND status IS NULL
+        """),
+    ),
+    # was backfill_payment_roles.py and scripts/backfill_roles.py: buyers and
+    # investors pay, owners are paid (the conservative script's rules are a
+    # subset of these)
+    Backfill(
+        '20250902_payment_party_roles',
+        'payment_parties.role from party_type where missing',
+        'payment_parties',
+        sql_batch("""
+            UPDATE payment_parties
+            SET role = IF(party_type = 'owner', 'payee', 'payer')
+            WHERE id BETWEEN %s AND %s AND role IS NULL
+        """),
+    ),
+    # was scripts/backfill_payments.py (step 2); payments.classifier keeps it current afterwards
+    Backfill(
+        '20261019_payment_classification_backfill',
+        'payments.category for every payment (payments/classifier.py rules)',
+        'payments',
+        _payment_categories,
+    ),
+    # GET /api/deals/search filters on the normalized ids only
+    Backfill(
+        '20261019_deal_location_ids',
+        'deals.state_id/district_id from the state/district names where missing',
+        'deals',
+        _deal_location_ids,
+    ),
+]
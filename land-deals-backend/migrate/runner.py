@@ -0,0 +1,408 @@
+# migrate/runner.py - Versioned schema migrations and resumable, batched backfills
+#
+# Two kinds of migration, each identified by a version string that sorts by date:
+#   - SQL files in migrations/ (version = file name without .sql), applied
+#     one statement at a time;
+#   - backfills (migrate/backfills.py): data changes applied one primary-key
+#     range at a time, usually a single set-based UPDATE per range.
+#
+# schema_migrations records every version applied. A backfill commits each
+# range together with its row in migration_checkpoints, so an interrupted run
+# resumes with exactly the ranges still missing - whatever batch size or
+# worker count it is restarted with.
+#
+# Ranges are spread over MIGRATE_WORKERS threads, each with its own
+# connection. Before a batch the runner checks the read replicas (DB_REPLICAS)
+# and waits while any is more than MIGRATE_MAX_LAG seconds behind.
+#
+# --dry-run prints SQL files' statements instead of running them, and runs
+# backfill batches in transactions that are rolled back, reporting how many
+# rows would change.
+#
+#   python -m migrate status
+#   python -m migrate up [--only VERSION ...] [--dry-run] [--workers N] [--batch-size N]
+import argparse
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import mysql.connector
+
+import metrics
+from config import env_int
+
+MIGRATE_WORKERS = env_int('MIGRATE_WORKERS', 4)
+MIGRATE_BATCH_SIZE = env_int('MIGRATE_BATCH_SIZE', 1000)          # primary-key values per batch
+MIGRATE_MAX_LAG = env_int('MIGRATE_MAX_LAG', 5)                    # seconds a replica may fall behind
+MIGRATE_LAG_CHECK_INTERVAL = env_int('MIGRATE_LAG_CHECK_INTERVAL', 2)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# "already there" errors from re-running DDL: table exists, duplicate column,
+# duplicate key name, can't drop a missing column/key
+_ALREADY_APPLIED = {1050, 1060, 1061, 1091}
+
+_BOOKKEEPING = [
+    """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(128) PRIMARY KEY,
+        kind ENUM('sql','backfill') NOT NULL,
+        description VARCHAR(255) NULL,
+        rows_affected BIGINT NULL,
+        duration_ms INT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS migration_checkpoints (
+        version VARCHAR(128) NOT NULL,
+        range_start BIGINT NOT NULL,
+        range_end BIGINT NOT NULL,
+        rows_affected INT NOT NULL DEFAULT 0,
+        finished_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (version, range_start)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+]
+
+
+class MigrationError(Exception):
+    pass
+
+
+class SqlMigration:
+    kind = 'sql'
+
+    def __init__(self, path):
+        self.path = path
+        self.version = os.path.splitext(os.path.basename(path))[0]
+        self.description = os.path.basename(path)
+
+    def statements(self):
+        with open(self.path, encoding='utf-8') as f:
+            return split_statements(f.read())
+
+
+class Backfill:
+    """A data migration applied to `table` in primary-key ranges.
+
+    apply(conn, start, end) changes the rows with start <= key <= end on
+    `conn` without committing and returns how many it changed; sql_batch()
+    builds one from a single UPDATE statement.
+    """
+    kind = 'backfill'
+
+    def __init__(self, version, description, table, apply, key='id'):
+        self.version = version
+        self.description = description
+        self.table = table
+        self.apply = apply
+        self.key = key
+
+
+def sql_batch(statement):
+    """Backfill apply function running `statement`, whose two %s are the range bounds."""
+    def apply(conn, start, end):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(statement, (start, end))
+            return cursor.rowcount
+        finally:
+            cursor.close()
+    return apply
+
+
+def split_statements(sql):
+    """Statements of a SQL file: `--` comment lines dropped, split on a trailing `;`."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [s.strip() for s in re.split(r';\s*$', '\n'.join(lines), flags=re.M) if s.strip()]
+
+
+def _execute_ddl(cursor, statement):
+    """Run one migration statement; False when it was already applied.
+
+    MySQL has no ADD COLUMN / CREATE INDEX ... IF NOT EXISTS (MariaDB does):
+    on a syntax error the clause is dropped and "already exists" accepted.
+    """
+    try:
+        cursor.execute(statement)
+        return True
+    except mysql.connector.Error as e:
+        if e.errno == 1064 and re.search(r'\bIF\s+NOT\s+EXISTS\b', statement, re.I) \
+                and not re.match(r'\s*CREATE\s+TABLE', statement, re.I):
+            try:
+                cursor.execute(re.sub(r'\s+IF\s+NOT\s+EXISTS\b', '', statement, count=1, flags=re.I))
+                return True
+            except mysql.connector.Error as retry_error:
+                e = retry_error
+        if e.errno in _ALREADY_APPLIED:
+            return False
+        raise
+
+
+def apply_sql_file(conn, path, strict=True, dry_run=False):
+    """Run every statement of `path`. Without `strict`, failing statements are reported and skipped."""
+    cursor = conn.cursor()
+    try:
+        for statement in SqlMigration(path).statements():
+            if dry_run:
+                print(f"  would run: {' '.join(statement.split())[:120]}")
+                continue
+            try:
+                applied = _execute_ddl(cursor, statement)
+            except mysql.connector.Error as e:
+                if strict:
+                    raise MigrationError(f"{os.path.basename(path)}: {e} in: {' '.join(statement.split())[:120]}")
+                print(f"  warning: {e}")
+                continue
+            if cursor.with_rows:
+                cursor.fetchall()
+            if not applied:
+                print(f"  already applied: {' '.join(statement.split())[:80]}")
+        if not dry_run:
+            conn.commit()
+    finally:
+        cursor.close()
+
+
+def available():
+    """Every known migration, in version order."""
+    from migrate.backfills import BACKFILLS
+
+    sql = [SqlMigration(os.path.join(MIGRATIONS_DIR, name))
+           for name in os.listdir(MIGRATIONS_DIR) if name.endswith('.sql')]
+    migrations = sorted(sql + list(BACKFILLS), key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise MigrationError(f'duplicate migration versions: {sorted(v for v in versions if versions.count(v) > 1)}')
+    return migrations
+
+
+def connect():
+    from db import get_db_connection
+    conn = get_db_connection()
+    if conn is None:
+        raise MigrationError('Database connection failed')
+    return conn
+
+
+def _ensure_bookkeeping(conn):
+    cursor = conn.cursor()
+    try:
+        for statement in _BOOKKEEPING:
+            cursor.execute(statement)
+    finally:
+        cursor.close()
+
+
+def applied_versions(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def _record(conn, migration, rows, started):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO schema_migrations (version, kind, description, rows_affected, duration_ms)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (migration.version, migration.kind, migration.description[:255], rows,
+              int((time.perf_counter() - started) * 1000)))
+        cursor.execute("DELETE FROM migration_checkpoints WHERE version = %s", (migration.version,))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def pending_ranges(lo, hi, done, batch_size):
+    """[start, end] batches covering lo..hi that no finished range in `done` covers."""
+    ranges, cursor_at = [], lo
+    for start, end in sorted(done) + [(hi + 1, hi + 1)]:
+        gap_end = min(start - 1, hi)
+        while cursor_at <= gap_end:
+            ranges.append((cursor_at, min(cursor_at + batch_size - 1, gap_end)))
+            cursor_at += batch_size
+        cursor_at = max(cursor_at, end + 1)
+    return ranges
+
+
+class _LagThrottle:
+    """Blocks while a replica is too far behind, checking at most every few seconds."""
+
+    def __init__(self, max_lag):
+        self.max_lag = max_lag
+        self.lock = threading.Lock()
+        self.checked_at = 0.0
+        self.lag = None
+
+    def wait(self):
+        from db import max_replica_lag
+        while True:
+            with self.lock:
+                if time.monotonic() - self.checked_at >= MIGRATE_LAG_CHECK_INTERVAL:
+                    self.lag = max_replica_lag()
+                    self.checked_at = time.monotonic()
+                lag = self.lag
+            if lag is None or lag <= self.max_lag:
+                return
+            metrics.incr('migrate.throttled')
+            print(f"  replicas {lag}s behind (limit {self.max_lag}s): pausing")
+            time.sleep(MIGRATE_LAG_CHECK_INTERVAL)
+
+
+def run_backfill(conn, backfill, workers=MIGRATE_WORKERS, batch_size=MIGRATE_BATCH_SIZE,
+                 max_lag=MIGRATE_MAX_LAG, dry_run=False):
+    """Apply `backfill` to the ranges it hasn't finished yet. Returns the rows changed."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT MIN({backfill.key}), MAX({backfill.key}) FROM {backfill.table}")
+        lo, hi = cursor.fetchone()
+        cursor.execute("SELECT range_start, range_end, rows_affected FROM migration_checkpoints WHERE version = %s",
+                       (backfill.version,))
+        done = cursor.fetchall()
+    finally:
+        cursor.close()
+    if lo is None:
+        return 0
+    ranges = pending_ranges(int(lo), int(hi), [(s, e) for s, e, _ in done], batch_size)
+    previous = sum(rows for _, _, rows in done)
+    if done:
+        print(f"  resuming: {len(done)} ranges done earlier, {len(ranges)} batches left")
+
+    throttle = _LagThrottle(max_lag)
+    local = threading.local()
+    connections = []
+    connections_lock = threading.Lock()
+
+    def batch(start, end):
+        worker_conn = getattr(local, 'conn', None)
+        if worker_conn is None:
+            worker_conn = local.conn = connect()
+            with connections_lock:
+                connections.append(worker_conn)
+        throttle.wait()
+        try:
+            rows = backfill.apply(worker_conn, start, end)
+            if dry_run:
+                worker_conn.rollback()
+                return rows
+            cursor = worker_conn.cursor()
+            try:
+                # the checkpoint commits with the batch: a range is either done and recorded or neither
+                cursor.execute("""
+                    INSERT INTO migration_checkpoints (version, range_start, range_end, rows_affected)
+                    VALUES (%s, %s, %s, %s)
+                """, (backfill.version, start, end, rows))
+            finally:
+                cursor.close()
+            worker_conn.commit()
+            metrics.incr('migrate.batches')
+            return rows
+        except Exception:
+            worker_conn.rollback()
+            raise
+
+    total, finished = 0, 0
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='migrate')
+    try:
+        futures = {pool.submit(batch, start, end): (start, end) for start, end in ranges}
+        for future in as_completed(futures):
+            try:
+                total += future.result()
+            except Exception as e:
+                start, end = futures[future]
+                raise MigrationError(f"{backfill.version}: batch {start}-{end} failed: {e}") from e
+            finished += 1
+            if finished % 50 == 0 or finished == len(ranges):
+                print(f"  {finished}/{len(ranges)} batches, {total} rows")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        for worker_conn in connections:
+            try:
+                worker_conn.close()
+            except Exception:
+                pass
+    return previous + total
+
+
+def migrate(versions=None, dry_run=False, workers=MIGRATE_WORKERS, batch_size=MIGRATE_BATCH_SIZE,
+            max_lag=MIGRATE_MAX_LAG):
+    """Apply pending migrations in version order (only `versions`, when given)."""
+    migrations = available()
+    if versions:
+        unknown = set(versions) - {m.version for m in migrations}
+        if unknown:
+            raise MigrationError(f"unknown migration(s): {', '.join(sorted(unknown))}")
+        migrations = [m for m in migrations if m.version in versions]
+
+    conn = connect()
+    try:
+        _ensure_bookkeeping(conn)
+        done = applied_versions(conn)
+        pending = [m for m in migrations if m.version not in done]
+        if not pending:
+            print('Nothing to apply')
+        for migration in pending:
+            print(f"{'[dry run] ' if dry_run else ''}{migration.version} ({migration.kind}): {migration.description}")
+            started = time.perf_counter()
+            if migration.kind == 'sql':
+                apply_sql_file(conn, migration.path, dry_run=dry_run)
+                rows = None
+            else:
+                rows = run_backfill(conn, migration, workers=workers, batch_size=batch_size,
+                                    max_lag=max_lag, dry_run=dry_run)
+                print(f"  {rows} rows {'would change' if dry_run else 'changed'}")
+            if not dry_run:
+                _record(conn, migration, rows, started)
+        return pending
+    finally:
+        conn.close()
+
+
+def status():
+    """[(version, kind, applied, checkpointed ranges)] for every known migration."""
+    conn = connect()
+    try:
+        _ensure_bookkeeping(conn)
+        done = applied_versions(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT version, COUNT(*) FROM migration_checkpoints GROUP BY version")
+        partial = dict(cursor.fetchall())
+        cursor.close()
+        return [(m.version, m.kind, m.version in done, partial.get(m.version, 0)) for m in available()]
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m migrate', description='Apply schema migrations and backfills')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help='list migrations and whether they are applied')
+    up = sub.add_parser('up', help='apply pending migrations')
+    up.add_argument('--only', action='append', metavar='VERSION', help='apply just this version (repeatable)')
+    up.add_argument('--dry-run', action='store_true', help='show what would change without changing it')
+    up.add_argument('--workers', type=int, default=MIGRATE_WORKERS, help='parallel backfill workers')
+    up.add_argument('--batch-size', type=int, default=MIGRATE_BATCH_SIZE, help='primary-key values per batch')
+    up.add_argument('--max-lag', type=int, default=MIGRATE_MAX_LAG, help='pause while replicas are further behind (s)')
+    args = parser.parse_args(argv)
+
+    from config import load_env_file
+    load_env_file()
+    try:
+        if args.command == 'status':
+            for version, kind, applied, ranges in status():
+                state = 'applied' if applied else (f'in progress ({ranges} ranges done)' if ranges else 'pending')
+                print(f"{version:<50} {kind:<9} {state}")
+        else:
+            migrate(args.only, dry_run=args.dry_run, workers=args.workers, batch_size=args.batch_size,
+                    max_lag=args.max_lag)
+        return 0
+    except (MigrationError, mysql.connector.Error) as e:
+        print(f'Migration failed: {e}')
+        return 1
@@ -0,0 +1,6 @@
+-- Migration: users.role and users.full_name (was migrate_add_roles.py)
+-- Safe to run multiple times
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS role ENUM('admin','auditor','user') DEFAULT 'user';
+ALTER TABLE users ADD COLUMN IF NOT EXISTS full_name VARCHAR(100);
+UPDATE users SET role = 'user' WHERE role IS NULL;
@@ -0,0 +1,5 @@
+-- Migration: payments.category and payment_proofs.file_name (was scripts/migrate_add_columns.py)
+-- Safe to run multiple times
+
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS category ENUM('buy','sell','docs','other') DEFAULT NULL;
+ALTER TABLE payment_proofs ADD COLUMN IF NOT EXISTS file_name VARCHAR(255) AFTER file_path;
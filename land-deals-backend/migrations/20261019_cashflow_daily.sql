@@ -0,0 +1,20 @@
+-- Migration: daily cash-flow rollup behind GET /api/cashflow
+-- Maintained by dashboard/aggregates.py together with the dashboard tables.
+-- Safe to run multiple times.
+
+-- One row per deal, day and breakdown ('' where a value is missing):
+--   source 'payment'  settled payments by mode/type
+--   source 'expense'  expenses by expense_type (stored in payment_type)
+--   source 'party'    payment_parties shares by role (payer/payee)
+CREATE TABLE IF NOT EXISTS cashflow_daily (
+    deal_id INT NOT NULL,
+    day DATE NOT NULL,
+    source ENUM('payment','expense','party') NOT NULL,
+    payment_mode VARCHAR(50) NOT NULL DEFAULT '',
+    payment_type VARCHAR(100) NOT NULL DEFAULT '',
+    party_role VARCHAR(10) NOT NULL DEFAULT '',
+    entry_count INT NOT NULL DEFAULT 0,
+    amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (deal_id, day, source, payment_mode, payment_type, party_role),
+    INDEX idx_cashflow_day (day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
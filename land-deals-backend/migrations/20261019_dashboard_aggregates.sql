@@ -0,0 +1,49 @@
+-- Migration: aggregate tables behind GET /api/dashboard
+-- Maintained by dashboard/aggregates.py: rebuilt periodically and refreshed
+-- per deal after writes. Safe to run multiple times.
+
+-- One row per deal with its money totals
+CREATE TABLE IF NOT EXISTS dashboard_deal_totals (
+    deal_id INT PRIMARY KEY,
+    project_name VARCHAR(255),
+    status VARCHAR(50) NOT NULL DEFAULT '',
+    state VARCHAR(100) NOT NULL DEFAULT '',
+    district VARCHAR(100) NOT NULL DEFAULT '',
+    purchase_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    selling_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    invested_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    investor_count INT NOT NULL DEFAULT 0,
+    expenses_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    payments_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    payment_count INT NOT NULL DEFAULT 0,
+    pending_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    overdue_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    land_purchase_paid DECIMAL(18,2) NOT NULL DEFAULT 0,
+    last_payment_date DATE NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_dashboard_status (status),
+    INDEX idx_dashboard_location (state, district)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Payments per deal by mode / type / status ('' where the value is missing)
+CREATE TABLE IF NOT EXISTS dashboard_deal_payments (
+    deal_id INT NOT NULL,
+    payment_mode VARCHAR(50) NOT NULL DEFAULT '',
+    payment_type VARCHAR(50) NOT NULL DEFAULT '',
+    payment_status VARCHAR(20) NOT NULL DEFAULT '',
+    payment_count INT NOT NULL DEFAULT 0,
+    amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (deal_id, payment_mode, payment_type, payment_status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Bookkeeping for the last full rebuild (single row, id = 1)
+CREATE TABLE IF NOT EXISTS dashboard_refresh_state (
+    id TINYINT PRIMARY KEY,
+    refreshed_at TIMESTAMP NULL,
+    duration_ms INT NULL,
+    deal_count INT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Recent activity lists read the newest rows by primary key; payments by deal
+-- already have idx_payments_deal_id.
+CREATE INDEX IF NOT EXISTS idx_expenses_deal_id ON expenses(deal_id);
@@ -0,0 +1,14 @@
+-- Migration: composite indexes behind GET /api/deals/search (deals/search.py)
+-- Each serves an equality filter plus the default created_at sort, or a range
+-- filter / sort column; InnoDB appends the primary key, which the keyset
+-- pagination uses as tie-breaker. Safe to run multiple times.
+
+CREATE INDEX IF NOT EXISTS idx_deals_created ON deals(created_at);
+CREATE INDEX IF NOT EXISTS idx_deals_status_created ON deals(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_deals_location_created ON deals(state_id, district_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_deals_district_created ON deals(district_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_deals_purchase_date ON deals(purchase_date);
+CREATE INDEX IF NOT EXISTS idx_deals_purchase_amount ON deals(purchase_amount);
+CREATE INDEX IF NOT EXISTS idx_deals_area ON deals(area_unit, total_area);
+CREATE INDEX IF NOT EXISTS idx_deals_taluka_village ON deals(taluka, village);
+CREATE INDEX IF NOT EXISTS idx_deals_project_name ON deals(project_name);
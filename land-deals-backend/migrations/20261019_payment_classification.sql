@@ -0,0 +1,23 @@
+-- Migration: payments.category and the bookkeeping behind payments/classifier.py
+-- Safe to run multiple times (IF NOT EXISTS guards where supported)
+
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS category ENUM('buy','sell','docs','other') DEFAULT NULL;
+-- 'manual' when set through the API; the classifier leaves those alone
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS category_source ENUM('auto','manual') DEFAULT NULL AFTER category;
+
+-- Change tracking for incremental classifier runs
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+ALTER TABLE payment_parties ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_payments_updated_at ON payments(updated_at);
+CREATE INDEX IF NOT EXISTS idx_payment_parties_updated_at ON payment_parties(updated_at);
+CREATE INDEX IF NOT EXISTS idx_payment_proofs_uploaded_at ON payment_proofs(uploaded_at);
+
+-- Watermark of the last classifier run (one row per classifier)
+CREATE TABLE IF NOT EXISTS classifier_state (
+    name VARCHAR(64) PRIMARY KEY,
+    watermark TIMESTAMP NULL,
+    last_payment_id INT NOT NULL DEFAULT 0,
+    rows_changed INT NULL,
+    duration_ms INT NULL,
+    finished_at TIMESTAMP NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,13 @@
+-- Migration: change log behind the global search index (search/index.py)
+-- The worker handling a write records the deal here; the other workers
+-- re-read the deals logged since their last look. Rows older than a day are
+-- pruned by the writers. owners/buyers/investors.deal_id are already indexed
+-- through their foreign keys. Safe to run multiple times.
+
+CREATE TABLE IF NOT EXISTS search_changes (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    deal_id INT NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_search_changes_changed_at (changed_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
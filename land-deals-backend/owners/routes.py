@@ -0,0 +1,350 @@
+# owners/routes.py - Owners and owner documents
+import os
+from datetime import datetime
+
+import mysql.connector
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.utils import secure_filename
+
+from auth import token_required
+from coalesce import coalesced
+from db import get_db, note_written_deals, read_only, unit_of_work
+from owners.suggest import suggestions
+
+bp = Blueprint('owners', __name__)
+
+
+@bp.route('/api/owners', methods=['GET'])
+@token_required
+@coalesced(scope='role')  # same list for everyone
+@read_only
+def get_all_owners(current_user):
+    """Get all owners with their project counts and total investment"""
+    try:
+        connection = get_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        cursor.execute("""
+            SELECT 
+                MIN(o.id) as id,
+                o.name,
+                o.mobile,
+                o.email,
+                o.aadhar_card,
+                o.pan_card,
+                COUNT(DISTINCT o.deal_id) as total_projects,
+                COUNT(DISTINCT CASE WHEN d.status = 'active' THEN d.id END) as active_projects,
+                COALESCE(SUM(CASE WHEN d.status = 'active' THEN d.purchase_amount END), 0) as total_investment
+            FROM owners o
+            LEFT JOIN deals d ON o.deal_id = d.id
+            GROUP BY o.name, o.mobile, o.email, o.aadhar_card, o.pan_card
+            ORDER BY o.name
+        """)
+        owners = cursor.fetchall()
+        
+        return jsonify(owners)
+    
+    except Exception as e:
+        print(f"Error in get_all_owners: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/owners/suggest', methods=['GET'])
+@token_required
+@read_only
+def suggest_owners(current_user):
+    """Existing owners whose name word, mobile or PAN starts with ?q= (?limit=, max 50),
+    for picking an existing_owner_id."""
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    try:
+        if suggestions.needs_load():
+            cursor = get_db().cursor(dictionary=True)
+            suggestions.ensure_loaded(cursor)
+            cursor.close()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'owners': suggestions.suggest(q, limit)})
+
+
+@bp.route('/api/owners/<int:owner_id>', methods=['GET'])
+@token_required
+@read_only
+def get_owner_details(current_user, owner_id):
+    """Get detailed owner information including all their projects"""
+    try:
+        connection = get_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        # Get owner details
+        cursor.execute("""
+            SELECT DISTINCT o.id, o.name, o.mobile, o.email, o.aadhar_card, o.pan_card
+            FROM owners o
+            WHERE o.id = %s
+        """, (owner_id,))
+        owner = cursor.fetchone()
+        
+        if not owner:
+            return jsonify({'error': 'Owner not found'}), 404
+        
+        # Get all projects for this owner (find by matching owner details, not just this ID)
+        cursor.execute("""
+            SELECT DISTINCT
+                d.id,
+                d.project_name,
+                d.state,
+                d.district,
+                d.taluka,
+                d.village,
+                d.total_area,
+                d.area_unit,
+                d.purchase_amount,
+                d.selling_amount,
+                d.purchase_date,
+                d.status,
+                d.created_at
+            FROM deals d
+            INNER JOIN owners o ON d.id = o.deal_id
+            WHERE o.name = %s 
+                AND (o.mobile = %s OR o.mobile IS NULL OR %s IS NULL)
+                AND (o.email = %s OR o.email IS NULL OR %s IS NULL)
+            ORDER BY d.created_at DESC
+        """, (owner['name'], owner['mobile'], owner['mobile'], owner['email'], owner['email']))
+        projects = cursor.fetchall()
+        
+        # Get owner documents - find all owner IDs with same person details
+        documents = []
+        try:
+            # First get all owner IDs for this person
+            cursor.execute("""
+                SELECT DISTINCT o.id
+                FROM owners o
+                WHERE o.name = %s 
+                    AND (o.mobile = %s OR o.mobile IS NULL OR %s IS NULL)
+                    AND (o.email = %s OR o.email IS NULL OR %s IS NULL)
+            """, (owner['name'], owner['mobile'], owner['mobile'], owner['email'], owner['email']))
+            owner_ids = [row['id'] for row in cursor.fetchall()]
+            
+            if owner_ids:
+                # Get documents for all owner IDs
+                placeholders = ','.join(['%s'] * len(owner_ids))
+                cursor.execute(f"""
+                    SELECT id, document_type, document_name, file_path, file_size, 
+                           uploaded_at, uploaded_by
+                    FROM owner_documents 
+                    WHERE owner_id IN ({placeholders})
+                    ORDER BY uploaded_at DESC
+                """, owner_ids)
+                documents = cursor.fetchall()
+        except mysql.connector.Error as e:
+            # If owner_documents table doesn't exist, just return empty documents
+            print(f"Warning: Could not fetch owner documents: {e}")
+            documents = []
+        
+        # Convert datetime objects
+        all_items = projects + documents
+        for item in all_items:
+            if item:
+                for key, value in item.items():
+                    if isinstance(value, datetime):
+                        item[key] = value.isoformat()
+        
+        return jsonify({
+            'owner': owner,
+            'projects': projects,
+            'documents': documents
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/owners', methods=['POST'])
+@token_required
+def create_owner(current_user):
+    """Create a new owner"""
+    try:
+        data = request.get_json()
+        
+        with unit_of_work() as connection:
+            cursor = connection.cursor()
+        
+            cursor.execute("""
+                INSERT INTO owners (deal_id, name, mobile, email, aadhar_card, pan_card, address)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                data.get('deal_id'),
+                data.get('name'),
+                data.get('mobile'),
+                data.get('email'),
+                data.get('aadhar_card'),
+                data.get('pan_card'),
+                data.get('address')
+            ))
+        
+            owner_id = cursor.lastrowid
+            note_written_deals(data.get('deal_id'))
+        
+        return jsonify({'message': 'Owner created successfully', 'owner_id': owner_id})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/owners/<int:owner_id>', methods=['DELETE'])
+@token_required
+def delete_owner(current_user, owner_id):
+    """Delete an owner"""
+    try:
+        with unit_of_work() as connection:
+            cursor = connection.cursor()
+        
+            cursor.execute("SELECT deal_id FROM owners WHERE id = %s", (owner_id,))
+            note_written_deals(*[row[0] for row in cursor.fetchall()])
+            cursor.execute("DELETE FROM owners WHERE id = %s", (owner_id,))
+        
+        return jsonify({'message': 'Owner deleted successfully'})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/owners/<int:owner_id>/documents', methods=['POST'])
+@token_required
+def upload_owner_document(current_user, owner_id):
+    """Upload document for an owner"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        document_type = request.form.get('document_type')
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        connection = get_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        # Get owner name for folder
+        cursor.execute("SELECT name FROM owners WHERE id = %s LIMIT 1", (owner_id,))
+        owner = cursor.fetchone()
+        if not owner:
+            return jsonify({'error': 'Owner not found'}), 404
+        
+        owner_folder_name = f"owner_{owner_id}"
+        
+        # Create folder for the owner
+        owner_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(owner_folder_name))
+        os.makedirs(owner_folder, exist_ok=True)
+        
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(owner_folder, filename)
+        file.save(filepath)
+        
+        # Save to database - handle table not existing
+        try:
+            with unit_of_work():
+                cursor = connection.cursor()
+                cursor.execute("""
+                    INSERT INTO owner_documents (owner_id, document_type, document_name, 
+                                               file_path, file_size, uploaded_by)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (
+                    owner_id,
+                    document_type,
+                    filename,
+                    os.path.relpath(filepath, current_app.config['UPLOAD_FOLDER']),
+                    os.path.getsize(filepath),
+                    current_user
+                ))
+        except mysql.connector.Error as e:
+            # If owner_documents table doesn't exist, return a specific error
+            return jsonify({'error': 'Document management not yet set up. Please contact administrator.'}), 503
+        
+        return jsonify({'message': 'Document uploaded successfully', 'filename': filename})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/owners/<int:owner_id>/documents', methods=['GET'])
+@token_required
+@read_only
+def get_owner_documents(current_user, owner_id):
+    """Get all documents for an owner"""
+    try:
+        connection = get_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        # Check if owner exists and get their details
+        cursor.execute("SELECT id, name, mobile, email FROM owners WHERE id = %s LIMIT 1", (owner_id,))
+        owner = cursor.fetchone()
+        if not owner:
+            return jsonify({'error': 'Owner not found'}), 404
+        
+        # Get documents - find all owner IDs with same person details, then get their documents
+        try:
+            # First get all owner IDs for this person
+            cursor.execute("""
+                SELECT DISTINCT o.id
+                FROM owners o
+                WHERE o.name = %s 
+                    AND (o.mobile = %s OR o.mobile IS NULL OR %s IS NULL)
+                    AND (o.email = %s OR o.email IS NULL OR %s IS NULL)
+            """, (owner['name'], owner['mobile'], owner['mobile'], owner['email'], owner['email']))
+            owner_ids = [row['id'] for row in cursor.fetchall()]
+            
+            documents = []
+            if owner_ids:
+                # Get documents for all owner IDs
+                placeholders = ','.join(['%s'] * len(owner_ids))
+                cursor.execute(f"""
+                    SELECT id, document_type, document_name, file_path, file_size, 
+                           created_at, uploaded_by
+                    FROM owner_documents 
+                    WHERE owner_id IN ({placeholders})
+                    ORDER BY document_type, created_at DESC
+                """, owner_ids)
+                documents = cursor.fetchall()
+            
+            # Group documents by type
+            grouped_docs = {}
+            for doc in documents:
+                doc_type = doc['document_type']
+                if doc_type not in grouped_docs:
+                    grouped_docs[doc_type] = []
+                grouped_docs[doc_type].append({
+                    'id': doc['id'],
+                    'name': doc['document_name'],
+                    'file_path': doc['file_path'],
+                    'file_size': doc['file_size'],
+                    'created_at': doc['created_at'].isoformat() if doc['created_at'] else None,
+                    'uploaded_by': doc['uploaded_by']
+                })
+            
+            return jsonify({
+                'owner': owner,
+                'documents': grouped_docs
+            })
+            
+        except mysql.connector.Error as e:
+            # If owner_documents table doesn't exist, return empty documents
+            return jsonify({
+                'owner': owner,
+                'documents': {}
+            })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.after_app_request
+def invalidate_suggestions(response):
+    """Owner rows change with owner writes and with deal create/update/delete/cleanup."""
+    if (request.blueprint in ('owners', 'deals') and request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and response.status_code < 400):
+        suggestions.invalidate()
+    return response
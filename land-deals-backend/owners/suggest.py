@@ -0,0 +1,120 @@
+# owners/suggest.py - Prefix index over existing owners for GET /api/owners/suggest
+#
+# Owners are grouped the way GET /api/owners groups them (same name, mobile,
+# email, Aadhaar and PAN = one person, represented by the lowest owner id,
+# which is what create_deal's existing_owner_id copies from). Each person is
+# filed under sorted keys - the whole name, every later word of it, the
+# mobile digits and the PAN - so a lookup is a bisect plus a short walk and
+# never touches the database.
+#
+# Owner writes in this worker drop the index (the next lookup reloads it);
+# other workers' writes show up within OWNER_SUGGEST_REFRESH_SECONDS.
+import bisect
+import threading
+import time
+
+import metrics
+from config import env_int
+
+OWNER_SUGGEST_REFRESH_SECONDS = env_int('OWNER_SUGGEST_REFRESH_SECONDS', 60)
+
+# prefix matches looked at before ranking; enough to put the owners on most
+# deals first without walking a whole common surname
+_SCAN_LIMIT = 200
+
+
+def normalize(text):
+    return ' '.join(str(text).split()).casefold() if text else ''
+
+
+def _digits(text):
+    return ''.join(c for c in str(text) if c.isdigit()) if text else ''
+
+
+class OwnerSuggestions:
+    def __init__(self, refresh_seconds=OWNER_SUGGEST_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._keys = []        # sorted lookup keys
+        self._people = []      # parallel to _keys: index into _owners
+        self._owners = []      # [{'id', 'name', 'mobile', 'pan_card', 'deal_count'}]
+        self._loaded_at = None
+        self._generation = 0   # bumped by invalidate(), so a load racing a write doesn't count
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = None
+
+    def needs_load(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at >= self.refresh_seconds
+
+    def load(self, cursor):
+        """(Re)build from the owners table through `cursor`."""
+        started = time.perf_counter()
+        generation = self._generation
+        cursor.execute("""
+            SELECT MIN(id) AS id, name, mobile, pan_card, COUNT(DISTINCT deal_id) AS deal_count
+            FROM owners
+            GROUP BY name, mobile, email, aadhar_card, pan_card
+        """)
+        owners, entries = [], []
+        for row in cursor.fetchall():
+            person = len(owners)
+            owners.append({'id': row['id'], 'name': row['name'], 'mobile': row['mobile'],
+                           'pan_card': row['pan_card'], 'deal_count': int(row['deal_count'])})
+            words = normalize(row['name']).split()
+            keys = {' '.join(words[i:]) for i in range(len(words))}
+            mobile = _digits(row['mobile'])
+            keys.update((mobile, mobile[-10:]))     # with and without a country code
+            keys.add(normalize(row['pan_card']))
+            entries.extend((key, person) for key in keys if key)
+        entries.sort()
+        with self._lock:
+            self._keys = [key for key, _ in entries]
+            self._people = [person for _, person in entries]
+            self._owners = owners
+            if generation == self._generation:
+                self._loaded_at = time.monotonic()
+        metrics.incr('owner_suggest.loads')
+        metrics.observe('owner_suggest.load_seconds', time.perf_counter() - started)
+
+    def ensure_loaded(self, cursor):
+        if self.needs_load():
+            self.load(cursor)
+
+    def suggest(self, query, limit=10):
+        """Up to `limit` owners with a name word, mobile or PAN starting with `query`.
+
+        Exact matches come first, then owners on more deals.
+        """
+        key = normalize(query)
+        if not key:
+            return []
+        if not any(c.isalpha() for c in key):
+            key = _digits(key) or key    # '98765 43210', '+91-98765...' -> digits
+        with self._lock:
+            keys, people, owners = self._keys, self._people, self._owners
+        found = {}
+        i = bisect.bisect_left(keys, key)
+        while i < len(keys) and keys[i].startswith(key) and len(found) < _SCAN_LIMIT:
+            exact = keys[i] == key
+            person = people[i]
+            found[person] = found.get(person, False) or exact
+            i += 1
+        ranked = sorted(found.items(), key=lambda p: (not p[1], -owners[p[0]]['deal_count'],
+                                                      normalize(owners[p[0]]['name'])))
+        return [dict(owners[person], exact=exact) for person, exact in ranked[:limit]]
+
+    def stats(self):
+        loaded_at = self._loaded_at
+        return {
+            'owners': len(self._owners),
+            'keys': len(self._keys),
+            'age_seconds': round(time.monotonic() - loaded_at) if loaded_at else None,
+        }
+
+
+suggestions = OwnerSuggestions()
+metrics.register_gauge('owner_suggest', suggestions.stats)
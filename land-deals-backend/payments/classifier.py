@@ -0,0 +1,294 @@
+# payments/classifier.py - Classify payments into buy / sell / docs / other (payments.category)
+#
+# Rules, first match wins:
+#   1. payment_type set to something specific (land_purchase -> buy,
+#      investment_sale -> sell, documentation_legal -> docs)
+#   2. a proof whose file name or doc_type looks like a receipt/bank document -> docs
+#   3. notes/reference/payment_mode mentioning documents, stamps, fees... -> docs
+#   4. an owner among the payment's parties -> buy, else an investor -> sell
+#   5. the payment's own party_type (owner -> buy, investor -> sell)
+#   6. other
+# A category set by hand (category_source = 'manual') is never overwritten.
+#
+# New and edited payments are classified inline by create_payment and
+# annotate_payment (classify_payments()). run() catches up on everything else
+# - rows written before this existed, by scripts, or whose parties/proofs
+# changed - in chunks of CLASSIFY_CHUNK payments: one query each for the
+# payments, their parties and their proofs, and one UPDATE ... CASE for the
+# rows whose category changes. The start time of the last run is kept in
+# classifier_state as a watermark, so a re-run only looks at payments,
+# parties and proofs written since (migrations/20261019_payment_classification.sql
+# adds the updated_at columns this relies on). Deleting a party or proof
+# leaves nothing to compare against the watermark; --full re-checks every row.
+#
+# Run by hand / from cron:  python -m payments.classifier [--full] [--dry-run]
+import argparse
+import os
+import re
+import sys
+import time
+
+import mysql.connector
+
+import metrics
+from config import env_int
+
+CLASSIFY_CHUNK = env_int('CLASSIFY_CHUNK', 500)
+# how often the optional-column set is re-read, so a worker started before the
+# classification migration picks its columns up without a restart
+CLASSIFY_COLUMNS_TTL_SECONDS = env_int('CLASSIFY_COLUMNS_TTL_SECONDS', 300)
+
+CATEGORIES = ('buy', 'sell', 'docs', 'other')
+
+_PAYMENT_TYPES = {'land_purchase': 'buy', 'investment_sale': 'sell', 'documentation_legal': 'docs'}
+_PROOF_DOCS = re.compile(r'bank|receipt|bill|invoice|transfer|cheque')
+_TEXT_DOCS = re.compile(r'doc|stamp|registration|fees|charges|receipt')
+
+# errors after which the caller's transaction is gone: InnoDB rolls the whole
+# transaction back on a deadlock, and a lost connection takes it with it. A lock
+# wait timeout is included as innodb_rollback_on_timeout may be on.
+_TRANSACTION_ERRNOS = {1205, 1213, 2006, 2013, 2055}
+
+_LOCK_NAME = 'land_deals_payment_classifier'
+_STATE_NAME = 'payments'
+
+_optional_columns = None
+_columns_loaded_at = 0.0   # time.monotonic() of the last load
+
+
+def _columns(cursor):
+    """{'payments.category', 'payment_parties.updated_at', ...} present here."""
+    global _optional_columns, _columns_loaded_at
+    if _optional_columns is None or time.monotonic() - _columns_loaded_at >= CLASSIFY_COLUMNS_TTL_SECONDS:
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ('payments', 'payment_parties', 'payment_proofs')
+        """)
+        _optional_columns = {
+            '.'.join(row if not isinstance(row, dict) else (row['TABLE_NAME'], row['COLUMN_NAME']))
+            for row in cursor.fetchall()
+        }
+        _columns_loaded_at = time.monotonic()
+    return _optional_columns
+
+
+def has_column(cursor, name):
+    """Whether column `name` ('payments.category_source', ...) exists in this schema."""
+    return name in _columns(cursor)
+
+
+def classify(payment, parties=(), proofs=()):
+    """Category for one payment dict with its party and proof dicts."""
+    category = _PAYMENT_TYPES.get(payment.get('payment_type'))
+    if category:
+        return category
+    for proof in proofs:
+        name = os.path.basename((proof.get('file_path') or '').replace('\\', '/'))
+        if _PROOF_DOCS.search(f"{name} {proof.get('doc_type') or ''}".lower()):
+            return 'docs'
+    text = ' '.join(payment.get(k) or '' for k in ('notes', 'reference', 'payment_mode')).lower()
+    if _TEXT_DOCS.search(text):
+        return 'docs'
+    party_types = {p.get('party_type') for p in parties} or {payment.get('party_type')}
+    if 'owner' in party_types:
+        return 'buy'
+    if 'investor' in party_types:
+        return 'sell'
+    return 'other'
+
+
+def load_related(cursor, payment_ids):
+    """({payment_id: [party]}, {payment_id: [proof]}) in one query each."""
+    cols = _columns(cursor)
+    marks = ','.join(['%s'] * len(payment_ids))
+    parties, proofs = {}, {}
+    cursor.execute(f"SELECT payment_id, party_type FROM payment_parties WHERE payment_id IN ({marks})",
+                   list(payment_ids))
+    for row in cursor.fetchall():
+        parties.setdefault(row['payment_id'], []).append(row)
+    doc_type = 'doc_type' if 'payment_proofs.doc_type' in cols else 'NULL AS doc_type'
+    cursor.execute(f"SELECT payment_id, file_path, {doc_type} FROM payment_proofs WHERE payment_id IN ({marks})",
+                   list(payment_ids))
+    for row in cursor.fetchall():
+        proofs.setdefault(row['payment_id'], []).append(row)
+    return parties, proofs
+
+
+def payment_fields(cursor):
+    cols = _columns(cursor)
+    optional = ['payment_type', 'category', 'category_source']
+    return ', '.join(['p.id', 'p.party_type', 'p.notes', 'p.reference', 'p.payment_mode'] +
+                     [f'p.{c}' if f'payments.{c}' in cols else f'NULL AS {c}' for c in optional])
+
+
+def classify_rows(cursor, payments):
+    """{payment_id: category} for the rows whose stored category should change."""
+    if not payments:
+        return {}
+    parties, proofs = load_related(cursor, [p['id'] for p in payments])
+    changes = {}
+    for payment in payments:
+        if payment['category_source'] == 'manual':
+            continue
+        category = classify(payment, parties.get(payment['id'], ()), proofs.get(payment['id'], ()))
+        if category != payment['category']:
+            changes[payment['id']] = category
+    return changes
+
+
+def store(cursor, categories):
+    """Store {payment_id: category} with one UPDATE ... CASE. Returns the rows changed."""
+    cols = _columns(cursor)
+    if not categories or 'payments.category' not in cols:
+        return 0
+    ids = list(categories)
+    params = [v for payment_id in ids for v in (payment_id, categories[payment_id])]
+    sets = [f"category = CASE id {' '.join(['WHEN %s THEN %s'] * len(ids))} END"]
+    guard = ''
+    if 'payments.category_source' in cols:
+        sets.append("category_source = 'auto'")
+        guard = "AND (category_source IS NULL OR category_source = 'auto')"
+    if 'payments.updated_at' in cols:
+        sets.append("updated_at = updated_at")  # classifying is not an edit: keep it out of the next run
+    cursor.execute(f"UPDATE payments SET {', '.join(sets)} WHERE id IN ({','.join(['%s'] * len(ids))}) {guard}",
+                   params + ids)
+    return cursor.rowcount
+
+
+def survivable(error):
+    """Whether a classification `error` failed only its own statement, so the caller's
+    transaction (the payment being written) can still be committed without it."""
+    return getattr(error, 'errno', None) not in _TRANSACTION_ERRNOS
+
+
+def classify_payments(conn, payment_ids):
+    """Classify and store the given payments on `conn` (the caller commits)."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if 'payments.category' not in _columns(cursor):
+            return {}
+        cursor.execute(f"SELECT {payment_fields(cursor)} FROM payments p WHERE p.id IN "
+                       f"({','.join(['%s'] * len(payment_ids))})", list(payment_ids))
+        changes = classify_rows(cursor, cursor.fetchall())
+        store(cursor, changes)
+        return changes
+    finally:
+        cursor.close()
+
+
+def _state(cursor):
+    cursor.execute("SELECT watermark, last_payment_id FROM classifier_state WHERE name = %s", (_STATE_NAME,))
+    row = cursor.fetchone()
+    return (row['watermark'], row['last_payment_id']) if row else (None, 0)
+
+
+def _changed_filter(cursor, watermark, last_payment_id):
+    """WHERE fragment (and params) selecting payments that may need reclassifying."""
+    if watermark is None:
+        return '', []
+    cols = _columns(cursor)
+    conditions, params = ["p.category IS NULL", "p.id > %s"], [last_payment_id]
+    if 'payments.updated_at' in cols:
+        conditions.append("p.updated_at >= %s")
+        params.append(watermark)
+    if 'payment_parties.updated_at' in cols:
+        conditions.append("p.id IN (SELECT payment_id FROM payment_parties WHERE updated_at >= %s)")
+        params.append(watermark)
+    conditions.append("p.id IN (SELECT payment_id FROM payment_proofs WHERE uploaded_at >= %s)")
+    params.append(watermark)
+    return f"AND ({' OR '.join(conditions)})", params
+
+
+def run(conn, full=False, chunk=CLASSIFY_CHUNK, dry_run=False):
+    """Classify the payments changed since the last run (all of them with `full`).
+
+    Returns {'checked', 'changed', 'categories'}, or None if another process
+    holds the classifier lock.
+    """
+    started = time.perf_counter()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if 'payments.category' not in _columns(cursor):
+            raise RuntimeError('payments.category missing: run migrations/20261019_payment_classification.sql')
+        cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (_LOCK_NAME,))
+        if not cursor.fetchone()['locked']:
+            return None
+        try:
+            cursor.execute("SELECT CURRENT_TIMESTAMP AS now")
+            run_started_at = cursor.fetchone()['now']
+            watermark, last_payment_id = (None, 0) if full else _state(cursor)
+            changed_filter, filter_params = _changed_filter(cursor, watermark, last_payment_id)
+
+            checked, counts, after, max_id = 0, {}, 0, last_payment_id
+            while True:
+                cursor.execute(f"""
+                    SELECT {payment_fields(cursor)} FROM payments p
+                    WHERE p.id > %s {changed_filter}
+                    ORDER BY p.id LIMIT %s
+                """, [after] + filter_params + [chunk])
+                payments = cursor.fetchall()
+                if not payments:
+                    break
+                changes = classify_rows(cursor, payments)
+                if not dry_run:
+                    store(cursor, changes)
+                    conn.commit()
+                for category in changes.values():
+                    counts[category] = counts.get(category, 0) + 1
+                checked += len(payments)
+                after = payments[-1]['id']
+                max_id = max(max_id, after)
+
+            if not dry_run:
+                cursor.execute("""
+                    INSERT INTO classifier_state (name, watermark, last_payment_id, rows_changed, duration_ms, finished_at)
+                    VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    ON DUPLICATE KEY UPDATE watermark = VALUES(watermark), last_payment_id = VALUES(last_payment_id),
+                        rows_changed = VALUES(rows_changed), duration_ms = VALUES(duration_ms),
+                        finished_at = VALUES(finished_at)
+                """, (_STATE_NAME, run_started_at, max_id, sum(counts.values()),
+                      int((time.perf_counter() - started) * 1000)))
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+            cursor.fetchone()
+        metrics.observe('classifier.run_seconds', time.perf_counter() - started)
+        return {'checked': checked, 'changed': sum(counts.values()), 'categories': counts}
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Classify payments into buy/sell/docs/other')
+    parser.add_argument('--full', action='store_true', help='re-check every payment, ignoring the watermark')
+    parser.add_argument('--dry-run', action='store_true', help='report the changes without writing them')
+    parser.add_argument('--chunk', type=int, default=CLASSIFY_CHUNK, help='payments per batch')
+    args = parser.parse_args(argv)
+
+    from config import load_env_file
+    load_env_file()
+    from db import get_db_connection
+    conn = get_db_connection()
+    if conn is None:
+        print('Database connection failed')
+        return 1
+    try:
+        result = run(conn, full=args.full, chunk=args.chunk, dry_run=args.dry_run)
+        if result is None:
+            print('Another process is classifying payments')
+        else:
+            print(f"Checked {result['checked']} payments, {'would change' if args.dry_run else 'changed'} "
+                  f"{result['changed']}: {result['categories']}")
+        return 0
+    except (mysql.connector.Error, RuntimeError) as e:
+        print(f'Classification failed: {e}')
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
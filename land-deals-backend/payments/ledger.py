@@ -0,0 +1,65 @@
+# payments/ledger.py - Data version of a ledger export, for export_cache
+#
+# The token summarizes every payment, party split and proof of the deal being
+# exported (?deal_id=, or the deals in ?deal_ids=1,2,3 of a consolidated
+# export, or the whole company without either), and the deal rows and their
+# owners, investors and buyers, whose names the exports show and
+# ?person_search= matches: row counts catch deletes, the highest ids catch
+# inserts and the latest updated_at catches edits. Other filters (dates,
+# party, mode) narrow the export but are part of the cache key already, so
+# the version is taken over the whole deal.
+#
+# updated_at has one-second resolution: an export rendered in the same second
+# as a change could miss a second change in that second, so nothing is cached
+# until the newest change is EXPORT_SETTLE_SECONDS old.
+import mysql.connector
+
+from config import env_int
+from db import get_db
+
+EXPORT_SETTLE_SECONDS = env_int('EXPORT_SETTLE_SECONDS', 2)
+
+# (table, column holding the deal id) of the names shown in the exports
+_NAME_TABLES = (('deals', 'id'), ('owners', 'deal_id'), ('investors', 'deal_id'), ('buyers', 'deal_id'))
+
+
+def data_version(args):
+    """Version token for a ledger export with query `args`; None when it can't be cached yet."""
+    deal_id = args.get('deal_id')
+    deal_ids = sorted({int(d) for d in (args.get('deal_ids') or '').split(',') if d.strip()})
+    scope = []
+    if deal_id:
+        scope = [deal_id]
+    elif deal_ids:
+        scope = deal_ids
+        deal_id = ','.join(map(str, deal_ids))
+
+    def where(column):
+        return f"WHERE {column} IN ({', '.join(['%s'] * len(scope))})" if scope else ""
+
+    queries = [
+        f"SELECT COUNT(*), MAX(p.id), MAX(p.updated_at), NOW() FROM payments p {where('p.deal_id')}",
+        f"""SELECT COUNT(*), MAX(pp.id), MAX(pp.updated_at), NOW()
+            FROM payment_parties pp JOIN payments p ON p.id = pp.payment_id {where('p.deal_id')}""",
+        f"""SELECT COUNT(*), MAX(pr.id), MAX(pr.uploaded_at), NOW()
+            FROM payment_proofs pr JOIN payments p ON p.id = pr.payment_id {where('p.deal_id')}""",
+    ]
+    queries += [f"SELECT COUNT(*), MAX(id), MAX(updated_at), NOW() FROM {table} {where(column)}"
+                for table, column in _NAME_TABLES]
+    cursor = get_db().cursor()
+    try:
+        cursor.execute(' UNION ALL '.join(queries), scope * len(queries))
+        rows = cursor.fetchall()
+    except mysql.connector.Error as e:
+        if e.errno == 1054:   # updated_at missing: migrations/20261019_payment_classification.sql
+            return None       # or 20261019_party_updated_at.sql not applied
+        raise
+    finally:
+        cursor.close()
+    now = rows[0][3]
+    changed = [r[2] for r in rows if r[2] is not None]
+    if changed and (now - max(changed)).total_seconds() < EXPORT_SETTLE_SECONDS:
+        return None
+    parts = ':'.join(f"{count}-{max_id}-{max_changed.isoformat() if max_changed else ''}"
+                     for count, max_id, max_changed, _ in rows)
+    return f"{deal_id or '*'}|{parts}"
@@ -0,0 +1,124 @@
+# payments/ledger_xlsx.py - Rows of the XLSX ledger export, streamed from one query
+#
+# The payments are read through an unbuffered (server-side) cursor, so the
+# server hands rows over as the workbook is written instead of the whole
+# result being held in memory. An unbuffered result keeps the connection busy
+# until it is read to the end, so payer/payee names can't be looked up with
+# further queries on it: each payment's party splits come joined in the same
+# stream instead, on consecutive rows, and are folded into the payment's row
+# here (the batched form of the per-payment lookup the CSV export does).
+import itertools
+
+import xlsx
+from config import env_int
+
+XLSX_FETCH_ROWS = env_int('XLSX_FETCH_ROWS', 1000)   # rows per round trip
+
+COLUMNS = [
+    ('Date', 'date', 12),
+    ('Deal', 'text', 28),
+    ('Amount', 'money', 14),
+    ('Currency', 'text', 9),
+    ('Mode', 'text', 12),
+    ('Type', 'text', 20),
+    ('Status', 'text', 10),
+    ('Reference', 'text', 20),
+    ('Paid by', 'text', 30),
+    ('Paid to', 'text', 30),
+    ('Notes', 'text', 40),
+    ('Payment ID', 'number', 11),
+    ('Deal ID', 'number', 9),
+]
+
+
+def query(args, per_deal):
+    """(sql, params) selecting the payments the ledger filters in `args` match, one row per party split."""
+    where, params = [], []
+    for name, clause in (('deal_id', 'p.deal_id = %s'), ('payment_mode', 'p.payment_mode = %s'),
+                         ('payment_type', 'p.payment_type = %s'), ('start_date', 'p.payment_date >= %s'),
+                         ('end_date', 'p.payment_date <= %s')):
+        if args.get(name):
+            where.append(clause)
+            params.append(args[name])
+
+    # party filters select payments; the joined splits below still list every party
+    party, party_params = [], []
+    if args.get('party_type'):
+        party.append('fp.party_type = %s')
+        party_params.append(args['party_type'])
+    if args.get('party_id'):
+        party.append('fp.party_id = %s')
+        party_params.append(args['party_id'])
+    if args.get('person_search'):
+        party.append('(LOWER(o.name) LIKE LOWER(%s) OR LOWER(i.investor_name) LIKE LOWER(%s) '
+                     'OR LOWER(b.name) LIKE LOWER(%s))')
+        party_params.extend([f"%{args['person_search']}%"] * 3)
+    if party:
+        where.append(f"""EXISTS (
+            SELECT 1 FROM payment_parties fp
+            LEFT JOIN owners o ON fp.party_type = 'owner' AND fp.party_id = o.id
+            LEFT JOIN investors i ON fp.party_type = 'investor' AND fp.party_id = i.id
+            LEFT JOIN buyers b ON fp.party_type = 'buyer' AND fp.party_id = b.id
+            WHERE fp.payment_id = p.id AND {' AND '.join(party)})""")
+        params.extend(party_params)
+
+    order = 'p.deal_id, p.payment_date DESC' if per_deal else 'p.payment_date DESC'
+    sql = f"""
+        SELECT p.*, d.project_name AS deal_name,
+               pp.party_type AS split_type, pp.party_id AS split_id, pp.party_name AS split_name, pp.role AS split_role
+        FROM payments p
+        LEFT JOIN deals d ON d.id = p.deal_id
+        LEFT JOIN payment_parties pp ON pp.payment_id = p.id
+        {('WHERE ' + ' AND '.join(where)) if where else ''}
+        ORDER BY {order}, p.id DESC, pp.id
+    """
+    return sql, params
+
+
+def _payments(cursor):
+    """Yield each payment once, with 'payers' and 'payees' gathered from its split rows."""
+    current = None
+    while True:
+        rows = cursor.fetchmany(XLSX_FETCH_ROWS)
+        if not rows:
+            break
+        for row in rows:
+            if current is None or row['id'] != current['id']:
+                if current is not None:
+                    yield current
+                current = row
+                current['payers'], current['payees'] = [], []
+            role = (row.get('split_role') or '').lower()
+            if role in ('payer', 'payee'):
+                label = row['split_name'] or (f"{row['split_type']} #{row['split_id']}" if row['split_id']
+                                              else row['split_type'])
+                current[role + 's'].append(str(label))
+    if current is not None:
+        yield current
+
+
+def _row(p):
+    return (p.get('payment_date'), p.get('deal_name'), p.get('amount'), p.get('currency'), p.get('payment_mode'),
+            p.get('payment_type'), p.get('status'), p.get('reference'), ', '.join(p['payers']),
+            ', '.join(p['payees']), p.get('notes'), p.get('id'), p.get('deal_id'))
+
+
+def sheets(cursor, per_deal):
+    """(name, columns, rows) for xlsx.workbook() from the executed query(): one 'Ledger' sheet, or one per deal."""
+    payments = _payments(cursor)
+    if not per_deal:
+        yield 'Ledger', COLUMNS, map(_row, payments)
+        return
+    empty = True
+    for _, group in itertools.groupby(payments, key=lambda p: p['deal_id']):
+        first = next(group)
+        name = f"#{first['deal_id']} {first.get('deal_name') or ''}"   # the id first: names are cut at 31
+        empty = False
+        yield name, COLUMNS, map(_row, itertools.chain([first], group))
+    if empty:
+        yield 'Ledger', COLUMNS, []
+
+
+def workbook(cursor, per_deal):
+    """Bytes of the .xlsx, produced as the rows are fetched."""
+    return xlsx.workbook(sheets(cursor, per_deal))
@@ -0,0 +1,1247 @@
+# payments/routes.py - Payments, parties, proofs and ledger exports
+import os
+import time
+from datetime import datetime
+from io import BytesIO
+
+import mysql.connector
+from flask import Blueprint, current_app, jsonify, request, send_file
+from werkzeug.utils import secure_filename
+
+import export_cache
+from auth import token_required
+from db import get_db, get_db_connection, note_written_deals, stream_with_db, unit_of_work, read_only
+from export_cache import cached_export
+from payments import classifier, ledger
+
+bp = Blueprint('payments', __name__)
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+@bp.route('/api/payments/test', methods=['GET'])
+def payments_test():
+    return jsonify({'message': 'Payments endpoints active'})
+
+
+@bp.route('/api/payments/<int:deal_id>', methods=['GET'])
+@read_only
+def list_payments(deal_id):
+    """Return all payments for a deal"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT p.* FROM payments p WHERE p.deal_id = %s ORDER BY p.payment_date DESC", (deal_id,))
+        rows = cursor.fetchall() or []
+
+        # convert dates to isoformat where applicable
+        for r in rows:
+            for k in ('payment_date', 'created_at'):
+                if r.get(k) is not None and isinstance(r.get(k), datetime):
+                    r[k] = r[k].isoformat()
+
+        # attach parties for each payment; the payment rows are fully fetched so
+        # the same cursor can be reused
+        try:
+            for r in rows:
+                # Get payment parties with actual names from related tables
+                cursor.execute("""
+                    SELECT pp.id, pp.party_type, pp.party_id, pp.amount, pp.percentage, pp.role,
+                           CASE 
+                               WHEN pp.party_type = 'owner' AND pp.party_id IS NOT NULL THEN 
+                                   (SELECT name FROM owners WHERE id = pp.party_id)
+                               WHEN pp.party_type = 'investor' AND pp.party_id IS NOT NULL THEN 
+                                   (SELECT investor_name FROM investors WHERE id = pp.party_id)
+                               WHEN pp.party_type = 'buyer' AND pp.party_id IS NOT NULL THEN 
+                                   (SELECT name FROM buyers WHERE id = pp.party_id)
+                               ELSE NULL
+                           END as party_name
+                    FROM payment_parties pp 
+                    WHERE pp.payment_id = %s
+                """, (r['id'],))
+                parts = cursor.fetchall() or []
+                part_list = []
+                for p in parts:
+                    part_list.append({
+                        'id': p.get('id'),
+                        'party_type': p.get('party_type'),
+                        'party_id': p.get('party_id'),
+                        'party_name': p.get('party_name'),
+                        'amount': float(p.get('amount')) if p.get('amount') is not None else None,
+                        'percentage': float(p.get('percentage')) if p.get('percentage') is not None else None,
+                        'role': p.get('role')
+                    })
+                r['parties'] = part_list
+        except Exception:
+            for r in rows:
+                r['parties'] = []
+
+        return jsonify(rows)
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/ledger.csv', methods=['GET'])
+@token_required
+@read_only
+@cached_export('ledger', 'csv', 'text/csv', 'ledger.csv', version=ledger.data_version)
+def payments_ledger_csv(current_user):
+    """Export ledger results as CSV. Accepts same query params as /api/payments/ledger"""
+    params = request.args
+    deal_id = params.get('deal_id')
+    party_type = params.get('party_type')
+    party_id = params.get('party_id')
+    payment_mode = params.get('payment_mode')
+    payment_type = params.get('payment_type')
+    person_search = params.get('person_search')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+
+    args = []
+    if party_type or party_id or person_search:
+        sql = """SELECT DISTINCT p.* FROM payments p 
+                 JOIN payment_parties pp ON pp.payment_id = p.id 
+                 LEFT JOIN owners o ON pp.party_type = 'owner' AND pp.party_id = o.id
+                 LEFT JOIN investors i ON pp.party_type = 'investor' AND pp.party_id = i.id
+                 LEFT JOIN buyers b ON pp.party_type = 'buyer' AND pp.party_id = b.id
+                 WHERE 1=1"""
+        if deal_id:
+            sql += " AND p.deal_id = %s"
+            args.append(deal_id)
+        if party_type:
+            sql += " AND pp.party_type = %s"
+            args.append(party_type)
+        if party_id:
+            sql += " AND pp.party_id = %s"
+            args.append(party_id)
+        if person_search:
+            sql += """ AND (
+                LOWER(o.name) LIKE LOWER(%s) OR 
+                LOWER(i.investor_name) LIKE LOWER(%s) OR 
+                LOWER(b.name) LIKE LOWER(%s)
+            )"""
+            search_term = f"%{person_search}%"
+            args.extend([search_term, search_term, search_term])
+        if payment_mode:
+            sql += " AND p.payment_mode = %s"
+            args.append(payment_mode)
+        if payment_type:
+            sql += " AND p.payment_type = %s"
+            args.append(payment_type)
+    else:
+        sql = "SELECT p.* FROM payments p WHERE 1=1"
+        if deal_id:
+            sql += " AND p.deal_id = %s"
+            args.append(deal_id)
+        if payment_mode:
+            sql += " AND p.payment_mode = %s"
+            args.append(payment_mode)
+        if payment_type:
+            sql += " AND p.payment_type = %s"
+            args.append(payment_type)
+
+    if start_date:
+        sql += " AND p.payment_date >= %s"
+        args.append(start_date)
+    if end_date:
+        sql += " AND p.payment_date <= %s"
+        args.append(end_date)
+
+    sql += " ORDER BY p.payment_date DESC"
+
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(sql, tuple(args))
+        cols = [d[0] for d in cursor.description]
+        rows = cursor.fetchall() or []
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    import io, csv
+
+    def generate():
+        # Rows are written and yielded one at a time so the response streams
+        # (and is compressed incrementally) instead of being built in memory.
+        # stream_with_db keeps the request connection open until the last row.
+        buf = io.StringIO()
+        w = csv.writer(buf)
+
+        def flush():
+            data = buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+            return data
+
+        # add derived payer/payee columns to headers
+        headers = cols + ['payers', 'payees']
+        w.writerow(headers)
+        yield flush()
+        pc = conn.cursor()
+        for r in rows:
+            row = []
+            for v in r:
+                if isinstance(v, datetime):
+                    row.append(v.isoformat())
+                else:
+                    row.append(v)
+            # fetch parties for this payment to derive payer/payee lists
+            try:
+                pc.execute("SELECT party_type, party_id, party_name, amount, percentage, role FROM payment_parties WHERE payment_id = %s", (r[0],))
+                parts = pc.fetchall() or []
+                payers = []
+                payees = []
+                for pp in parts:
+                    # pp may be tuple; attempt to read role at the last position
+                    role = pp[5] if len(pp) > 5 else None
+                    label = None
+                    # try to use party_name if present in tuple
+                    if len(pp) > 2 and pp[2]:
+                        label = str(pp[2])
+                    elif pp[1]:
+                        label = f"{pp[0]} #{pp[1]}"
+                    else:
+                        label = pp[0]
+                    if role and str(role).lower() == 'payer':
+                        payers.append(label)
+                    elif role and str(role).lower() == 'payee':
+                        payees.append(label)
+                row.append(', '.join(payers))
+                row.append(', '.join(payees))
+            except Exception:
+                row.append('')
+                row.append('')
+            w.writerow(row)
+            yield flush()
+
+    return current_app.response_class(stream_with_db(generate()), mimetype='text/csv', headers={"Content-Disposition": "attachment; filename=ledger.csv"})
+
+
+@bp.route('/api/payments/ledger.xlsx', methods=['GET'])
+@token_required
+@read_only
+@cached_export('ledger', 'xlsx', XLSX_MIMETYPE, 'ledger.xlsx', version=ledger.data_version)
+def payments_ledger_xlsx(current_user):
+    """Export ledger results as an Excel workbook with typed date and amount cells. Accepts the
+    same query params as /api/payments/ledger, plus sheets=deal for one sheet per deal."""
+    from payments import ledger_xlsx   # zipfile & co. are only needed once someone exports
+    per_deal = request.args.get('sheets') == 'deal'
+    sql, args = ledger_xlsx.query(request.args, per_deal)
+    try:
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)   # unbuffered: rows stay on the server until fetched
+        cursor.execute(sql, tuple(args))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        try:
+            yield from ledger_xlsx.workbook(cursor, per_deal)
+        finally:
+            try:
+                conn.consume_results()   # a download cut short leaves the rest of the result unread
+                cursor.close()
+            except Exception:
+                pass
+
+    return current_app.response_class(stream_with_db(generate()), mimetype=XLSX_MIMETYPE,
+                                      headers={"Content-Disposition": "attachment; filename=ledger.xlsx"})
+
+
+@bp.route('/api/payments/ledger.pdf', methods=['GET'])
+@token_required
+@read_only
+@cached_export('ledger', 'pdf', 'application/pdf', 'ledger.pdf', version=ledger.data_version)
+def payments_ledger_pdf(current_user):
+    """Generate a simple PDF ledger. Embeds the first proof image per payment when present."""
+    # ReportLab is heavy to import; load it only when a PDF is requested
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.utils import ImageReader
+    except Exception:
+        # reportlab may not be installed in dev environment
+        return jsonify({'error': 'reportlab not available on server'}), 500
+    from reports import images
+    from reports import ledger as ledger_report
+
+    params = request.args
+    deal_id = params.get('deal_id')
+    party_type = params.get('party_type')
+    party_id = params.get('party_id')
+    payment_mode = params.get('payment_mode')
+    payment_type = params.get('payment_type')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+
+    args = []
+    if party_type or party_id:
+        sql = "SELECT DISTINCT p.* FROM payments p JOIN payment_parties pp ON pp.payment_id = p.id WHERE 1=1"
+        if deal_id:
+            sql += " AND p.deal_id = %s"
+            args.append(deal_id)
+        if party_type:
+            sql += " AND pp.party_type = %s"
+            args.append(party_type)
+        if party_id:
+            sql += " AND pp.party_id = %s"
+            args.append(party_id)
+        if payment_mode:
+            sql += " AND p.payment_mode = %s"
+            args.append(payment_mode)
+        if payment_type:
+            sql += " AND p.payment_type = %s"
+            args.append(payment_type)
+    else:
+        sql = "SELECT p.* FROM payments p WHERE 1=1"
+        if deal_id:
+            sql += " AND p.deal_id = %s"
+            args.append(deal_id)
+        if payment_mode:
+            sql += " AND p.payment_mode = %s"
+            args.append(payment_mode)
+        if payment_type:
+            sql += " AND p.payment_type = %s"
+            args.append(payment_type)
+
+    if start_date:
+        sql += " AND p.payment_date >= %s"
+        args.append(start_date)
+    if end_date:
+        sql += " AND p.payment_date <= %s"
+        args.append(end_date)
+
+    sql += " ORDER BY p.payment_date DESC"
+
+    try:
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, tuple(args))
+        rows = cursor.fetchall() or []
+
+        # For each payment fetch one proof file path (if any)
+        for r in rows:
+            cursor.execute("SELECT file_path FROM payment_proofs WHERE payment_id = %s ORDER BY uploaded_at DESC LIMIT 1", (r['id'],))
+            p = cursor.fetchone()
+            if p and p.get('file_path'):
+                r['proof'] = p.get('file_path')
+            else:
+                r['proof'] = None
+
+        # Create PDF
+        buff = BytesIO()
+        c = canvas.Canvas(buff, pagesize=A4)
+        width, height = A4
+        y = height - 40
+        c.setFont('Helvetica-Bold', 14)
+        title = f"Payments Ledger {('Deal ' + str(deal_id)) if deal_id else ''}"
+        c.drawString(40, y, title)
+        y -= 30
+        c.setFont('Helvetica', 10)
+
+        for r in rows:
+            if y < 160:
+                c.showPage()
+                y = height - 40
+                c.setFont('Helvetica', 10)
+
+            # Header line with date, id, amount, currency
+            c.setFont('Helvetica-Bold', 11)
+            c.drawString(40, y, f"{r.get('payment_date','')}  | ID: {r.get('id','-')}  | ₹{r.get('amount','')}")
+            c.setFont('Helvetica', 10)
+            c.drawString(400, y, f"{r.get('currency','INR')}")
+            y -= 16
+
+            # Mode, reference, created_by
+            c.drawString(40, y, f"Mode: {r.get('payment_mode','-')}")
+            c.drawString(200, y, f"Reference: {str(r.get('reference') or '-')}" )
+            c.drawString(420, y, f"Created by: {r.get('created_by') or '-'}")
+            y -= 14
+
+            # Notes (trim long)
+            notes = str(r.get('notes') or '')
+            c.drawString(40, y, f"Notes: {notes[:120]}")
+            y -= 14
+
+            # Party splits (if any) — draw a small table with columns
+            if r.get('parties'):
+                parts = r.get('parties') or []
+                # derive payer/payee summary if roles present
+                try:
+                    payers = [pp.get('party_name') or (f"{pp.get('party_type')} #{pp.get('party_id')}") for pp in parts if (pp.get('role') or '').lower() == 'payer']
+                    payees = [pp.get('party_name') or (f"{pp.get('party_type')} #{pp.get('party_id')}") for pp in parts if (pp.get('role') or '').lower() == 'payee']
+                    if payers or payees:
+                        summary = ''
+                        if payers and payees:
+                            summary = f"{', '.join(payers)} → {', '.join(payees)}"
+                        elif payers:
+                            summary = f"Paid by {', '.join(payers)}"
+                        else:
+                            summary = f"Paid to {', '.join(payees)}"
+                        c.setFont('Helvetica-Bold', 9)
+                        c.drawString(40, y, summary[:200])
+                        y -= 14
+                except Exception:
+                    pass
+                if parts:
+                    # Table layout
+                    x0 = 48
+                    col1 = x0
+                    col2 = x0 + 260
+                    col3 = x0 + 360
+                    row_h = 14
+                    # header
+                    c.setFont('Helvetica-Bold', 9)
+                    c.drawString(col1, y, 'Party')
+                    c.drawString(col2, y, 'Percentage')
+                    c.drawString(col3, y, 'Amount')
+                    y -= row_h
+                    c.setFont('Helvetica', 9)
+                    # rows
+                    for pp in parts:
+                        # page break if necessary
+                        if y < 80:
+                            c.showPage()
+                            y = height - 40
+                            c.setFont('Helvetica', 10)
+                        label = pp.get('party_name') or (f"{pp.get('party_type','')} #{pp.get('party_id')}" if pp.get('party_id') else pp.get('party_type',''))
+                        pct = pp.get('percentage')
+                        amt = pp.get('amount')
+                        c.drawString(col1, y, f"{label}")
+                        c.drawString(col2, y, f"{pct if pct is not None else '-'}")
+                        c.drawRightString(col3 + 60, y, f"{('₹' + format(amt, ',.2f')) if amt is not None else '-'}")
+                        y -= row_h
+            else:
+                # draw image thumbnail if proof exists and file present
+                if r.get('proof'):
+                    img_path = ledger_report.proof_path(current_app.root_path, r.get('proof'))
+                    thumb = images.thumbnail(img_path, 80, 60) if img_path else None
+                    if thumb:
+                        try:
+                            c.drawImage(ImageReader(BytesIO(thumb)), 40, y-60, width=80, height=60,
+                                        preserveAspectRatio=True, mask='auto')
+                            y -= 64
+                        except Exception:
+                            pass
+
+            y -= 12
+
+        c.save()
+        buff.seek(0)
+        return send_file(buff, mimetype='application/pdf', as_attachment=True, download_name='ledger.pdf')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _is_job_id(value):
+    return len(value) == 32 and all(c in '0123456789abcdef' for c in value)
+
+
+def _consolidated_status(key, state):
+    state = dict(state, job=key)
+    state['status_url'] = f'/api/payments/ledger/consolidated/{key}'
+    if state['state'] == 'done':
+        state['download_url'] = f'/api/payments/ledger/consolidated/{key}.pdf'
+    return state
+
+
+@bp.route('/api/payments/ledger/consolidated', methods=['POST'])
+@token_required
+def start_consolidated_ledger(current_user):
+    """Start a one-PDF ledger of many deals (?deal_ids=1,2,3, default every deal with payments;
+    start_date, end_date, payment_mode, payment_type narrow the payments). Poll status_url."""
+    from reports import consolidated
+    from reports import ledger as ledger_report
+    try:
+        ids = ledger_report.deal_ids(request.args.get('deal_ids'))
+    except ValueError:
+        return jsonify({'error': 'deal_ids must be comma-separated deal ids'}), 400
+    args = request.args.copy()
+    args.pop('deal_id', None)
+    try:
+        # on the primary (no @read_only here), which load() below reads: a token from a
+        # lagging replica would file the PDF under a version it doesn't show
+        token = ledger.data_version(args)
+        # still settling: a one-off job under a key nobody else will ask for
+        key = export_cache.cache.key('ledger-consolidated', args, token or f'once-{time.time_ns()}')
+
+        def load():
+            conn = get_db_connection()
+            if conn is None:
+                raise RuntimeError('Database connection failed')
+            try:
+                return ledger_report.load(conn.cursor(dictionary=True), ids, args)
+            finally:
+                conn.close()
+
+        state = consolidated.start(key, load, current_app.root_path)
+        code = 200 if state['state'] == 'done' else 202
+        return jsonify(_consolidated_status(key, state)), code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/ledger/consolidated/<job_id>', methods=['GET'])
+@token_required
+def consolidated_ledger_status(current_user, job_id):
+    """Progress of a consolidated ledger job: state, done / total sections, download_url once done."""
+    from reports import consolidated
+    state = consolidated.status(job_id) if _is_job_id(job_id) else None
+    if state is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_consolidated_status(job_id, state))
+
+
+@bp.route('/api/payments/ledger/consolidated/<job_id>.pdf', methods=['GET'])
+@token_required
+def consolidated_ledger_pdf(current_user, job_id):
+    path = export_cache.cache.lookup(job_id, 'pdf') if _is_job_id(job_id) else None
+    if path is None:
+        return jsonify({'error': 'Ledger not ready'}), 404
+    return export_cache.send(path, job_id, 'application/pdf', 'ledger-consolidated.pdf')
+
+
+@bp.route('/api/payments/ledger', methods=['GET'])
+@read_only
+def payments_ledger():
+    """Return payments filtered by query parameters:
+    Supported params: deal_id, party_type, party_id, payment_mode, payment_type, person_search, start_date, end_date
+    """
+    params = request.args
+    deal_id = params.get('deal_id')
+    party_type = params.get('party_type')
+    party_id = params.get('party_id')
+    payment_mode = params.get('payment_mode')
+    payment_type = params.get('payment_type')
+    person_search = params.get('person_search')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+
+    # If filtering by party (party_type, party_id, or person_search) prefer to join payment_parties
+    args = []
+    if party_type or party_id or person_search:
+        sql = """SELECT DISTINCT p.* FROM payments p 
+                 JOIN payment_parties pp ON pp.payment_id = p.id 
+                 LEFT JOIN owners o ON pp.party_type = 'owner' AND pp.party_id = o.id
+                 LEFT JOIN investors i ON pp.party_type = 'investor' AND pp.party_id = i.id
+                 LEFT JOIN buyers b ON pp.party_type = 'buyer' AND pp.party_id = b.id
+                 WHERE 1=1"""
+        if deal_id:
+            sql += " AND p.deal_id = %s"
+            args.append(deal_id)
+        if party_type:
+            sql += " AND pp.party_type = %s"
+            args.append(party_type)
+        if party_id:
+            sql += " AND pp.party_id = %s"
+            args.append(party_id)
+        if person_search:
+            sql += """ AND (
+                LOWER(o.name) LIKE LOWER(%s) OR 
+                LOWER(i.investor_name) LIKE LOWER(%s) OR 
+                LOWER(b.name) LIKE LOWER(%s)
+            )"""
+            search_term = f"%{person_search}%"
+            args.extend([search_term, search_term, search_term])
+        if payment_mode:
+            sql += " AND p.payment_mode = %s"
+            args.append(payment_mode)
+        if payment_type:
+            sql += " AND p.payment_type = %s"
+            args.append(payment_type)
+    else:
+        sql = "SELECT p.* FROM payments p WHERE 1=1"
+        if deal_id:
+            sql += " AND p.deal_id = %s"
+            args.append(deal_id)
+        if payment_mode:
+            sql += " AND p.payment_mode = %s"
+            args.append(payment_mode)
+        if payment_type:
+            sql += " AND p.payment_type = %s"
+            args.append(payment_type)
+
+    if start_date:
+        sql += " AND p.payment_date >= %s"
+        args.append(start_date)
+    if end_date:
+        sql += " AND p.payment_date <= %s"
+        args.append(end_date)
+
+    sql += " ORDER BY p.payment_date DESC"
+
+    try:
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, tuple(args))
+        rows = cursor.fetchall() or []
+        for r in rows:
+            for k in ('payment_date', 'created_at'):
+                if r.get(k) is not None and isinstance(r.get(k), datetime):
+                    r[k] = r[k].isoformat()
+        return jsonify(rows)
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/<int:deal_id>', methods=['POST'])
+@token_required
+def create_payment(current_user, deal_id):
+    """Create a payment record for a deal"""
+    data = request.get_json() or {}
+    # normalize party_type to the ENUM allowed values in the DB
+    party_type = data.get('party_type', 'other')
+    allowed_party_types = {'owner', 'buyer', 'investor', 'other'}
+    if party_type not in allowed_party_types:
+        party_type = 'other'
+
+    # normalize party_id to integer or None
+    party_id = data.get('party_id')
+    try:
+        if party_id is None or party_id == '':
+            party_id = None
+        else:
+            party_id = int(party_id)
+    except Exception:
+        party_id = None
+    amount = data.get('amount')
+    currency = data.get('currency', 'INR')
+    payment_date = data.get('payment_date')
+    payment_mode = data.get('payment_mode')
+    reference = data.get('reference')
+    notes = data.get('notes')
+    # payment_type: 'land_purchase', 'investment_sale', 'documentation_legal', 'other'
+    payment_type = data.get('payment_type', 'other')
+    allowed_payment_types = {'land_purchase', 'investment_sale', 'documentation_legal', 'other'}
+    if payment_type not in allowed_payment_types:
+        payment_type = 'other'
+
+    # Validate amount
+    try:
+        if amount is None or amount == '':
+            raise ValueError('amount missing')
+        amount = float(amount)
+    except Exception:
+        return jsonify({'error': 'amount is required and must be a number'}), 400
+
+    # Validate payment_date (required, YYYY-MM-DD)
+    if not payment_date:
+        return jsonify({'error': 'payment_date is required and must be YYYY-MM-DD'}), 400
+    try:
+        parsed = datetime.strptime(payment_date, '%Y-%m-%d').date()
+        payment_date = parsed.strftime('%Y-%m-%d')
+    except Exception:
+        return jsonify({'error': 'payment_date must be in YYYY-MM-DD format'}), 400
+
+    # If parties provided, compute their sum and optionally enforce equality with amount.
+    parties = data.get('parties')
+    try:
+        prepared_parties = []
+        if parties and isinstance(parties, list):
+            for part in parties:
+                pt = part.get('party_type', 'other')
+                pid = part.get('party_id')
+                amt = part.get('amount')
+                pct = part.get('percentage')
+                role = part.get('role')
+                if pid is not None and pid != '':
+                    try:
+                        pid = int(pid)
+                    except Exception:
+                        pid = None
+                if amt is not None and amt != '':
+                    try:
+                        amt = float(amt)
+                    except Exception:
+                        amt = None
+                if pct is not None and pct != '':
+                    try:
+                        pct = float(pct)
+                    except Exception:
+                        pct = None
+                prepared_parties.append({'party_type': pt, 'party_id': pid, 'amount': amt, 'percentage': pct, 'role': role})
+    except Exception:
+        prepared_parties = []
+
+    try:
+        # payment + parties are atomic: committed together when the block exits
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            # include payment_type column if present in DB (safe to pass None if column missing)
+            try:
+                cursor.execute(
+                    """INSERT INTO payments (deal_id, party_type, party_id, amount, currency, payment_date, payment_mode, reference, notes, created_by, payment_type)
+                       VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
+                    (deal_id, party_type, party_id, amount, currency, payment_date, payment_mode, reference, notes, current_user, payment_type)
+                )
+            except mysql.connector.Error as e:
+                # fallback if `payment_type` column doesn't exist
+                cursor.execute(
+                    """INSERT INTO payments (deal_id, party_type, party_id, amount, currency, payment_date, payment_mode, reference, notes, created_by)
+                       VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
+                    (deal_id, party_type, party_id, amount, currency, payment_date, payment_mode, reference, notes, current_user)
+                )
+            payment_id = cursor.lastrowid
+
+            # Server-side validation: if prepared_parties provided, ensure consistency
+            if prepared_parties:
+                amounts_provided = any(isinstance(p.get('amount'), (int, float)) for p in prepared_parties)
+                percentages_provided = any(isinstance(p.get('percentage'), (int, float)) for p in prepared_parties)
+
+                # If percentages are provided, ensure they sum to (approximately) 100
+                if percentages_provided:
+                    total_pct = sum([p.get('percentage') or 0 for p in prepared_parties])
+                    force = request.args.get('force', 'false').lower() == 'true'
+                
+                    # Only validate percentage sum if there are actual non-zero percentages
+                    non_zero_percentages = [p.get('percentage') for p in prepared_parties if p.get('percentage') and p.get('percentage') > 0]
+                
+                    if non_zero_percentages and abs(total_pct - 100.0) > 0.01 and not force:
+                        try:
+                            conn.rollback()
+                        except Exception:
+                            pass
+                        return jsonify({'error': f'Party percentage mismatch: total {total_pct}', 'total_percentage': total_pct}), 400
+
+                # If only percentages are provided (not amounts), compute amounts from payment amount
+                if percentages_provided and not amounts_provided:
+                    for p in prepared_parties:
+                        pct = p.get('percentage')
+                        if isinstance(pct, (int, float)):
+                            p['amount'] = round((pct / 100.0) * amount, 2)
+
+                # If amounts are provided, ensure their sum matches payment amount
+                if amounts_provided:
+                    total_party_amount = sum([p['amount'] for p in prepared_parties if isinstance(p.get('amount'), (int, float))])
+                    force = request.args.get('force', 'false').lower() == 'true'
+                    if abs(total_party_amount - amount) > 0.01 and not force:
+                        try:
+                            conn.rollback()
+                        except Exception:
+                            pass
+                        return jsonify({'error': 'party_amount_mismatch', 'payment_amount': amount, 'parties_total': total_party_amount}), 400
+
+            # If request provided multiple parties with shares, persist them to payment_parties
+            if prepared_parties:
+                for part in prepared_parties:
+                    try:
+                        # Try inserting with all new fields including pay_to fields
+                        cursor.execute("""
+                            INSERT INTO payment_parties 
+                            (payment_id, party_type, party_id, amount, percentage, role, pay_to_id, pay_to_name, pay_to_type) 
+                            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                        """, (
+                            payment_id, 
+                            part.get('party_type', 'other'), 
+                            part.get('party_id'), 
+                            part.get('amount'), 
+                            part.get('percentage'), 
+                            part.get('role'),
+                            part.get('pay_to_id'),
+                            part.get('pay_to_name'),
+                            part.get('pay_to_type')
+                        ))
+                    except mysql.connector.Error as db_e:
+                        # Try fallbacks for older schemas: missing percentage and/or role columns
+                        msg = str(db_e)
+                        try:
+                            if 'Unknown column' in msg or getattr(db_e, 'errno', None) == 1054:
+                                # Try with role and percentage but without pay_to fields
+                                try:
+                                    cursor.execute("INSERT INTO payment_parties (payment_id, party_type, party_id, amount, percentage, role) VALUES (%s,%s,%s,%s,%s,%s)", (payment_id, part.get('party_type', 'other'), part.get('party_id'), part.get('amount'), part.get('percentage'), part.get('role')))
+                                except mysql.connector.Error:
+                                    # try without percentage and role
+                                    try:
+                                        cursor.execute("INSERT INTO payment_parties (payment_id, party_type, party_id, amount) VALUES (%s,%s,%s,%s)", (payment_id, part.get('party_type', 'other'), part.get('party_id'), part.get('amount')))
+                                    except mysql.connector.Error:
+                                        # try with percentage only
+                                        cursor.execute("INSERT INTO payment_parties (payment_id, party_type, party_id, amount, percentage) VALUES (%s,%s,%s,%s,%s)", (payment_id, part.get('party_type', 'other'), part.get('party_id'), part.get('amount'), part.get('percentage')))
+                            else:
+                                raise
+                        except Exception:
+                            raise
+
+            # classify from what was just written; a failed statement must not lose the payment
+            # (the classifier run catches up), but one that rolled the payment back must fail it
+            try:
+                category = classifier.classify(
+                    {'payment_type': payment_type, 'party_type': party_type, 'notes': notes,
+                     'reference': reference, 'payment_mode': payment_mode},
+                    prepared_parties)
+                classifier.store(cursor, {payment_id: category})
+            except mysql.connector.Error as e:
+                if not classifier.survivable(e):
+                    raise
+                print(f"Payment {payment_id} classification failed: {e}")
+
+        return jsonify({'message': 'Payment recorded', 'payment_id': payment_id}), 201
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/<int:deal_id>/<int:payment_id>', methods=['PUT'])
+@token_required
+def annotate_payment(current_user, deal_id, payment_id):
+    """Add notes or update a payment's reference/notes"""
+    data = request.get_json() or {}
+    fields = {}
+    for k in ('reference', 'notes', 'payment_mode', 'amount', 'payment_date', 'category'):
+        if k in data:
+            fields[k] = data[k]
+
+    if not fields:
+        return jsonify({'error': 'No updatable fields provided'}), 400
+    if 'category' in fields:
+        # an explicit category sticks; an empty one hands the payment back to the classifier
+        fields['category'] = fields['category'] or None
+        if fields['category'] not in classifier.CATEGORIES + (None,):
+            return jsonify({'error': f"category must be one of {', '.join(classifier.CATEGORIES)}"}), 400
+
+    try:
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            if 'category' in fields and classifier.has_column(cursor, 'payments.category_source'):
+                fields['category_source'] = 'manual' if fields['category'] else None
+            set_clause = ', '.join([f"{k} = %s" for k in fields.keys()])
+            params = list(fields.values()) + [deal_id, payment_id]
+            cursor.execute(f"UPDATE payments SET {set_clause} WHERE deal_id = %s AND id = %s", params)
+            if not fields.get('category'):
+                try:
+                    classifier.classify_payments(conn, [payment_id])
+                except mysql.connector.Error as e:
+                    if not classifier.survivable(e):
+                        raise
+                    print(f"Payment {payment_id} classification failed: {e}")
+        return jsonify({'message': 'Payment updated'})
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/<int:deal_id>/<int:payment_id>', methods=['DELETE'])
+@token_required
+def delete_payment(current_user, deal_id, payment_id):
+    """Delete a payment and its proof files (admin or owner)."""
+    try:
+        with unit_of_work() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            # Fetch proofs to delete files
+            cursor.execute("SELECT id, file_path FROM payment_proofs WHERE payment_id = %s", (payment_id,))
+            proofs = cursor.fetchall()
+
+            # Permission check: only admins or creator of payment can delete
+            try:
+                cursor.execute("SELECT created_by FROM payments WHERE id = %s AND deal_id = %s", (payment_id, deal_id))
+                p = cursor.fetchone()
+                created_by = p.get('created_by') if p else None
+            except Exception:
+                created_by = None
+
+            role = None
+            try:
+                role = request.user.get('role')
+            except Exception:
+                role = None
+
+            if not (role == 'admin' or created_by == current_user):
+                return jsonify({'error': 'forbidden'}), 403
+
+            # Delete DB rows for proofs
+            cursor.execute("DELETE FROM payment_proofs WHERE payment_id = %s", (payment_id,))
+
+            # Delete payment row
+            cursor.execute("DELETE FROM payments WHERE deal_id = %s AND id = %s", (deal_id, payment_id))
+
+        # remove files from disk (best-effort)
+        for pr in proofs:
+            fp = pr.get('file_path')
+            if not fp:
+                continue
+            # Normalize: find uploads/ inside path
+            p = fp.replace('\\', '/')
+            idx = p.find('uploads/')
+            if idx != -1:
+                rel = p[idx:]
+                # compute absolute path relative to the configured UPLOAD_FOLDER
+                abs_path = os.path.abspath(os.path.join(current_app.config['UPLOAD_FOLDER'], os.path.relpath(rel.replace('uploads/', ''), '')))
+                try:
+                    # ensure the abs_path is inside UPLOAD_FOLDER
+                    if abs_path.startswith(os.path.abspath(current_app.config['UPLOAD_FOLDER'])) and os.path.exists(abs_path):
+                        os.remove(abs_path)
+                except Exception:
+                    pass
+
+        return jsonify({'message': 'Payment and proofs deleted'})
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _note_party_deal(cursor, party_id):
+    """Note the deal of payment party `party_id` as written (the URL doesn't name it)."""
+    cursor.execute("""
+        SELECT p.deal_id FROM payment_parties pp JOIN payments p ON p.id = pp.payment_id WHERE pp.id = %s
+    """, (party_id,))
+    note_written_deals(*[row[0] for row in cursor.fetchall()])
+
+
+@bp.route('/api/payments/<int:payment_id>/parties', methods=['POST'])
+@token_required
+def add_payment_party(current_user, payment_id):
+    """Add a party share to an existing payment."""
+    data = request.get_json() or {}
+    pt = data.get('party_type', 'other')
+    pid = data.get('party_id')
+    amt = data.get('amount')
+    pct = data.get('percentage')
+    role = data.get('role')
+    pay_to_id = data.get('pay_to_id')
+    pay_to_name = data.get('pay_to_name')
+    pay_to_type = data.get('pay_to_type')
+    try:
+        if pid is not None and pid != '':
+            pid = int(pid)
+    except Exception:
+        pid = None
+    try:
+        if amt is not None and amt != '':
+            amt = float(amt)
+    except Exception:
+        amt = None
+    try:
+        if pct is not None and pct != '':
+            pct = float(pct)
+    except Exception:
+        pct = None
+    try:
+        if pay_to_id is not None and pay_to_id != '':
+            pay_to_id = int(pay_to_id)
+    except Exception:
+        pay_to_id = None
+
+    try:
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT deal_id FROM payments WHERE id = %s", (payment_id,))
+            note_written_deals(*[row[0] for row in cursor.fetchall()])
+            try:
+                cursor.execute("""
+                    INSERT INTO payment_parties 
+                    (payment_id, party_type, party_id, amount, percentage, role, pay_to_id, pay_to_name, pay_to_type) 
+                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                """, (payment_id, pt, pid, amt, pct, role, pay_to_id, pay_to_name, pay_to_type))
+            except mysql.connector.Error as db_e:
+                msg = str(db_e)
+                if getattr(db_e, 'errno', None) == 1054 or 'Unknown column' in msg:
+                    # fallback: try without pay_to fields
+                    try:
+                        cursor.execute("INSERT INTO payment_parties (payment_id, party_type, party_id, amount, percentage, role) VALUES (%s,%s,%s,%s,%s,%s)", (payment_id, pt, pid, amt, pct, role))
+                    except mysql.connector.Error:
+                        # fallback: try without role and percentage
+                        try:
+                            cursor.execute("INSERT INTO payment_parties (payment_id, party_type, party_id, amount) VALUES (%s,%s,%s,%s)", (payment_id, pt, pid, amt))
+                        except Exception:
+                            # fallback to include percentage only
+                            cursor.execute("INSERT INTO payment_parties (payment_id, party_type, party_id, amount, percentage) VALUES (%s,%s,%s,%s,%s)", (payment_id, pt, pid, amt, pct))
+                else:
+                    raise
+        return jsonify({'message': 'party_added', 'party_id': cursor.lastrowid}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/parties/<int:party_id>', methods=['PUT'])
+@token_required
+def update_payment_party(current_user, party_id):
+    data = request.get_json() or {}
+    fields = {}
+    for k in ('party_type', 'party_id', 'amount', 'percentage'):
+        if k in data:
+            fields[k] = data[k]
+    if 'role' in data:
+        fields['role'] = data.get('role')
+    if not fields:
+        return jsonify({'error': 'no fields to update'}), 400
+    # normalize
+    if 'party_id' in fields:
+        try:
+            fields['party_id'] = int(fields['party_id'])
+        except Exception:
+            fields['party_id'] = None
+    if 'amount' in fields:
+        try:
+            fields['amount'] = float(fields['amount'])
+        except Exception:
+            fields['amount'] = None
+    if 'percentage' in fields:
+        try:
+            fields['percentage'] = float(fields['percentage'])
+        except Exception:
+            fields['percentage'] = None
+
+    try:
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            _note_party_deal(cursor, party_id)
+            set_clause = ', '.join([f"{k} = %s" for k in fields.keys()])
+            params = list(fields.values()) + [party_id]
+            try:
+                cursor.execute(f"UPDATE payment_parties SET {set_clause} WHERE id = %s", params)
+            except mysql.connector.Error as db_e:
+                # If percentage column doesn't exist and it's in set_clause, retry without it
+                if (getattr(db_e, 'errno', None) == 1054 or 'Unknown column' in str(db_e)) and 'percentage' in set_clause:
+                    # Build a reduced clause removing percentage
+                    reduced_fields = {k: v for k, v in fields.items() if k != 'percentage'}
+                    if not reduced_fields:
+                        return jsonify({'error': 'percentage column not present on server'}), 500
+                    set_clause2 = ', '.join([f"{k} = %s" for k in reduced_fields.keys()])
+                    params2 = list(reduced_fields.values()) + [party_id]
+                    cursor.execute(f"UPDATE payment_parties SET {set_clause2} WHERE id = %s", params2)
+                else:
+                    raise
+        return jsonify({'message': 'party_updated'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/parties/<int:party_id>', methods=['DELETE'])
+@token_required
+def delete_payment_party(current_user, party_id):
+    try:
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            _note_party_deal(cursor, party_id)
+            cursor.execute("DELETE FROM payment_parties WHERE id = %s", (party_id,))
+        return jsonify({'message': 'party_deleted'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/<int:deal_id>/<int:payment_id>', methods=['GET'])
+@read_only
+def get_payment_detail(deal_id, payment_id):
+    """Get detailed information for a specific payment including parties and proofs"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+        
+        # Get payment basic info
+        cursor.execute("SELECT * FROM payments WHERE deal_id = %s AND id = %s", (deal_id, payment_id))
+        payment = cursor.fetchone()
+        
+        if not payment:
+            return jsonify({'error': 'Payment not found'}), 404
+        
+        # Convert dates to isoformat
+        for k in ('payment_date', 'created_at'):
+            if payment.get(k) is not None and isinstance(payment.get(k), datetime):
+                payment[k] = payment[k].isoformat()
+        
+        # Get payment parties with names
+        cursor.execute("""
+            SELECT pp.id, pp.party_type, pp.party_id, pp.amount, pp.percentage, pp.role,
+                   CASE 
+                     WHEN pp.party_type = 'owner' THEN o.name
+                     WHEN pp.party_type = 'investor' THEN i.investor_name  
+                     WHEN pp.party_type = 'buyer' THEN b.name
+                     ELSE NULL
+                   END as party_name
+            FROM payment_parties pp 
+            LEFT JOIN owners o ON pp.party_type = 'owner' AND pp.party_id = o.id
+            LEFT JOIN investors i ON pp.party_type = 'investor' AND pp.party_id = i.id  
+            LEFT JOIN buyers b ON pp.party_type = 'buyer' AND pp.party_id = b.id
+            WHERE pp.payment_id = %s
+        """, (payment_id,))
+        parties = cursor.fetchall() or []
+        party_list = []
+        for p in parties:
+            party_list.append({
+                'id': p.get('id'),
+                'party_type': p.get('party_type'),
+                'party_id': p.get('party_id'),
+                'party_name': p.get('party_name'),
+                'amount': float(p.get('amount')) if p.get('amount') is not None else None,
+                'percentage': float(p.get('percentage')) if p.get('percentage') is not None else None,
+                'role': p.get('role')
+            })
+        payment['parties'] = party_list
+        
+        # Get payment proofs
+        cursor.execute("SELECT id, file_path, uploaded_by, uploaded_at, doc_type FROM payment_proofs WHERE payment_id = %s ORDER BY uploaded_at DESC", (payment_id,))
+        proofs = cursor.fetchall() or []
+        proof_list = []
+        for proof in proofs:
+            proof_data = {
+                'id': proof.get('id'),
+                'file_path': proof.get('file_path'),
+                'uploaded_by': proof.get('uploaded_by'),
+                'doc_type': proof.get('doc_type')
+            }
+            if proof.get('uploaded_at') and isinstance(proof.get('uploaded_at'), datetime):
+                proof_data['uploaded_at'] = proof.get('uploaded_at').isoformat()
+            proof_list.append(proof_data)
+        payment['proofs'] = proof_list
+        
+        return jsonify(payment)
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/<int:deal_id>/<int:payment_id>/proofs/<int:proof_id>', methods=['DELETE'])
+@token_required
+def delete_proof(current_user, deal_id, payment_id, proof_id):
+    """Delete a single proof by id (best-effort file removal)."""
+    try:
+        with unit_of_work() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT file_path, uploaded_by FROM payment_proofs WHERE id = %s AND payment_id = %s", (proof_id, payment_id))
+            row = cursor.fetchone()
+            if not row:
+                return jsonify({'error': 'proof not found'}), 404
+
+            # permission: only admin or uploader can delete
+            uploader = row.get('uploaded_by')
+            role = None
+            try:
+                role = request.user.get('role')
+            except Exception:
+                role = None
+            if not (role == 'admin' or uploader == current_user):
+                return jsonify({'error': 'forbidden'}), 403
+
+            # delete DB row
+            cursor.execute("DELETE FROM payment_proofs WHERE id = %s", (proof_id,))
+
+        # delete file
+        fp = row.get('file_path')
+        if fp:
+            p = fp.replace('\\', '/')
+            idx = p.find('uploads/')
+            if idx != -1:
+                rel = p[idx:]
+                abs_path = os.path.join(current_app.root_path, rel)
+                try:
+                    if os.path.exists(abs_path):
+                        os.remove(abs_path)
+                except Exception:
+                    pass
+
+        return jsonify({'message': 'proof deleted'})
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/payments/<int:deal_id>/<int:payment_id>/proof', methods=['POST'])
+@token_required
+def upload_payment_proof(current_user, deal_id, payment_id):
+    """Upload an image/file as proof for a payment. Expects form-data with key 'proof'."""
+    if 'proof' not in request.files:
+        return jsonify({'error': 'No proof file provided (use form field name "proof")'}), 400
+
+    file = request.files['proof']
+    if file.filename == '':
+        return jsonify({'error': 'Empty filename'}), 400
+
+    # Validation: accept any file type, but enforce size limit and secure filename
+    MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5 MB
+
+    # prefix filename with a timestamp to avoid collisions
+    base = secure_filename(file.filename)
+    ts = str(int(time.time()))
+    safe_name = f"{ts}_{base}"
+
+    # Size check (attempt to use content_length or file.stream)
+    size = None
+    try:
+        if hasattr(file, 'content_length') and file.content_length:
+            size = int(file.content_length)
+        else:
+            # try to seek stream
+            stream = file.stream
+            stream.seek(0, os.SEEK_END)
+            size = stream.tell()
+            stream.seek(0)
+    except Exception:
+        size = None
+
+    if size is not None and size > MAX_UPLOAD_SIZE:
+        return jsonify({'error': 'File too large, max 5MB'}), 400
+
+    # Save file under uploads/deal_<id>/payments/<payment_id>/
+    # Save file under uploads/deal_<id>/payments/<payment_id>/
+    save_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], f'deal_{deal_id}', 'payments', str(payment_id))
+    os.makedirs(save_dir, exist_ok=True)
+    save_path = os.path.join(save_dir, safe_name)
+    try:
+        file.save(save_path)
+    except Exception as e:
+        return jsonify({'error': f'Failed to save file: {e}'}), 500
+
+    # Store a web-friendly path starting with uploads/ so the frontend can request /uploads/...
+    # e.g. uploads/deal_50/payments/3/project.jpg
+    # Use a web-relative path (do not store the server absolute uploads folder path)
+    web_rel = os.path.join('uploads', f'deal_{deal_id}', 'payments', str(payment_id), safe_name).replace('\\', '/')
+
+    # Optional document type (e.g., receipt, bank_transfer, cheque, cash, upi, contra)
+    doc_type = request.form.get('doc_type')
+
+    # Persist metadata to payment_proofs table (if present)
+    try:
+        with unit_of_work() as conn:
+            cursor = conn.cursor()
+            # include doc_type if column exists (migration adds it)
+            try:
+                cursor.execute("INSERT INTO payment_proofs (payment_id, file_path, uploaded_by, doc_type) VALUES (%s,%s,%s,%s)", (payment_id, web_rel, current_user, doc_type))
+            except Exception:
+                # fallback if column doesn't exist
+                cursor.execute("INSERT INTO payment_proofs (payment_id, file_path, uploaded_by) VALUES (%s,%s,%s)", (payment_id, web_rel, current_user))
+        proof_id = cursor.lastrowid
+    except mysql.connector.Error as e:
+        # If table doesn't exist or insert fails, still return success for file save but warn
+        return jsonify({'warning': 'file_saved_but_db_insert_failed', 'file_path': web_rel, 'db_error': str(e)}), 200
+
+    return jsonify({'message': 'proof_uploaded', 'proof_id': proof_id, 'file_path': web_rel}), 201
+
+
+@bp.route('/api/payments/<int:deal_id>/<int:payment_id>/proofs', methods=['GET'])
+@read_only
+def list_payment_proofs(deal_id, payment_id):
+    """Return list of proof records for a given payment."""
+    try:
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id, file_path, uploaded_by, uploaded_at FROM payment_proofs WHERE payment_id = %s ORDER BY uploaded_at DESC", (payment_id,))
+        rows = cursor.fetchall()
+        # Convert file_path to a URL path the frontend can load (uploads are served at /uploads/...)
+        for r in rows:
+            if r.get('file_path'):
+                p = r['file_path'].replace('\\', '/')
+                # Remove any leading path components and ensure we start from uploads/
+                idx = p.find('uploads/')
+                if idx != -1:
+                    # Take everything from 'uploads/' onwards
+                    clean_path = p[idx:]
+                    # Backend serves uploads at /uploads, so don't double it
+                    if clean_path.startswith('uploads/'):
+                        clean_path = clean_path[8:]  # Remove 'uploads/' prefix
+                    file_url = f"/uploads/{clean_path}"
+                else:
+                    # Fallback - ensure it starts with /uploads/
+                    if not p.startswith('/'):
+                        p = '/' + p
+                    file_url = p if p.startswith('/uploads/') else f"/uploads{p}"
+                
+                # Build the complete URL with the backend host
+                try:
+                    base = request.host_url.rstrip('/')
+                    r['url'] = f"{base}{file_url}"
+                except Exception:
+                    # Fallback to the relative URL
+                    r['url'] = file_url
+            # include doc_type if present
+            if r.get('doc_type'):
+                r['doc_type'] = r.get('doc_type')
+        return jsonify(rows)
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
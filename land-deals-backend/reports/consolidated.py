@@ -0,0 +1,304 @@
+# reports/consolidated.py - Consolidated payments ledger of many deals in one PDF
+#
+# Quarter-end exports cover every deal, so they run as a background job
+# rather than inside the request: start() loads all the ledgers in a few
+# queries, hands each deal's section to a process pool to render as its own
+# PDF (largest first, so one big deal doesn't finish last on its own), then
+# merges the sections behind a table of contents - each line links to its
+# deal - and adds one bookmark per deal.
+#
+# The pool (per web worker, started on first use, spawn-based like the
+# password pool) has REPORT_WORKERS processes: by default half the CPUs this
+# process may run on, leaving the rest to the request threads.
+# REPORT_WORKERS=0 renders on the job thread (development, tests).
+#
+# Jobs are identified by their export cache key, and their progress is a
+# small JSON file next to the cached PDFs, so any worker can answer a status
+# request and an unchanged export is served from the cache without a new job.
+# While a job runs, its thread touches the progress file every
+# REPORT_JOB_HEARTBEAT_SECONDS, however long a section or the merge takes; a
+# job whose file hasn't been touched for REPORT_JOB_STALE_SECONDS (a few
+# heartbeats) is taken to have died with its worker and may be started again.
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+from config import env_int
+from export_cache import cache
+
+
+def _cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:   # not on Linux
+        return os.cpu_count() or 1
+
+
+REPORT_WORKERS = env_int('REPORT_WORKERS', max(1, _cpus() // 2))
+REPORT_JOB_HEARTBEAT_SECONDS = env_int('REPORT_JOB_HEARTBEAT_SECONDS', 5)
+REPORT_JOB_STALE_SECONDS = env_int('REPORT_JOB_STALE_SECONDS', 4 * REPORT_JOB_HEARTBEAT_SECONDS)
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_running = {}   # key -> thread, jobs of this process
+
+
+# --- run inside the pool processes ---------------------------------------
+
+def _render_section(path, section, upload_root):
+    from reports import ledger
+    return ledger.render(path, section, upload_root)
+
+
+# --- job side ----------------------------------------------------------------
+
+def _get_pool():
+    """This process's pool; a pool inherited through fork() is never reused."""
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn: forking a threaded server process is unsafe
+            _pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _progress_path(key):
+    return cache.path(key, 'progress')
+
+
+def _write_progress(key, **state):
+    """Replace the progress file of job `key` (atomically, it is read by other workers)."""
+    state['updated_at'] = time.time()
+    os.makedirs(cache.directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache.directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, _progress_path(key))
+    except OSError as e:
+        print(f"Consolidated ledger progress not saved: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def status(key):
+    """{'state': 'queued'|'rendering'|'merging'|'done'|'failed', 'done', 'total', ...} of job `key`;
+    None when there is no such job (or it died)."""
+    try:
+        with open(_progress_path(key)) as f:
+            state = json.load(f)
+            alive_at = os.fstat(f.fileno()).st_mtime   # moved on by the heartbeat
+    except (OSError, ValueError):
+        state = None
+    if cache.lookup(key, 'pdf') is not None:
+        return dict(state or {}, state='done')
+    if state is None or state.get('state') == 'done':   # done, but the PDF has been evicted since
+        return None
+    if state.get('state') not in ('done', 'failed') and key not in _running \
+            and time.time() - max(state.get('updated_at', 0), alive_at) > REPORT_JOB_STALE_SECONDS:
+        return None
+    return state
+
+
+def start(key, load, upload_root):
+    """Start rendering the export `key` in the background unless it is already done or under way.
+
+    load() -> [section, ...] (reports.ledger.load) runs on the job thread
+    and opens its own database connection. Returns the job's status.
+    """
+    with _lock:
+        current = status(key)
+        if current is not None and current['state'] != 'failed':
+            return current
+        thread = threading.Thread(target=_run, args=(key, load, upload_root),
+                                  name=f'ledger-{key[:8]}', daemon=True)
+        _running[key] = thread
+    _write_progress(key, state='queued', done=0, total=None)
+    thread.start()
+    metrics.incr('reports.consolidated_jobs')
+    return status(key)
+
+
+def _heartbeat(key, stop):
+    while not stop.wait(REPORT_JOB_HEARTBEAT_SECONDS):
+        try:
+            os.utime(_progress_path(key))
+        except OSError:
+            pass
+
+
+def _run(key, load, upload_root):
+    started = time.perf_counter()
+    paths = []
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(key, stop), name=f'ledger-{key[:8]}-heartbeat', daemon=True).start()
+    try:
+        sections = load()
+        _write_progress(key, state='rendering', done=0, total=len(sections))
+        pages = _render_sections(key, sections, upload_root, paths)
+        _write_progress(key, state='merging', done=len(sections), total=len(sections))
+        cache.render(key, 'pdf', lambda path: _merge(path, sections, paths, pages))
+        _write_progress(key, state='done', done=len(sections), total=len(sections), pages=sum(pages) or None)
+        metrics.observe('reports.consolidated_seconds', time.perf_counter() - started)
+    except Exception as e:
+        print(f"Consolidated ledger {key} failed: {e}")
+        metrics.incr('reports.consolidated_failures')
+        _write_progress(key, state='failed', error=str(e))
+    finally:
+        stop.set()
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with _lock:
+            _running.pop(key, None)
+
+
+def _render_sections(key, sections, upload_root, paths):
+    """Render every section to its own temp file, appended to `paths`; [pages, ...] in section order."""
+    global _pool
+    os.makedirs(cache.directory, exist_ok=True)
+    for _ in sections:
+        fd, path = tempfile.mkstemp(dir=cache.directory, suffix='.part')
+        os.close(fd)
+        paths.append(path)
+    pages = [0] * len(sections)
+    if REPORT_WORKERS <= 0:
+        for i, section in enumerate(sections):
+            pages[i] = _render_section(paths[i], section, upload_root)
+            _write_progress(key, state='rendering', done=i + 1, total=len(sections))
+        return pages
+
+    order = sorted(range(len(sections)), key=lambda i: -len(sections[i]['payments']))
+    pool = _get_pool()
+    futures = {pool.submit(_render_section, paths[i], sections[i], upload_root): i for i in order}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            pages[futures[future]] = future.result()
+            _write_progress(key, state='rendering', done=done, total=len(sections))
+    except BrokenProcessPool:
+        # a pool process died (e.g. OOM-killed): start a fresh pool next time
+        with _lock:
+            _pool = None
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+    return pages
+
+
+def _merge(path, sections, paths, pages):
+    """Contents page(s), then every section, with a bookmark and a contents link per deal."""
+    try:
+        from pypdf import PdfWriter
+        from pypdf.annotations import Link
+    except ImportError:
+        raise RuntimeError('pypdf not available on server')
+    from reports import ledger
+
+    # the contents lists each deal's first page, which depends on how many
+    # pages the contents itself takes: lay it out once to count, then for real
+    fd, toc_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    os.close(fd)
+    try:
+        links = _contents(toc_path, sections, pages, 0)
+        offset = max(page for page, _ in links) + 1 if links else 1
+        links = _contents(toc_path, sections, pages, offset)
+
+        writer = PdfWriter()
+        writer.append(toc_path, outline_item='Contents')
+        first_pages = []
+        for section, section_path in zip(sections, paths):
+            first_pages.append(len(writer.pages))
+            writer.append(section_path, outline_item=ledger.title(section), import_outline=False)
+        for (toc_page, rect), target in zip(links, first_pages):
+            writer.add_annotation(toc_page, Link(rect=rect, border=[0, 0, 0], target_page_index=target))
+        with open(path, 'wb') as f:
+            writer.write(f)
+    finally:
+        try:
+            os.remove(toc_path)
+        except OSError:
+            pass
+
+
+def _contents(path, sections, pages, offset):
+    """Write the contents at `path`, numbering deals from page `offset` + 1.
+
+    Returns [(page index, link rect), ...] per section.
+    """
+    from reports import engine, ledger
+    from reports.engine import money, text
+    k = engine.kit()
+    links = []
+
+    class Line(k.Flowable):
+        """One contents line that remembers where it was drawn."""
+
+        def __init__(self, cells, header=False):
+            super().__init__()
+            self.cells = cells
+            self.header = header
+
+        def wrap(self, available_width, available_height):
+            self.width = available_width
+            return available_width, 14
+
+        def draw(self):
+            c = self.canv
+            c.setFont(k.bold if self.header else k.font, 9)
+            title, where, count, amount, page = self.cells
+            c.drawString(0, 4, title[:60])
+            c.setFillColor(k.colors.HexColor('#777777'))
+            c.drawString(self.width * 0.45, 4, where[:40])
+            c.setFillColor(k.colors.black)
+            c.drawRightString(self.width * 0.78, 4, count)
+            c.drawRightString(self.width * 0.93, 4, amount)
+            c.drawRightString(self.width, 4, page)
+            if self.header:
+                return
+            x0, y0 = c.absolutePosition(0, 0)
+            links.append((c.getPageNumber() - 1, (x0, y0, x0 + self.width, y0 + 14)))
+
+    flowables = [k.Paragraph('Payments ledger', k.styles['title']),
+                 k.Paragraph(text(f"{len(sections)} deals · {sum(len(s['payments']) for s in sections)} payments · "
+                                  f"{money(sum(ledger.total(s) for s in sections))}"), k.styles['subtitle']),
+                 Line(('Deal', 'Location', 'Payments', 'Amount', 'Page'), header=True)]
+    page = offset + 1
+    for section, count in zip(sections, pages):
+        deal = section['deal']
+        where = ', '.join(str(deal[f]) for f in ('village', 'district', 'state') if deal.get(f))
+        flowables.append(Line((ledger.title(section), where, str(len(section['payments'])),
+                               money(ledger.total(section)), str(page))))
+        page += count
+    engine.layout(path, 'Payments ledger', flowables)
+    return links
+
+
+def stats():
+    with _lock:
+        running = len(_running)
+    return {'workers': max(0, REPORT_WORKERS), 'jobs_running': running}
+
+
+def shutdown():
+    """Stop this process's pool (worker exit)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None and _pool_pid == os.getpid():
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+metrics.register_gauge('consolidated_ledger', stats)
@@ -0,0 +1,251 @@
+# reports/engine.py - Shared ReportLab setup for PDF reports
+#
+# Everything that doesn't depend on the data is prepared once per process:
+# ReportLab itself (imported on the first report, never at startup), the
+# fonts, the paragraph and table styles and the page template class. The
+# letterhead and footer rule are drawn once per document into a form XObject
+# and stamped on every page, so each page only adds its page number.
+#
+# Reports are built from named sections. A section's flowables are cached by
+# the content hash of the data they show (fragment()), so re-exporting a
+# statement whose owners didn't change reuses the parsed owner table and only
+# rebuilds the sections that did. ReportLab assembles the whole document
+# before writing it, so it is written straight to a file rather than streamed.
+#
+# A TrueType font (REPORT_FONT / REPORT_FONT_BOLD, default DejaVu Sans when
+# installed) is used so amounts can carry the rupee sign; without one the
+# built-in Helvetica is used and amounts are prefixed with "Rs.".
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+import metrics
+from config import env_int
+
+REPORT_FONT = os.environ.get('REPORT_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+REPORT_FONT_BOLD = os.environ.get('REPORT_FONT_BOLD', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf')
+REPORT_FRAGMENT_CACHE = env_int('REPORT_FRAGMENT_CACHE', 256)   # sections kept per process
+REPORT_ORGANIZATION = os.environ.get('REPORT_ORGANIZATION', 'Land Deals Manager')
+
+_setup_lock = threading.Lock()
+_kit = None
+
+_fragments = OrderedDict()   # (name, version) -> Fragment
+_fragments_lock = threading.Lock()
+
+
+class ReportsUnavailable(Exception):
+    """ReportLab isn't installed on this server."""
+
+
+def kit():
+    """The per-process ReportLab setup (imports, fonts, styles, document class)."""
+    global _kit
+    if _kit is None:
+        with _setup_lock:
+            if _kit is None:
+                _kit = _setup()
+    return _kit
+
+
+class _Kit:
+    pass
+
+
+def _setup():
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_RIGHT
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import ParagraphStyle
+        from reportlab.lib.units import mm
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.platypus import (BaseDocTemplate, Flowable, Frame, Image, KeepTogether, PageBreak,
+                                        PageTemplate, Paragraph, Spacer, Table, TableStyle)
+    except ImportError as e:
+        raise ReportsUnavailable(str(e))
+
+    k = _Kit()
+    k.A4, k.mm, k.colors = A4, mm, colors
+    k.Paragraph, k.Spacer, k.Table, k.TableStyle = Paragraph, Spacer, Table, TableStyle
+    k.KeepTogether, k.PageBreak, k.Image, k.Flowable = KeepTogether, PageBreak, Image, Flowable
+
+    font, bold, k.currency = 'Helvetica', 'Helvetica-Bold', 'Rs. '
+    try:
+        pdfmetrics.registerFont(TTFont('Report', REPORT_FONT))
+        pdfmetrics.registerFont(TTFont('Report-Bold', REPORT_FONT_BOLD))
+        font, bold, k.currency = 'Report', 'Report-Bold', '₹'
+    except Exception as e:
+        print(f"Report font not loaded, using Helvetica: {e}")
+    k.font, k.bold = font, bold
+
+    k.styles = {
+        'title': ParagraphStyle('title', fontName=bold, fontSize=16, leading=20, spaceAfter=4),
+        'subtitle': ParagraphStyle('subtitle', fontName=font, fontSize=9, leading=12,
+                                   textColor=colors.HexColor('#555555'), spaceAfter=10),
+        'heading': ParagraphStyle('heading', fontName=bold, fontSize=12, leading=15, spaceBefore=10, spaceAfter=6),
+        'body': ParagraphStyle('body', fontName=font, fontSize=9, leading=12),
+        'cell': ParagraphStyle('cell', fontName=font, fontSize=8, leading=10),
+        'cell_bold': ParagraphStyle('cell_bold', fontName=bold, fontSize=8, leading=10),
+        'cell_right': ParagraphStyle('cell_right', fontName=font, fontSize=8, leading=10, alignment=TA_RIGHT),
+        'muted': ParagraphStyle('muted', fontName=font, fontSize=8, leading=10, textColor=colors.HexColor('#777777')),
+    }
+    k.table_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font),
+        ('FONTNAME', (0, 0), (-1, 0), bold),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#eeeeee')),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.HexColor('#999999')),
+        ('LINEBELOW', (0, 1), (-1, -1), 0.25, colors.HexColor('#dddddd')),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ])
+
+    width, height = A4
+    margin = 18 * mm
+
+    class ReportDocument(BaseDocTemplate):
+        """A4 document whose pages share one letterhead form."""
+
+        def __init__(self, filename, title, **kw):
+            super().__init__(filename, pagesize=A4, leftMargin=margin, rightMargin=margin,
+                             topMargin=margin + 10 * mm, bottomMargin=margin, title=title,
+                             author=REPORT_ORGANIZATION, **kw)
+            self.report_title = title
+            frame = Frame(margin, margin, width - 2 * margin, height - 2 * margin - 10 * mm, id='body')
+            self.addPageTemplates([PageTemplate(id='report', frames=[frame], onPage=self._decorate)])
+            self._form_ready = False
+
+        def _decorate(self, canv, doc):
+            if not self._form_ready:
+                canv.beginForm('letterhead')
+                canv.setFont(bold, 9)
+                canv.drawString(margin, height - margin + 2 * mm, REPORT_ORGANIZATION)
+                canv.setFont(font, 8)
+                canv.drawRightString(width - margin, height - margin + 2 * mm, self.report_title)
+                canv.setStrokeColor(colors.HexColor('#999999'))
+                canv.setLineWidth(0.5)
+                canv.line(margin, height - margin, width - margin, height - margin)
+                canv.line(margin, margin - 4 * mm, width - margin, margin - 4 * mm)
+                canv.endForm()
+                self._form_ready = True
+            canv.doForm('letterhead')
+            canv.setFont(font, 7)
+            canv.drawRightString(width - margin, margin - 8 * mm, f"Page {doc.page}")
+
+    k.ReportDocument = ReportDocument
+    metrics.incr('reports.setup')
+    return k
+
+
+def money(value):
+    if value is None or value == '':
+        return '-'
+    try:
+        return f"{kit().currency}{float(value):,.2f}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def text(value):
+    """Cell text with the XML specials Paragraph would interpret escaped."""
+    if value is None or value == '':
+        return '-'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()[:10]
+    return str(value).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def version(data):
+    """Content hash of a section's data (dicts/lists of plain values)."""
+    def plain(v):
+        if isinstance(v, (datetime, date)):
+            return v.isoformat()
+        if isinstance(v, Decimal):
+            return str(v)
+        return v
+    if isinstance(data, dict):
+        data = sorted((k, version(v) if isinstance(v, (dict, list)) else plain(v)) for k, v in data.items())
+    elif isinstance(data, list):
+        data = [version(v) if isinstance(v, (dict, list)) else plain(v) for v in data]
+    return hashlib.sha1(repr(data).encode('utf-8')).hexdigest()
+
+
+class Fragment:
+    """A cached section: its flowables plus the lock held while a document lays them out."""
+    __slots__ = ('key', 'flowables', 'lock')
+
+    def __init__(self, key, flowables):
+        self.key = key
+        self.flowables = flowables
+        self.lock = threading.Lock()
+
+
+def fragment(name, data, build):
+    """Section `name` for `data`, from build(kit, data) or the cache. Pass the result to build()."""
+    key = (name, version(data))
+    with _fragments_lock:
+        cached = _fragments.get(key)
+        if cached is not None:
+            _fragments.move_to_end(key)
+    if cached is not None:
+        metrics.incr('reports.fragment_hits')
+        return cached
+    metrics.incr('reports.fragment_misses')
+    cached = Fragment(key, build(kit(), data))
+    with _fragments_lock:
+        cached = _fragments.setdefault(key, cached)   # a concurrent build of the same section wins
+        while len(_fragments) > REPORT_FRAGMENT_CACHE:
+            _fragments.popitem(last=False)
+    return cached
+
+
+def table(k, header, rows, widths, numeric=()):
+    """A data table: header row plus rows of cell values (or flowables, e.g. images), columns in
+    `numeric` right-aligned."""
+    styles = k.styles
+    body = [[k.Paragraph(text(h), styles['cell_bold']) for h in header]]
+    for row in rows:
+        body.append([v if isinstance(v, k.Flowable)
+                     else k.Paragraph(text(v), styles['cell_right' if i in numeric else 'cell'])
+                     for i, v in enumerate(row)])
+    t = k.Table(body, colWidths=[w * k.mm for w in widths], repeatRows=1)
+    t.setStyle(k.table_style)
+    return t
+
+
+def build(path, title, fragments):
+    """Lay the flowables of `fragments` out into a PDF at `path`; returns the page count.
+
+    Platypus keeps layout state on the flowables, so a cached fragment is
+    used by one document at a time (locks taken in key order), and the
+    "already pushed to the next frame" mark a previous layout may have left
+    is cleared first - copying the flowables instead costs as much as
+    building them.
+    """
+    held = sorted({id(f): f for f in fragments}.values(), key=lambda f: f.key)
+    for f in held:
+        f.lock.acquire()
+    try:
+        flowables = []
+        for f in fragments:
+            for flowable in f.flowables:
+                flowable.__dict__.pop('_postponed', None)
+            flowables.extend(f.flowables)
+        return layout(path, title, flowables)
+    finally:
+        for f in reversed(held):
+            f.lock.release()
+
+
+def layout(path, title, flowables):
+    """Lay uncached `flowables` out into a PDF at `path`; returns the page count."""
+    doc = kit().ReportDocument(path, title)
+    doc.build(flowables)
+    metrics.incr('reports.documents')
+    return doc.page
@@ -0,0 +1,136 @@
+# reports/images.py - Pre-scaled proof thumbnails for PDF exports
+#
+# Payment proofs are phone photos and scans of several megabytes, drawn in
+# the PDFs at thumbnail size. thumbnail() decodes a file once (JPEGs at a
+# reduced scale straight from the decoder), scales it to the box it will be
+# drawn in at REPORT_IMAGE_DPI, and keeps the result as a small JPEG, which
+# ReportLab embeds as is. Results are keyed by file path, mtime, size and
+# target size, so a replaced file is decoded again.
+#
+# Two tiers: the most recently used thumbnails in memory (up to
+# REPORT_IMAGE_MEMORY_BYTES per process, including the report pool
+# processes) and all of them on disk in REPORT_IMAGE_CACHE_DIR, shared by
+# the workers and pruned like the export cache.
+import hashlib
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+import metrics
+from config import env_int
+from export_cache import ExportCache
+
+REPORT_IMAGE_DPI = env_int('REPORT_IMAGE_DPI', 150)
+REPORT_IMAGE_MEMORY_BYTES = env_int('REPORT_IMAGE_MEMORY_BYTES', 32 * 1024 * 1024)
+REPORT_IMAGE_CACHE_DIR = os.environ.get('REPORT_IMAGE_CACHE_DIR',
+                                        os.path.join(tempfile.gettempdir(), 'land-deals-thumbnails'))
+REPORT_IMAGE_CACHE_BYTES = env_int('REPORT_IMAGE_CACHE_BYTES', 256 * 1024 * 1024)
+
+_memory = OrderedDict()   # key -> JPEG bytes, b'' for files that can't be decoded
+_memory_bytes = 0
+_lock = threading.Lock()
+_disk = ExportCache(REPORT_IMAGE_CACHE_DIR, REPORT_IMAGE_CACHE_BYTES, name='report_images')
+
+
+def _key(path, st, box):
+    raw = repr((os.path.abspath(path), st.st_mtime_ns, st.st_size, box)).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def _remember(key, data):
+    global _memory_bytes
+    with _lock:
+        if key in _memory:
+            return
+        _memory[key] = data
+        _memory_bytes += len(data)
+        while _memory_bytes > REPORT_IMAGE_MEMORY_BYTES and _memory:
+            _, dropped = _memory.popitem(last=False)
+            _memory_bytes -= len(dropped)
+
+
+def _scale(path, box):
+    """JPEG bytes of the image at `path` fitted into `box` pixels; b'' when it isn't a readable image."""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return b''
+    try:
+        with Image.open(path) as im:
+            im.draft('RGB', box)   # JPEG: let the decoder scale down by up to 8x
+            im = ImageOps.exif_transpose(im)
+            if im.mode in ('RGBA', 'LA', 'P'):
+                im = im.convert('RGBA')
+                background = Image.new('RGB', im.size, 'white')
+                background.paste(im, mask=im.getchannel('A'))
+                im = background
+            else:
+                im = im.convert('RGB')
+            im.thumbnail(box)
+            buf = BytesIO()
+            im.save(buf, 'JPEG', quality=85, optimize=True)
+            return buf.getvalue()
+    except Exception as e:
+        print(f"Proof image not usable ({path}): {e}")
+        return b''
+
+
+def thumbnail(path, width, height):
+    """JPEG bytes of the image at `path` scaled to fit `width` x `height` points; None when the
+    file is missing or isn't an image (e.g. a PDF proof)."""
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    box = (math.ceil(width * REPORT_IMAGE_DPI / 72), math.ceil(height * REPORT_IMAGE_DPI / 72))
+    key = _key(path, st, box)
+
+    with _lock:
+        data = _memory.get(key)
+        if data is not None:
+            _memory.move_to_end(key)
+    if data is not None:
+        metrics.incr('report_images.memory_hits')
+        return data or None
+
+    cached = _disk.lookup(key, 'jpg')
+    if cached is not None:
+        try:
+            with open(cached, 'rb') as f:
+                data = f.read()
+            metrics.incr('report_images.disk_hits')
+        except OSError:
+            data = None   # evicted in between
+    if data is None:
+        started = time.perf_counter()
+        data = _scale(path, box)
+        metrics.incr('report_images.decodes')
+        metrics.observe('report_images.decode_seconds', time.perf_counter() - started)
+        if data:
+            try:
+                _disk.store(key, 'jpg', data)
+            except OSError as e:
+                print(f"Proof thumbnail not cached on disk: {e}")
+    _remember(key, data)
+    return data or None
+
+
+def flowable(k, path, width, height):
+    """Platypus image of the proof at `path` fitted into `width` x `height` points, or None."""
+    data = thumbnail(path, width, height)
+    if data is None:
+        return None
+    return k.Image(BytesIO(data), width=width, height=height, kind='proportional')
+
+
+def stats():
+    with _lock:
+        entries, size = len(_memory), _memory_bytes
+    return {'memory_entries': entries, 'memory_bytes': size, 'disk': _disk.stats()}
+
+
+metrics.register_gauge('report_images', stats)
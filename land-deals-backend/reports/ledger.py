@@ -0,0 +1,148 @@
+# reports/ledger.py - Per-deal payment ledger sections for the consolidated ledger PDF
+#
+# load() reads the ledgers of any number of deals in four queries (deals,
+# payments, party splits, latest proof per payment) and returns one section
+# per deal; render() lays a single section out as its own PDF. Sections are
+# plain dicts, so they can be handed to another process to render.
+import os
+
+from reports import engine, images
+from reports.engine import money, text
+
+# query args narrowing the payments of every section (party filters select
+# deals' payments by participant, which a per-deal ledger doesn't need)
+FILTERS = (
+    ('start_date', 'p.payment_date >= %s'),
+    ('end_date', 'p.payment_date <= %s'),
+    ('payment_mode', 'p.payment_mode = %s'),
+    ('payment_type', 'p.payment_type = %s'),
+)
+
+
+def deal_ids(value):
+    """[int, ...] from a comma-separated ?deal_ids= value; ValueError on anything else."""
+    ids = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if part:
+            ids.append(int(part))
+    return list(dict.fromkeys(ids))
+
+
+def _where(ids, args):
+    clauses, params = [], []
+    if ids:
+        clauses.append(f"p.deal_id IN ({', '.join(['%s'] * len(ids))})")
+        params.extend(ids)
+    for name, clause in FILTERS:
+        if args.get(name):
+            clauses.append(clause)
+            params.append(args[name])
+    return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def load(cursor, ids, args):
+    """Sections [{'deal', 'payments'}] for deals `ids` (all deals with matching payments when
+    empty), in the order of `ids` or by deal id. Dictionary cursor."""
+    where, params = _where(ids, args)
+    cursor.execute(f"SELECT p.* FROM payments p {where} ORDER BY p.deal_id, p.payment_date, p.id", params)
+    payments = cursor.fetchall()
+    by_payment = {p['id']: p for p in payments}
+    for p in payments:
+        p['parties'], p['proof'] = [], None
+
+    cursor.execute(f"""
+        SELECT pp.* FROM payment_parties pp JOIN payments p ON p.id = pp.payment_id {where}
+        ORDER BY pp.payment_id, pp.id
+    """, params)
+    for row in cursor.fetchall():
+        by_payment[row['payment_id']]['parties'].append(row)
+
+    cursor.execute(f"""
+        SELECT pr.payment_id, pr.file_path FROM payment_proofs pr JOIN payments p ON p.id = pr.payment_id {where}
+        ORDER BY pr.payment_id, pr.uploaded_at DESC, pr.id DESC
+    """, params)
+    for row in cursor.fetchall():
+        payment = by_payment[row['payment_id']]
+        if payment['proof'] is None:
+            payment['proof'] = row['file_path']
+
+    ids = ids or sorted({p['deal_id'] for p in payments})
+    if not ids:
+        return []
+    cursor.execute(f"""
+        SELECT id, project_name, survey_number, village, taluka, district, state
+        FROM deals WHERE id IN ({', '.join(['%s'] * len(ids))})
+    """, ids)
+    deals = {d['id']: d for d in cursor.fetchall()}
+    sections = {deal_id: {'deal': deals[deal_id], 'payments': []} for deal_id in ids if deal_id in deals}
+    for p in payments:
+        if p['deal_id'] in sections:
+            sections[p['deal_id']]['payments'].append(p)
+    return list(sections.values())
+
+
+def title(section):
+    deal = section['deal']
+    return deal.get('project_name') or f"Deal #{deal['id']}"
+
+
+def total(section):
+    return sum(float(p.get('amount') or 0) for p in section['payments'])
+
+
+def proof_path(upload_root, file_path):
+    """Absolute path of a stored proof ('.../uploads/...'), or None when it isn't an upload."""
+    p = (file_path or '').replace('\\', '/')
+    idx = p.find('uploads/')
+    if idx == -1:
+        return None
+    return os.path.abspath(os.path.join(upload_root, p[idx:]))
+
+
+def _party(pp):
+    return pp.get('party_name') or f"{pp.get('party_type') or 'party'} #{pp.get('party_id') or '-'}"
+
+
+def _heading(k, deal):
+    s = k.styles
+    where = ', '.join(str(deal[f]) for f in ('village', 'taluka', 'district', 'state') if deal.get(f))
+    lines = [f"Deal #{deal['id']}", f"Survey {deal['survey_number']}" if deal.get('survey_number') else None, where]
+    return [k.Paragraph(text(deal.get('project_name') or f"Deal #{deal['id']}"), s['title']),
+            k.Paragraph(text(' · '.join(line for line in lines if line)), s['subtitle'])]
+
+
+def _payments(upload_root):
+    def build(k, payments):
+        s = k.styles
+        body = [[k.Paragraph(h, s['cell_bold']) for h in
+                 ('Date', 'Mode / ref', 'Type', 'Paid by', 'Paid to', 'Amount', 'Proof')]]
+        for p in payments:
+            payers = ', '.join(_party(pp) for pp in p['parties'] if (pp.get('role') or '').lower() == 'payer')
+            payees = ', '.join(_party(pp) for pp in p['parties'] if (pp.get('role') or '').lower() == 'payee')
+            mode = ' / '.join(str(v) for v in (p.get('payment_mode'), p.get('reference')) if v)
+            proof = proof_path(upload_root, p.get('proof'))
+            proof = images.flowable(k, proof, 16 * k.mm, 12 * k.mm) if proof else None
+            body.append([k.Paragraph(text(p.get('payment_date')), s['cell']), k.Paragraph(text(mode), s['cell']),
+                         k.Paragraph(text(p.get('payment_type')), s['cell']), k.Paragraph(text(payers), s['cell']),
+                         k.Paragraph(text(payees), s['cell']),
+                         k.Paragraph(text(money(p.get('amount'))), s['cell_right']),
+                         proof or k.Paragraph('-', s['muted'])])
+        body.append([k.Paragraph('Total', s['cell_bold'])] + [''] * 4 +
+                    [k.Paragraph(text(money(sum(float(p.get('amount') or 0) for p in payments))), s['cell_right']),
+                     ''])
+        t = k.Table(body, colWidths=[w * k.mm for w in (20, 30, 24, 30, 30, 24, 18)], repeatRows=1)
+        t.setStyle(k.table_style)
+        return [t]
+    return build
+
+
+def render(path, section, upload_root):
+    """Write the ledger of one deal `section` (from load()) as a PDF at `path`; returns its page count."""
+    deal = section['deal']
+    fragments = [engine.fragment(f"ledger-heading:{deal['id']}", deal, _heading)]
+    if section['payments']:
+        # the proof files are part of the content: a moved upload root is a different section
+        fragments.append(engine.fragment(f"ledger-payments:{deal['id']}:{upload_root}",
+                                         section['payments'], _payments(upload_root)))
+    return engine.build(path, f"Payments ledger · {title(section)}", fragments)
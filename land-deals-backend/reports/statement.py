@@ -0,0 +1,143 @@
+# reports/statement.py - Deal statement PDF: summary, people, expenses and payments
+#
+# load() reads everything in a fixed number of queries (the deal aggregate
+# plus one query each for payments, their party splits and their latest
+# proofs, shown as thumbnails from reports.images); render() lays the
+# sections out through reports.engine, which reuses the flowables of any
+# section whose data hasn't changed since the last statement.
+from deals.aggregate import fetch_deal
+from reports import engine, images, ledger
+from reports.engine import money, table, text
+
+
+def load(cursor, deal_id):
+    """Everything the statement shows, or None when the deal doesn't exist. Dictionary cursor."""
+    data = fetch_deal(cursor, deal_id)
+    if data is None:
+        return None
+    cursor.execute("SELECT p.* FROM payments p WHERE p.deal_id = %s ORDER BY p.payment_date, p.id", (deal_id,))
+    payments = cursor.fetchall()
+    cursor.execute("""
+        SELECT pp.* FROM payment_parties pp
+        JOIN payments p ON p.id = pp.payment_id
+        WHERE p.deal_id = %s
+        ORDER BY pp.payment_id, pp.id
+    """, (deal_id,))
+    parties = {}
+    for row in cursor.fetchall():
+        parties.setdefault(row['payment_id'], []).append(row)
+    cursor.execute("""
+        SELECT pr.payment_id, pr.file_path FROM payment_proofs pr
+        JOIN payments p ON p.id = pr.payment_id
+        WHERE p.deal_id = %s
+        ORDER BY pr.payment_id, pr.uploaded_at DESC, pr.id DESC
+    """, (deal_id,))
+    proofs = {}
+    for row in cursor.fetchall():
+        proofs.setdefault(row['payment_id'], row['file_path'])
+    for payment in payments:
+        payment['parties'] = parties.get(payment['id'], [])
+        payment['proof'] = proofs.get(payment['id'])
+    data['payments'] = payments
+    return data
+
+
+def version(data):
+    """Content version of the whole statement (the export cache key)."""
+    return engine.version(data)
+
+
+def _party(pp):
+    return pp.get('party_name') or f"{pp.get('party_type') or 'party'} #{pp.get('party_id') or '-'}"
+
+
+def _total(rows, key):
+    return sum(float(r.get(key) or 0) for r in rows)
+
+
+# --- sections: build(kit, data) -> [flowable, ...] -------------------------
+
+def _summary(k, deal):
+    s = k.styles
+    title = deal.get('project_name') or f"Deal #{deal.get('id')}"
+    where = ', '.join(str(deal[f]) for f in ('village', 'taluka', 'district', 'state') if deal.get(f))
+    area = f"{deal.get('total_area')} {deal.get('area_unit') or ''}".strip() if deal.get('total_area') else None
+    facts = [
+        ('Survey number', deal.get('survey_number')), ('Location', where or deal.get('location')),
+        ('Area', area), ('Status', deal.get('status')),
+        ('Purchase date', deal.get('purchase_date')), ('Purchase amount', money(deal.get('purchase_amount'))),
+        ('Selling amount', money(deal.get('selling_amount'))), ('Payment mode', deal.get('payment_mode')),
+    ]
+    rows = [[k.Paragraph(text(label), s['muted']), k.Paragraph(text(value), s['body'])] for label, value in facts]
+    grid = k.Table(rows, colWidths=[40 * k.mm, 130 * k.mm])
+    grid.setStyle(k.TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'), ('BOTTOMPADDING', (0, 0), (-1, -1), 2)]))
+    return [k.Paragraph(text(title), s['title']),
+            k.Paragraph(f"Deal statement · deal #{deal.get('id')}", s['subtitle']),
+            grid]
+
+
+def _people(heading):
+    def build(k, people):
+        rows = [(p.get('name'), p.get('mobile'), p.get('email'), p.get('pan_card')) for p in people]
+        return [k.Paragraph(heading, k.styles['heading']),
+                table(k, ['Name', 'Mobile', 'Email', 'PAN'], rows, [55, 30, 55, 30])]
+    return build
+
+
+def _investors(k, investors):
+    rows = [(i.get('investor_name'), money(i.get('investment_amount')),
+             f"{i['investment_percentage']}%" if i.get('investment_percentage') is not None else None,
+             i.get('mobile'), i.get('pan_card')) for i in investors]
+    rows.append(('Total', money(_total(investors, 'investment_amount')),
+                 f"{_total(investors, 'investment_percentage'):g}%", None, None))
+    return [k.Paragraph('Investors', k.styles['heading']),
+            table(k, ['Investor', 'Amount', 'Share', 'Mobile', 'PAN'], rows, [55, 35, 20, 30, 30], numeric=(1, 2))]
+
+
+def _expenses(k, expenses):
+    rows = [(e.get('expense_date'), e.get('expense_type'), e.get('expense_description'), e.get('paid_by_name'),
+             money(e.get('amount'))) for e in expenses]
+    rows.append((None, None, 'Total', None, money(_total(expenses, 'amount'))))
+    return [k.Paragraph('Expenses', k.styles['heading']),
+            table(k, ['Date', 'Type', 'Description', 'Paid by', 'Amount'], rows, [22, 28, 60, 32, 28], numeric=(4,))]
+
+
+def _payments(upload_root):
+    def build(k, payments):
+        rows = []
+        for p in payments:
+            payers = ', '.join(_party(pp) for pp in p['parties'] if (pp.get('role') or '').lower() == 'payer')
+            payees = ', '.join(_party(pp) for pp in p['parties'] if (pp.get('role') or '').lower() == 'payee')
+            proof = ledger.proof_path(upload_root, p.get('proof'))
+            rows.append((p.get('payment_date'), p.get('payment_mode'), p.get('payment_type'), p.get('status'),
+                         payers or None, payees or None, money(p.get('amount')),
+                         images.flowable(k, proof, 14 * k.mm, 10 * k.mm) if proof else None))
+        rows.append((None, None, None, None, None, 'Total', money(_total(payments, 'amount')), None))
+        return [k.Paragraph('Payments', k.styles['heading']),
+                table(k, ['Date', 'Mode', 'Type', 'Status', 'Paid by', 'Paid to', 'Amount', 'Proof'], rows,
+                      [20, 18, 24, 16, 26, 26, 26, 16], numeric=(6,))]
+    return build
+
+
+def sections(data, upload_root):
+    """(name, data, build) per section, in document order; empty sections are left out."""
+    deal_id = data['deal'].get('id')
+    result = [(f'summary:{deal_id}', data['deal'], _summary)]
+    for key, heading in (('owners', 'Owners'), ('buyers', 'Buyers')):
+        if data.get(key):
+            result.append((f'{key}:{deal_id}', data[key], _people(heading)))
+    if data.get('investors'):
+        result.append((f'investors:{deal_id}', data['investors'], _investors))
+    if data.get('expenses'):
+        result.append((f'expenses:{deal_id}', data['expenses'], _expenses))
+    if data.get('payments'):
+        result.append((f'payments:{deal_id}:{upload_root}', data['payments'], _payments(upload_root)))
+    return result
+
+
+def render(path, data, upload_root):
+    """Write the statement for `data` (from load()) as a PDF at `path`; proofs are read below `upload_root`."""
+    fragments = [engine.fragment(name, section_data, build)
+                 for name, section_data, build in sections(data, upload_root)]
+    title = f"Deal statement · {data['deal'].get('project_name') or data['deal'].get('id')}"
+    engine.build(path, title, fragments)
@@ -0,0 +1,321 @@
+# search/index.py - In-process trigram index over deals and the people on them
+#
+# Every deal contributes one document for itself (project name, survey
+# number, village, taluka) and one per owner, buyer and investor (name,
+# mobile, PAN). Documents are broken into trigrams of their words, padded at
+# the start ("  p", " pu", "pun", ...), so a query matches by word prefix as
+# well as fuzzily (a typo costs a few trigrams, not the whole match).
+#
+# A query only looks at the postings of its rarest trigrams to collect
+# candidates - a document needing k of n query trigrams must contain one of
+# the n - k + 1 rarest - and counts the rest with set lookups, which keeps a
+# query to a few milliseconds on tens of thousands of deals.
+#
+# Each worker holds its own index, loaded on the first search. The deal a
+# write touched is re-read right away in the writing worker and logged in
+# search_changes; other workers replay that log every SEARCH_SYNC_SECONDS,
+# and everything is reloaded every SEARCH_REBUILD_SECONDS to pick up writes
+# made outside the app. Log rows older than a day are pruned by the writing
+# workers, each at most every SEARCH_PRUNE_SECONDS (searches may run on a
+# read replica, so the replaying side can't delete).
+import heapq
+import math
+import threading
+import time
+from collections import Counter
+
+import mysql.connector
+
+import metrics
+from config import env_float, env_int
+
+SEARCH_SYNC_SECONDS = env_float('SEARCH_SYNC_SECONDS', 2)
+SEARCH_REBUILD_SECONDS = env_int('SEARCH_REBUILD_SECONDS', 3600)
+SEARCH_MIN_SIMILARITY = env_float('SEARCH_MIN_SIMILARITY', 0.6)
+SEARCH_PRUNE_SECONDS = env_int('SEARCH_PRUNE_SECONDS', 600)
+
+TYPES = ('deal', 'owner', 'buyer', 'investor')
+
+# type -> (SELECT for one kind of document, deal id column, {field: column})
+_SOURCES = {
+    'deal': ("SELECT id, id AS deal_id, project_name, survey_number, village, taluka FROM deals", 'id',
+             {'project_name': 'project_name', 'survey_number': 'survey_number',
+              'village': 'village', 'taluka': 'taluka'}),
+    'owner': ("SELECT id, deal_id, name, mobile, pan_card FROM owners", 'deal_id',
+              {'name': 'name', 'mobile': 'mobile', 'pan': 'pan_card'}),
+    'buyer': ("SELECT id, deal_id, name, mobile, pan_card FROM buyers", 'deal_id',
+              {'name': 'name', 'mobile': 'mobile', 'pan': 'pan_card'}),
+    'investor': ("SELECT id, deal_id, investor_name, mobile, pan_card FROM investors", 'deal_id',
+                 {'name': 'investor_name', 'mobile': 'mobile', 'pan': 'pan_card'}),
+}
+
+# An identifier typed in full beats a name that merely equals the query
+_FIELD_WEIGHT = {'survey_number': 1.2, 'pan': 1.2, 'mobile': 1.1}
+
+
+def _clean(text):
+    return ' '.join(str(text).split()) if text is not None else ''
+
+
+def normalize(text):
+    return _clean(text).casefold()
+
+
+def trigrams(text, pad_end=True):
+    """Padded trigrams of every word of normalized `text`.
+
+    Queries leave the end unpadded so a partial last word still matches.
+    """
+    grams = set()
+    for word in text.split():
+        padded = '  ' + word + (' ' if pad_end else '')
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _Doc:
+    __slots__ = ('type', 'id', 'deal_id', 'labels', 'fields')
+
+    def __init__(self, doc_type, doc_id, deal_id, labels):
+        self.type = doc_type
+        self.id = doc_id
+        self.deal_id = deal_id
+        self.labels = labels     # {field: text as entered, whitespace collapsed}
+        self.fields = {field: text.casefold() for field, text in labels.items()}
+
+    def grams(self):
+        # recomputed rather than kept: one set per document would double the
+        # memory and the garbage collector's work
+        return trigrams(' '.join(self.fields.values()))
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()          # guards the structures below
+        self._build_lock = threading.Lock()    # one full load at a time
+        self._docs = {}         # doc number -> _Doc
+        self._numbers = {}      # (type, id) -> doc number; postings hold the small ints
+        self._postings = {}     # trigram -> {doc number, ...}
+        self._by_deal = {}      # deal id -> {doc number, ...}
+        self._next = 0
+        self._titles = {}       # deal id -> project name, for result subtitles
+        self._built_at = None
+        self._synced_at = 0.0
+        self._pruned_at = None
+        self._change_id = 0
+        self._log_missing = False
+
+    # --- loading -----------------------------------------------------------
+
+    def _fetch(self, cursor, deal_ids=None):
+        """Documents for `deal_ids` (all deals when None)."""
+        docs = []
+        for doc_type, (select, deal_column, fields) in _SOURCES.items():
+            sql, params = select, []
+            if deal_ids is not None:
+                sql += f" WHERE {deal_column} IN ({','.join(['%s'] * len(deal_ids))})"
+                params = list(deal_ids)
+            try:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            except mysql.connector.Error as e:
+                if e.errno in (1054, 1146):   # table/column not in this schema
+                    continue
+                raise
+            for row in rows:
+                labels = {field: _clean(row[column]) for field, column in fields.items()}
+                docs.append(_Doc(doc_type, row['id'], row['deal_id'], {k: v for k, v in labels.items() if v}))
+        return docs
+
+    def _add(self, doc):
+        self._next += 1
+        number = self._next
+        self._docs[number] = doc
+        self._numbers[(doc.type, doc.id)] = number
+        self._by_deal.setdefault(doc.deal_id, set()).add(number)
+        for gram in doc.grams():
+            self._postings.setdefault(gram, set()).add(number)
+        if doc.type == 'deal':
+            self._titles[doc.deal_id] = doc.labels.get('project_name', '')
+
+    def _remove_deal(self, deal_id):
+        for number in self._by_deal.pop(deal_id, ()):
+            doc = self._docs.pop(number)
+            self._numbers.pop((doc.type, doc.id), None)
+            for gram in doc.grams():
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.discard(number)
+                    if not posting:
+                        del self._postings[gram]
+        self._titles.pop(deal_id, None)
+
+    def build(self, cursor):
+        """Load every document through `cursor` and replace the index."""
+        started = time.perf_counter()
+        change_id = self._last_change_id(cursor)
+        docs = self._fetch(cursor)
+        fresh = SearchIndex()
+        for doc in docs:
+            fresh._add(doc)
+        with self._lock:
+            self._docs, self._numbers, self._postings = fresh._docs, fresh._numbers, fresh._postings
+            self._by_deal, self._titles, self._next = fresh._by_deal, fresh._titles, fresh._next
+            self._built_at = self._synced_at = time.monotonic()
+            if change_id is not None:
+                self._change_id = change_id
+        metrics.incr('search.builds')
+        metrics.observe('search.build_seconds', time.perf_counter() - started)
+
+    def reindex(self, cursor, deal_ids):
+        """Re-read the documents of `deal_ids` (deleted deals drop out)."""
+        deal_ids = sorted({int(d) for d in deal_ids if d is not None})
+        if not deal_ids or self._built_at is None:
+            return
+        docs = self._fetch(cursor, deal_ids)
+        with self._lock:
+            for deal_id in deal_ids:
+                self._remove_deal(deal_id)
+            for doc in docs:
+                self._add(doc)
+        metrics.incr('search.reindexed_deals', len(deal_ids))
+
+    # --- change log --------------------------------------------------------
+
+    def _last_change_id(self, cursor):
+        if self._log_missing:
+            return None
+        try:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) AS id FROM search_changes")
+            return int(cursor.fetchall()[0]['id'])
+        except mysql.connector.Error as e:
+            if e.errno != 1146:
+                raise
+            self._log_missing = True   # migration not applied: rebuilds only
+            return None
+
+    def log_changes(self, cursor, deal_ids):
+        """Record written deals for the other workers (the caller commits)."""
+        if self._log_missing or not deal_ids:
+            return
+        try:
+            cursor.executemany("INSERT INTO search_changes (deal_id) VALUES (%s)",
+                               [(int(d),) for d in deal_ids])
+            now = time.monotonic()
+            if self._pruned_at is None or now - self._pruned_at >= SEARCH_PRUNE_SECONDS:
+                self._pruned_at = now
+                cursor.execute("DELETE FROM search_changes WHERE changed_at < NOW() - INTERVAL 1 DAY LIMIT 5000")
+                metrics.incr('search.pruned_changes', max(cursor.rowcount, 0))
+        except mysql.connector.Error as e:
+            if e.errno != 1146:
+                raise
+            self._log_missing = True
+
+    def ensure_current(self, cursor):
+        """Load on first use, replay other workers' changes, rebuild when due."""
+        now = time.monotonic()
+        if self._built_at is None or now - self._built_at >= SEARCH_REBUILD_SECONDS:
+            first = self._built_at is None
+            # a rebuild keeps serving the old index; the first load makes everyone wait
+            if self._build_lock.acquire(blocking=first):
+                try:
+                    if self._built_at is None or time.monotonic() - self._built_at >= SEARCH_REBUILD_SECONDS:
+                        self.build(cursor)
+                        return
+                finally:
+                    self._build_lock.release()
+        if self._log_missing or now - self._synced_at < SEARCH_SYNC_SECONDS:
+            return
+        self._synced_at = now
+        try:
+            cursor.execute("SELECT id, deal_id FROM search_changes WHERE id > %s ORDER BY id LIMIT 5000",
+                           (self._change_id,))
+            rows = cursor.fetchall()
+        except mysql.connector.Error as e:
+            if e.errno != 1146:
+                raise
+            self._log_missing = True
+            return
+        if rows:
+            self.reindex(cursor, [r['deal_id'] for r in rows])
+            self._change_id = max(self._change_id, rows[-1]['id'])
+            metrics.incr('search.synced_changes', len(rows))
+
+    # --- querying ----------------------------------------------------------
+
+    def search(self, query, types=None, limit=20):
+        """Ranked matches for `query`: [{'type', 'id', 'deal_id', 'title', 'subtitle', 'field', 'score'}]."""
+        text = normalize(query)
+        if len(text) < 2:
+            return []
+        grams = trigrams(text, pad_end=False)
+        needed = max(1, math.ceil(len(grams) * SEARCH_MIN_SIMILARITY))
+        with self._lock:
+            postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+            candidates = set().union(*postings[:len(grams) - needed + 1])
+            counts = Counter()
+            for posting in postings:
+                counts.update(candidates & posting)
+            scored = []
+            for number, hits in counts.items():
+                if hits < needed:
+                    continue
+                doc = self._docs[number]
+                if types and doc.type not in types:
+                    continue
+                field, score = _rank(doc, text, hits / len(grams))
+                scored.append((score, doc, field))
+            top = heapq.nsmallest(limit, scored, key=lambda m: (-m[0], m[1].type, m[1].id))
+            results = []
+            for score, doc, field in top:
+                if field is None:
+                    field = _closest_field(doc, grams)
+                title = self._titles.get(doc.deal_id, '')
+                results.append({
+                    'type': doc.type,
+                    'id': doc.id,
+                    'deal_id': doc.deal_id,
+                    'title': title if doc.type == 'deal' else doc.labels.get('name', ''),
+                    'subtitle': _deal_line(doc) if doc.type == 'deal' else title,
+                    'field': field,
+                    'score': round(score, 3),
+                })
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._docs),
+                'trigrams': len(self._postings),
+                'age_seconds': round(time.monotonic() - self._built_at) if self._built_at else None,
+                'change_id': self._change_id,
+            }
+
+
+def _rank(doc, text, similarity):
+    """(field, score): whole field > field prefix > all query trigrams present > fuzzy.
+
+    The field is None unless a field prefix matched; _closest_field() names
+    it for the results actually returned.
+    """
+    best_field, best = None, 0.0
+    for field, value in doc.fields.items():
+        if value.startswith(text):
+            score = 3.0 * _FIELD_WEIGHT.get(field, 1.0) if len(value) == len(text) else 2.0
+            if score > best:
+                best_field, best = field, score
+    if best_field is None and similarity == 1.0:
+        best = 1.5   # every word of the query starts a word of the document
+    return best_field, best + similarity
+
+
+def _closest_field(doc, grams):
+    return max(doc.fields, key=lambda field: len(trigrams(doc.fields[field]) & grams), default=None)
+
+
+def _deal_line(doc):
+    parts = [doc.labels.get('survey_number'), doc.labels.get('village'), doc.labels.get('taluka')]
+    return ', '.join(p for p in parts if p)
+
+
+index = SearchIndex()
@@ -0,0 +1,75 @@
+# search/routes.py - Global search over deals, owners, buyers and investors
+import time
+
+import mysql.connector
+from flask import Blueprint, g, jsonify, request
+
+import metrics
+from auth import token_required
+from db import get_db, read_only, written_deals
+from search.index import TYPES, index
+
+bp = Blueprint('search', __name__)
+
+MAX_LIMIT = 50
+
+# blueprints whose writes can change indexed fields
+_INDEXED_BLUEPRINTS = {'deals', 'owners', 'investors'}
+
+
+@bp.route('/api/search', methods=['GET'])
+@token_required
+@read_only
+def global_search(current_user):
+    """Ranked prefix/fuzzy matches for ?q= on project names, survey numbers,
+    villages, talukas and the names, mobiles and PANs of owners, buyers and
+    investors. Optional ?types=deal,owner,buyer,investor and ?limit= (max 50).
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    types = {t.strip() for t in request.args.get('types', '').split(',') if t.strip()}
+    unknown = types - set(TYPES)
+    if unknown:
+        return jsonify({'error': f"unknown types: {', '.join(sorted(unknown))}"}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_LIMIT)
+
+    try:
+        cursor = get_db().cursor(dictionary=True)
+        index.ensure_current(cursor)
+        cursor.close()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    started = time.perf_counter()
+    results = index.search(query, types or None, limit)
+    took = time.perf_counter() - started
+    metrics.incr('search.queries')
+    metrics.observe('search.seconds', took)
+    return jsonify({'query': query, 'results': results, 'took_ms': round(took * 1000, 2)})
+
+
+@bp.after_app_request
+def reindex_written_deal(response):
+    """Re-read the written deal's documents here and log it for the other workers."""
+    if (request.blueprint not in _INDEXED_BLUEPRINTS or request.method in ('GET', 'HEAD', 'OPTIONS')
+            or response.status_code >= 400 or 'db_conn' not in g or g.get('db_replica')):
+        return response
+    # owner and investor handlers note their deal (db.note_written_deals):
+    # this worker's index may not be loaded, so it can't be asked
+    deal_ids = written_deals()
+    conn = g.db_conn
+    if not deal_ids or conn is None or conn.in_transaction:
+        return response
+    try:
+        cursor = conn.cursor(dictionary=True)
+        index.reindex(cursor, deal_ids)
+        index.log_changes(cursor, deal_ids)
+        cursor.close()
+        conn.commit()
+    except mysql.connector.Error as e:
+        print(f"Search reindex for deals {deal_ids} failed: {e}")
+    return response
+
+
+metrics.register_gauge('search', index.stats)
@@ -0,0 +1,326 @@
+# system/routes.py - Health/status, metrics, uploads serving and debug endpoints
+import mimetypes
+import os
+import time
+
+import mysql.connector
+from flask import Blueprint, abort, current_app, jsonify, send_from_directory
+
+import metrics
+from config import env_int
+from db import DB_CONFIG, db_breaker, get_db, note_written_deals, replica_status, unit_of_work
+from locations.pincodes import get_index as get_pincode_index
+from system import table_stats
+
+bp = Blueprint('system', __name__)
+
+# Seconds the readiness probe may take to connect, and again to run SELECT 1
+HEALTH_TIMEOUT = max(1, env_int('HEALTH_TIMEOUT', 2))
+
+_started_at = time.time()
+
+
+@bp.route('/', methods=['GET'])
+def home():
+    return jsonify({
+        'message': 'Land Deals Backend API is running!',
+        'status': 'success',
+        'endpoints': [
+            '/api/login',
+            '/api/deals',
+            '/api/upload'
+        ]
+    })
+
+
+@bp.route('/api/test', methods=['GET'])
+def test():
+    return jsonify({'message': 'API is working correctly!'})
+
+
+@bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Per-process counters and timers (compression ratios, CPU time, ...)"""
+    return jsonify(metrics.snapshot())
+
+
+@bp.route('/api/health/live', methods=['GET'])
+def health_live():
+    """Liveness: the process is up and serving requests. Never touches the database."""
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - _started_at, 1)
+    })
+
+
+@bp.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness: a fresh connection to the primary answers SELECT 1 in time.
+
+    The probe connects on its own, bypassing the pool, the connect retries and
+    the breaker, so a slow primary fails it within HEALTH_TIMEOUT instead of
+    the retry/backoff budget, and the probe doesn't count towards tripping the
+    breaker that request traffic relies on.
+    """
+    started = time.perf_counter()
+    try:
+        connection = mysql.connector.connect(**dict(DB_CONFIG, connection_timeout=HEALTH_TIMEOUT,
+                                                    read_timeout=HEALTH_TIMEOUT, write_timeout=HEALTH_TIMEOUT))
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        finally:
+            connection.close()
+    except Exception as e:
+        return jsonify({'status': 'unavailable', 'error': str(e), 'breaker': db_breaker.status()}), 503
+    return jsonify({
+        'status': 'ready',
+        'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+        'breaker': db_breaker.status()
+    })
+
+
+@bp.route('/api/status', methods=['GET'])
+def get_status():
+    """Get comprehensive application and database status.
+
+    Table sizes are information_schema estimates from a cached snapshot that
+    is refreshed in the background (see system/table_stats.py); the response
+    says how old it is.
+    """
+    stats = table_stats.get_stats()
+    snapshot = stats['snapshot']
+    database = {
+        'connected': snapshot is not None and stats['error'] is None,
+        'host': DB_CONFIG['host'],
+        'database': snapshot['database'] if snapshot else DB_CONFIG['database'],
+        'version': snapshot['version'] if snapshot else None,
+        'ssl_enabled': 'ssl_ca' in DB_CONFIG,
+        'replicas': replica_status(),
+        'breaker': db_breaker.status()
+    }
+    if snapshot is None:
+        return jsonify({
+            'status': 'error',
+            'database': database,
+            'message': f"Error: {stats['error'] or 'table statistics not available yet'}"
+        }), 503
+
+    return jsonify({
+        'status': 'success',
+        'database': database,
+        'tables': {name: t['row_estimate'] for name, t in snapshot['tables'].items()},
+        'table_details': snapshot['tables'],
+        'stats_refreshed_at': stats['refreshed_at'],
+        'stats_age_seconds': stats['age_seconds'],
+        'stats_stale': stats['stale'],
+        'stats_error': stats['error'],
+        'message': 'Application is running successfully with cloud database connection'
+    })
+
+
+def _postal_api_districts(state_name):
+    import requests  # only this debug endpoint needs it; keep it off the cold-start path
+
+    # Test postal API directly
+    response = requests.get('https://api.postalpincode.in/postoffice/jaipur', timeout=5)
+    if response.status_code == 200:
+        postal_data = response.json()
+        if postal_data and len(postal_data) > 0 and postal_data[0].get('Status') == 'Success':
+            districts = set()
+            for post_office in postal_data[0].get('PostOffice', []):
+                if post_office.get('District'):
+                    districts.add(post_office['District'])
+
+            return jsonify({
+                'state_requested': state_name,
+                'postal_api_working': True,
+                'districts_found': list(districts),
+                'count': len(districts)
+            })
+
+    return jsonify({
+        'state_requested': state_name,
+        'postal_api_working': False,
+        'error': 'Postal API failed'
+    })
+
+
+@bp.route('/api/test-districts/<state_name>', methods=['GET'])
+def test_districts_debug(state_name):
+    """Debug endpoint to test district resolution for a specific state.
+
+    Answered from the bundled pincode index (locations/pincodes.py) instead
+    of the postal API, so it works offline and never blocks a worker - once a
+    complete index is installed. Until then the postal API is asked, as before.
+    """
+    try:
+        index = get_pincode_index()
+        if not index.complete:
+            return _postal_api_districts(state_name)
+        districts = index.districts_in_state(state_name)
+        if districts is None:
+            return jsonify({
+                'state_requested': state_name,
+                'error': 'Unknown state'
+            }), 404
+
+        return jsonify({
+            'state_requested': state_name,
+            'source': 'pincode_index',
+            'districts_found': districts,
+            'count': len(districts)
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+
+@bp.route('/api/add-sample-locations', methods=['POST'])
+def add_sample_locations():
+    """Add sample location data to existing deals for testing"""
+    try:
+        with unit_of_work() as connection:
+            cursor = connection.cursor(dictionary=True)
+        
+            # Get deals that don't have complete location data
+            cursor.execute("SELECT id, state, district FROM deals LIMIT 10")
+            deals = cursor.fetchall()
+        
+            if not deals:
+                return jsonify({'message': 'No deals found in database'})
+        
+            # Sample location data from different states
+            sample_locations = [
+                {'state': 'Maharashtra', 'district': 'Pune'},
+                {'state': 'Maharashtra', 'district': 'Mumbai'},
+                {'state': 'Karnataka', 'district': 'Bangalore'},
+                {'state': 'Tamil Nadu', 'district': 'Chennai'},
+                {'state': 'Gujarat', 'district': 'Ahmedabad'},
+                {'state': 'Maharashtra', 'district': 'Thane'},
+                {'state': 'Karnataka', 'district': 'Mysore'},
+                {'state': 'Tamil Nadu', 'district': 'Coimbatore'},
+                {'state': 'Gujarat', 'district': 'Surat'},
+                {'state': 'Maharashtra', 'district': 'Nashik'}
+            ]
+        
+            updated_count = 0
+            for i, deal in enumerate(deals):
+                if i < len(sample_locations):
+                    location = sample_locations[i]
+                    # Update all deals with location data regardless of current values
+                    cursor.execute(
+                        "UPDATE deals SET state = %s, district = %s WHERE id = %s",
+                        (location['state'], location['district'], deal['id'])
+                    )
+                    note_written_deals(deal['id'])
+                    updated_count += 1
+
+        return jsonify({
+            'message': f'Successfully added location data to {updated_count} deals',
+            'updated_deals': updated_count,
+            'deals_processed': len(deals)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Error adding sample locations: {str(e)}'}), 500
+
+
+@bp.route('/api/test-db', methods=['GET'])
+def test_db():
+    try:
+        connection = get_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        # Check users count
+        cursor.execute("SELECT COUNT(*) as user_count FROM users")
+        user_result = cursor.fetchone()
+        
+        # Check deals count and if any have state data
+        cursor.execute("SELECT COUNT(*) as deal_count FROM deals")
+        deal_result = cursor.fetchone()
+        
+        cursor.execute("SELECT COUNT(*) as deals_with_state FROM deals WHERE state IS NOT NULL AND state != ''")
+        state_result = cursor.fetchone()
+        
+        # Get sample states if any exist
+        cursor.execute("SELECT DISTINCT state FROM deals WHERE state IS NOT NULL AND state != '' LIMIT 5")
+        sample_states = cursor.fetchall()
+        
+        return jsonify({
+            'message': 'Database connection successful!',
+            'users_in_db': user_result['user_count'],
+            'deals_in_db': deal_result['deal_count'],
+            'deals_with_state': state_result['deals_with_state'],
+            'sample_states': [s['state'] for s in sample_states]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/uploads/<path:filename>')
+def serve_file(filename):
+    """Serve uploaded files with proper MIME types for browser viewing"""
+    try:
+        # resolve and ensure path is under the uploads directory to prevent traversal
+        requested = os.path.normpath(filename)
+        file_path = os.path.abspath(os.path.join(current_app.config['UPLOAD_FOLDER'], requested))
+        uploads_root = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+        if not file_path.startswith(uploads_root) or not os.path.exists(file_path):
+            print(f"File not found or outside uploads: {file_path}")
+            abort(404)
+        
+        # Get the directory and filename
+        directory = os.path.dirname(file_path)
+        file_name = os.path.basename(file_path)
+        
+        # Determine MIME type
+        mime_type, _ = mimetypes.guess_type(file_path)
+        
+        # Enhanced MIME type detection for common file types
+        file_extension = os.path.splitext(file_name)[1].lower()
+        if mime_type is None:
+            mime_type_mapping = {
+                '.pdf': 'application/pdf',
+                '.jpg': 'image/jpeg',
+                '.jpeg': 'image/jpeg',
+                '.png': 'image/png',
+                '.gif': 'image/gif',
+                '.doc': 'application/msword',
+                '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+                '.txt': 'text/plain',
+            }
+            mime_type = mime_type_mapping.get(file_extension, 'application/octet-stream')
+        
+        print(f"Serving file: {filename}, MIME type: {mime_type}")
+        
+        # Create response with proper headers
+        response = send_from_directory(
+            directory, 
+            file_name, 
+            mimetype=mime_type,
+            as_attachment=False
+        )
+        
+        # Add headers for better browser compatibility
+        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '0'
+        
+        # For PDFs, ensure they open in browser
+        if mime_type == 'application/pdf':
+            response.headers['Content-Disposition'] = 'inline'
+            response.headers['X-Content-Type-Options'] = 'nosniff'
+        
+        # For images, add appropriate headers
+        elif mime_type.startswith('image/'):
+            response.headers['Content-Disposition'] = 'inline'
+        
+        return response
+            
+    except Exception as e:
+        print(f"Error serving file {filename}: {str(e)}")
+        abort(404)
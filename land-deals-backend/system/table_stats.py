@@ -0,0 +1,117 @@
+# system/table_stats.py - Cached table statistics for GET /api/status
+#
+# Row counts come from information_schema.TABLES estimates instead of
+# SELECT COUNT(*) per table (a full index scan on InnoDB). The snapshot is
+# refreshed in a background thread once it is older than
+# STATUS_REFRESH_SECONDS, so requests are answered from memory: only the very
+# first call in a process waits for the query.
+import threading
+import time
+from datetime import datetime, timezone
+
+import mysql.connector
+
+import metrics
+from config import env_int
+from db import get_db_connection
+
+STATUS_REFRESH_SECONDS = env_int('STATUS_REFRESH_SECONDS', 60)
+
+_lock = threading.Lock()
+_snapshot = None          # dict built by _collect()
+_refreshed_at = None      # time.time() of the last successful refresh
+_last_error = None
+_refreshing = False
+
+
+def _collect(conn):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try:
+            # MySQL 8 caches the TABLES statistics for a day by default
+            cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+        except mysql.connector.Error:
+            pass  # older servers / MariaDB read them live anyway
+        cursor.execute("SELECT VERSION() AS version, DATABASE() AS db_name")
+        info = cursor.fetchone()
+        cursor.execute("""
+            SELECT TABLE_NAME AS name, TABLE_ROWS AS row_estimate, DATA_LENGTH AS data_bytes,
+                   INDEX_LENGTH AS index_bytes, UPDATE_TIME AS updated_at
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
+        """)
+        tables = {}
+        for row in cursor.fetchall():
+            tables[row['name']] = {
+                'row_estimate': int(row['row_estimate'] or 0),
+                'data_bytes': int(row['data_bytes'] or 0),
+                'index_bytes': int(row['index_bytes'] or 0),
+                'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None,
+            }
+        return {'version': info['version'], 'database': info['db_name'], 'tables': tables}
+    finally:
+        cursor.close()
+
+
+def refresh():
+    """Query the statistics now; failures keep the previous snapshot."""
+    global _snapshot, _refreshed_at, _last_error, _refreshing
+    started = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        if conn is None:
+            raise RuntimeError('Database connection failed')
+        snapshot = _collect(conn)
+        with _lock:
+            _snapshot = snapshot
+            _refreshed_at = time.time()
+            _last_error = None
+        metrics.observe('status.refresh_seconds', time.perf_counter() - started)
+    except Exception as e:
+        with _lock:
+            _last_error = str(e)
+        metrics.incr('status.refresh_failures')
+    finally:
+        if conn is not None:
+            conn.close()
+        with _lock:
+            _refreshing = False
+
+
+def _refresh_in_background():
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=refresh, name='table-stats-refresh', daemon=True).start()
+
+
+def get_stats():
+    """Latest snapshot plus its age, triggering a refresh when it is due.
+
+    Returns a dict with 'snapshot' (None when no refresh has succeeded yet),
+    'refreshed_at', 'age_seconds', 'stale' and 'error'.
+    """
+    global _refreshing
+    if _snapshot is None:
+        with _lock:
+            first = not _refreshing
+            _refreshing = True
+        if first:
+            refresh()
+    elif time.time() - _refreshed_at >= STATUS_REFRESH_SECONDS:
+        _refresh_in_background()
+
+    with _lock:
+        snapshot, refreshed_at, error = _snapshot, _refreshed_at, _last_error
+    age = round(time.time() - refreshed_at, 1) if refreshed_at else None
+    return {
+        'snapshot': snapshot,
+        'refreshed_at': datetime.fromtimestamp(refreshed_at, timezone.utc).isoformat() if refreshed_at else None,
+        'age_seconds': age,
+        # a missed background refresh (or two) shows up here
+        'stale': age is None or age > 2 * STATUS_REFRESH_SECONDS,
+        'error': error,
+    }
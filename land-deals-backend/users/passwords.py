@@ -0,0 +1,176 @@
+# users/passwords.py - Password hashing and verification off the request threads
+#
+# scrypt/pbkdf2 are deliberately slow (tens to hundreds of ms of CPU each), so
+# running them on the request thread lets a burst of logins starve every other
+# request on the worker. Hashing and verification go to a small process pool
+# instead (per worker process, started on first use). Requests wait at most
+# PASSWORD_HASH_TIMEOUT seconds for their turn; once PASSWORD_HASH_QUEUE
+# jobs are already waiting, new ones are refused with PasswordBusy (503)
+# rather than queueing without bound.
+#
+# A successful login against a plain-text password or a hash made with
+# other settings than PASSWORD_HASH_METHOD returns a fresh hash to store, so
+# old accounts are upgraded as their owners log in.
+#
+# PASSWORD_HASH_WORKERS=0 hashes on the calling thread (development, tests).
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import metrics
+from config import env_int
+
+# Any werkzeug method string: 'scrypt', 'scrypt:32768:8:1', 'pbkdf2:sha256:600000'
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_WORKERS = env_int('PASSWORD_HASH_WORKERS', min(2, os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE = env_int('PASSWORD_HASH_QUEUE', 32)       # jobs allowed to wait for a free process
+PASSWORD_HASH_TIMEOUT = env_int('PASSWORD_HASH_TIMEOUT', 10)   # seconds a request waits for its result
+
+
+class PasswordBusy(Exception):
+    """Hashing capacity exhausted; the caller should answer 503."""
+
+
+# --- run inside the pool processes ---------------------------------------
+
+_method_prefix = {}
+
+
+def _method_of(method):
+    """The 'name:params' prefix werkzeug writes for `method` (defaults filled in)."""
+    prefix = _method_prefix.get(method)
+    if prefix is None:
+        prefix = _method_prefix[method] = generate_password_hash('probe', method=method).split('$', 1)[0]
+    return prefix
+
+
+def looks_hashed(stored):
+    """True for werkzeug/bcrypt style hashes; anything else is a legacy plain-text password."""
+    s = str(stored)
+    return s.startswith('pbkdf2:') or s.startswith('scrypt:') or s.startswith('$2') \
+        or s.startswith('sha1$') or len(s) > 20
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored, password, method):
+    """(ok, new_hash): new_hash is set when the password checked out but the stored form is outdated."""
+    if looks_hashed(stored):
+        try:
+            ok = check_password_hash(stored, password)
+        except Exception:
+            ok = False
+        if ok and str(stored).split('$', 1)[0] != _method_of(method):
+            return True, generate_password_hash(password, method=method)
+        return ok, None
+    # legacy plain text
+    if hmac.compare_digest(str(stored).encode(), password.encode()):
+        return True, generate_password_hash(password, method=method)
+    return False, None
+
+
+# --- request side ----------------------------------------------------------
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_in_flight = 0
+_slots = threading.BoundedSemaphore(max(1, PASSWORD_HASH_WORKERS) + max(0, PASSWORD_HASH_QUEUE))
+
+
+def _get_pool():
+    """This process's pool; a pool inherited through fork() is never reused."""
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn: forking a threaded server process is unsafe
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _release(future=None):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+    _slots.release()
+
+
+def _run(fn, *args):
+    global _in_flight, _pool
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    if not _slots.acquire(blocking=False):
+        metrics.incr('passwords.rejected')
+        raise PasswordBusy('password hashing queue is full')
+    with _lock:
+        _in_flight += 1
+    started = time.perf_counter()
+    try:
+        future = _get_pool().submit(fn, *args)
+    except BaseException:
+        _release()
+        raise
+    # the slot is held until the job is really over: a job that timed out may
+    # still be running in the pool (cancel() only stops it while queued)
+    future.add_done_callback(_release)
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        metrics.incr('passwords.timeouts')
+        raise PasswordBusy('password hashing timed out')
+    except BrokenProcessPool:
+        # a pool process died (e.g. OOM-killed): start a fresh pool next time
+        with _lock:
+            _pool = None
+        raise
+    finally:
+        metrics.observe('passwords.seconds', time.perf_counter() - started)
+
+
+def hash_password(password):
+    """Hash `password` with PASSWORD_HASH_METHOD. Raises PasswordBusy."""
+    return _run(_hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(stored, password):
+    """(ok, new_hash) for a login attempt; store new_hash when it is not None. Raises PasswordBusy."""
+    if not stored:
+        return False, None
+    return _run(_verify, stored, password, PASSWORD_HASH_METHOD)
+
+
+def status():
+    """Gauge for /api/metrics: jobs running or waiting, and the configured limits."""
+    with _lock:
+        in_flight = _in_flight
+    workers = max(0, PASSWORD_HASH_WORKERS)
+    return {
+        'workers': workers,
+        'in_flight': in_flight,
+        'queue_depth': max(0, in_flight - workers),
+        'queue_limit': PASSWORD_HASH_QUEUE,
+        'method': PASSWORD_HASH_METHOD,
+    }
+
+
+def shutdown():
+    """Stop this process's pool (worker exit)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None and _pool_pid == os.getpid():
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+metrics.register_gauge('passwords', status)
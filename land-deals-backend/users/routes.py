@@ -0,0 +1,282 @@
+# users/routes.py - Login, registration and admin user management
+from datetime import datetime, timedelta
+
+import jwt
+import mysql.connector
+from flask import Blueprint, current_app, jsonify, request
+
+import metrics
+from auth import token_required
+from db import get_db, unit_of_work
+from users.passwords import PasswordBusy, hash_password, verify_password
+
+bp = Blueprint('users', __name__)
+
+
+def _busy():
+    response = jsonify({'error': 'Server busy, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+@bp.route('/api/login', methods=['POST'])
+def login():
+    try:
+        data = request.get_json()
+        username = data.get('username')
+        password = data.get('password')
+        
+        if not username or not password:
+            return jsonify({'error': 'Username and password required'}), 400
+        
+        connection = get_db()
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+        user = cursor.fetchone()
+        
+        ok, new_hash = verify_password(user.get('password'), password) if user else (False, None)
+        if ok and new_hash:
+            # legacy plain-text or outdated hash: store the current kind (best effort)
+            try:
+                with unit_of_work():
+                    cursor.execute("UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                                   (new_hash, user['id'], user['password']))
+                metrics.incr('passwords.rehashed')
+            except mysql.connector.Error as e:
+                print(f"Password rehash for user {user['id']} failed: {e}")
+
+        if user and ok:
+            token = jwt.encode({
+                'user_id': user['id'],
+                'username': user['username'],
+                'role': user['role'],
+                'exp': datetime.utcnow() + timedelta(hours=24)
+            }, current_app.config['SECRET_KEY'])
+            
+            return jsonify({
+                'token': token,
+                'user': {
+                    'id': user['id'],
+                    'username': user['username'],
+                    'role': user['role'],
+                    'full_name': user['full_name']
+                }
+            })
+        else:
+            return jsonify({'error': 'Invalid credentials'}), 401
+    
+    except PasswordBusy:
+        return _busy()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/register', methods=['POST'])
+def register():
+    """
+    Temporary registration endpoint for testing purposes
+    """
+    try:
+        data = request.get_json()
+        username = data.get('username')
+        password = data.get('password')
+        full_name = data.get('full_name', username)
+        role = data.get('role', 'user')
+        
+        if not username or not password:
+            return jsonify({'error': 'Username and password required'}), 400
+        
+        with unit_of_work() as connection:
+            cursor = connection.cursor(dictionary=True)
+        
+            # Check if user already exists
+            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+            existing_user = cursor.fetchone()
+        
+            if existing_user:
+                return jsonify({'error': 'Username already exists'}), 400
+        
+            # Create users table if it doesn't exist
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    username VARCHAR(255) UNIQUE NOT NULL,
+                    password VARCHAR(255) NOT NULL,
+                    full_name VARCHAR(255),
+                    role VARCHAR(50) DEFAULT 'user',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                )
+            """)
+        
+            # Insert new user
+            cursor.execute("""
+                INSERT INTO users (username, password, full_name, role)
+                VALUES (%s, %s, %s, %s)
+            """, (username, hash_password(password), full_name, role))
+        
+        return jsonify({
+            'message': 'User created successfully',
+            'user': {
+                'username': username,
+                'full_name': full_name,
+                'role': role
+            }
+        }), 201
+        
+    except PasswordBusy:
+        return _busy()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/admin/users', methods=['GET'])
+@token_required
+def admin_list_users(current_user):
+    # only allow admin role
+    try:
+        if request.user.get('role') != 'admin':
+            return jsonify({'error': 'Forbidden'}), 403
+    except Exception:
+        return jsonify({'error': 'Forbidden'}), 403
+
+    try:
+        conn = get_db()
+        cur = conn.cursor(dictionary=True)
+        cur.execute("SELECT id, username, role, full_name FROM users ORDER BY id")
+        rows = cur.fetchall() or []
+        return jsonify(rows)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/admin/users', methods=['POST'])
+@token_required
+def admin_create_user(current_user):
+    try:
+        if request.user.get('role') != 'admin':
+            return jsonify({'error': 'Forbidden'}), 403
+    except Exception:
+        return jsonify({'error': 'Forbidden'}), 403
+
+    data = request.get_json() or {}
+    username = data.get('username')
+    password = data.get('password')
+    role = data.get('role', 'user')
+    full_name = data.get('full_name', '')
+
+    # sanitize role to known allowed values to avoid DB truncation or invalid enum values
+    try:
+        role = (role or 'user').strip().lower()
+    except Exception:
+        role = 'user'
+    allowed_roles = {'user', 'admin', 'auditor'}
+    if role not in allowed_roles:
+        role = 'user'
+
+    # limit lengths to reasonable sizes to avoid column truncation
+    if isinstance(full_name, str):
+        full_name = full_name.strip()[:255]
+    else:
+        full_name = str(full_name)[:255]
+
+    if not username or not password:
+        return jsonify({'error': 'username and password required'}), 400
+
+    # hash password (in the hashing pool)
+    try:
+        hashed = hash_password(password)
+    except PasswordBusy:
+        return _busy()
+
+    try:
+        with unit_of_work() as conn:
+            cur = conn.cursor()
+            cur.execute('INSERT INTO users (username, password, role, full_name) VALUES (%s, %s, %s, %s)', (username, hashed, role, full_name))
+        return jsonify({'message': 'user created'}), 201
+    except mysql.connector.IntegrityError as e:
+        # duplicate username
+        return jsonify({'error': 'username already exists'}), 400
+    except mysql.connector.DataError as e:
+        # catch truncation / data errors and return helpful message
+        return jsonify({'error': 'Invalid input: data too long or malformed'}), 400
+    except Exception as e:
+        # MySQL sometimes reports truncation as general errors — attempt to surface clearer message
+        msg = str(e)
+        if 'Data truncated for column' in msg or '1265' in msg:
+            return jsonify({'error': 'Invalid input: role or other field truncated'}), 400
+        return jsonify({'error': msg}), 500
+
+
+@bp.route('/api/admin/users/<int:user_id>', methods=['PUT'])
+@token_required
+def admin_update_user(current_user, user_id):
+    try:
+        if request.user.get('role') != 'admin':
+            return jsonify({'error': 'Forbidden'}), 403
+    except Exception:
+        return jsonify({'error': 'Forbidden'}), 403
+
+    data = request.get_json() or {}
+    role = data.get('role')
+    full_name = data.get('full_name')
+    password = data.get('password')
+
+    updates = []
+    params = []
+    if role is not None:
+        # sanitize incoming role
+        try:
+            r = (role or '').strip().lower()
+        except Exception:
+            r = 'user'
+        if r not in {'user', 'admin', 'auditor'}:
+            r = 'user'
+        updates.append('role = %s')
+        params.append(r)
+    if full_name is not None:
+        if isinstance(full_name, str):
+            fn = full_name.strip()[:255]
+        else:
+            fn = str(full_name)[:255]
+        updates.append('full_name = %s')
+        params.append(fn)
+    if password is not None:
+        try:
+            hashed = hash_password(password)
+        except PasswordBusy:
+            return _busy()
+        updates.append('password = %s')
+        params.append(hashed)
+
+    if not updates:
+        return jsonify({'error': 'nothing to update'}), 400
+
+    params.append(user_id)
+    sql = 'UPDATE users SET ' + ', '.join(updates) + ' WHERE id = %s'
+
+    try:
+        with unit_of_work() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, tuple(params))
+        return jsonify({'message': 'user updated'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
+@token_required
+def admin_delete_user(current_user, user_id):
+    try:
+        if request.user.get('role') != 'admin':
+            return jsonify({'error': 'Forbidden'}), 403
+    except Exception:
+        return jsonify({'error': 'Forbidden'}), 403
+
+    try:
+        with unit_of_work() as conn:
+            cur = conn.cursor()
+            cur.execute('DELETE FROM users WHERE id = %s', (user_id,))
+        return jsonify({'message': 'user deleted'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,7 @@
+# wsgi.py - WSGI entry point for production servers
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+from app import app
+
+if __name__ == '__main__':
+    app.run()
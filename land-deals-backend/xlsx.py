@@ -0,0 +1,210 @@
+# xlsx.py - Write-only XLSX workbooks streamed as they are written
+#
+# Usage:
+#     chunks = xlsx.workbook([('Ledger', columns, rows)])
+# where columns is [(title, kind, width), ...] with kind 'text', 'number',
+# 'money' (two decimals) or 'date', and rows is any iterable of value
+# sequences. workbook() yields the bytes of the .xlsx while it consumes the
+# rows, so a response can start before the last row is read and memory stays
+# at one buffered chunk whatever the row count. Each sheet's header row is
+# bold and frozen.
+#
+# The zip is written with data descriptors (no seeking back), the worksheet
+# XML uses inline strings (no shared-strings table to hold in memory) and
+# the workbook parts that list the sheets are written last. Sheets beyond
+# Excel's row limit continue on a "name (2)" sheet.
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+
+from config import env_int
+
+XLSX_COMPRESS_LEVEL = env_int('XLSX_COMPRESS_LEVEL', 6)
+XLSX_CHUNK_BYTES = env_int('XLSX_CHUNK_BYTES', 64 * 1024)   # yielded once this much is buffered
+
+MAX_ROWS = 1048576   # Excel's limit, header included
+
+_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')   # not allowed in XML 1.0
+_SHEET_NAME_ILLEGAL = re.compile(r'[\[\]:*?/\\]')
+_EPOCH = datetime(1899, 12, 30)
+_STYLE = {'text': 0, 'number': 0, 'date': 2, 'money': 3}   # cellXfs index, see _STYLES
+_HEADER_STYLE = 1
+_BATCH_ROWS = 256   # rows handed to the compressor at once
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+_STYLES = f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="{_NS}">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>'''
+
+_ROOT_RELS = f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+
+class _Chunks:
+    """Write-only file collecting what zipfile writes until it is taken."""
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts, self.size = [], 0
+        return data
+
+
+def _column_letters(n):
+    letters = ''
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _text(value):
+    text = str(value)
+    if not text.isprintable():
+        text = _ILLEGAL.sub('', text)
+    return escape(text) if ('&' in text or '<' in text or '>' in text) else text
+
+
+def _formatter(letter, kind):
+    """cell(row number, value) -> XML for column `letter` holding `kind` values."""
+    def text_cell(r, value):
+        return f'<c r="{letter}{r}" t="inlineStr"><is><t xml:space="preserve">{_text(value)}</t></is></c>'
+
+    def date_cell(r, value):
+        if not isinstance(value, (date, datetime)):
+            return text_cell(r, value)
+        if not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        return f'<c r="{letter}{r}" s="{_STYLE[kind]}"><v>{(value - _EPOCH).total_seconds() / 86400:g}</v></c>'
+
+    def number_cell(r, value):
+        if not isinstance(value, (int, float, Decimal)) or isinstance(value, bool):
+            return text_cell(r, value)
+        return f'<c r="{letter}{r}" s="{_STYLE[kind]}"><v>{value}</v></c>'
+
+    return {'date': date_cell, 'number': number_cell, 'money': number_cell}.get(kind, text_cell)
+
+
+def _sheet_name(name, taken):
+    """A valid, unique (case-insensitively) sheet name based on `name`."""
+    base = ' '.join(_SHEET_NAME_ILLEGAL.sub(' ', _ILLEGAL.sub('', str(name or ''))).split()).strip("'")[:31] or 'Sheet'
+    lowered = {t.lower() for t in taken}
+    candidate, n = base, 1
+    while candidate.lower() in lowered:
+        n += 1
+        suffix = f' ({n})'
+        candidate = base[:31 - len(suffix)] + suffix
+    return candidate
+
+
+def _write_sheet(f, out, columns, rows):
+    """Write one worksheet from `rows` into zip entry `f`, yielding buffered output as it goes.
+
+    Returns True when the row limit was reached with rows left over.
+    """
+    letters = [_column_letters(i + 1) for i in range(len(columns))]
+    cols = ''.join(f'<col min="{i + 1}" max="{i + 1}" width="{width}" customWidth="1"/>'
+                   for i, (_, _, width) in enumerate(columns))
+    header = ''.join(f'<c r="{letters[i]}1" t="inlineStr" s="{_HEADER_STYLE}"><is><t>{_text(title)}</t></is></c>'
+                     for i, (title, _, _) in enumerate(columns))
+    f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{_NS}">'
+            '<sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+            '<selection pane="bottomLeft" activeCell="A2" sqref="A2"/></sheetView></sheetViews>'
+            f'{"<cols>" + cols + "</cols>" if cols else ""}<sheetData><row r="1">{header}</row>'.encode('utf-8'))
+    cells = [_formatter(letters[i], kind) for i, (_, kind, _) in enumerate(columns)]
+    batch = []
+    r = 1
+    more = False
+    for row in rows:
+        r += 1
+        batch.append(f'<row r="{r}">' + ''.join(cell(r, v) for cell, v in zip(cells, row) if v is not None and v != '')
+                     + '</row>')
+        if len(batch) == _BATCH_ROWS:
+            f.write(''.join(batch).encode('utf-8'))
+            batch = []
+            if out.size >= XLSX_CHUNK_BYTES:
+                yield out.take()
+        if r == MAX_ROWS:
+            more = True
+            break
+    f.write(''.join(batch).encode('utf-8'))
+    f.write(b'</sheetData></worksheet>')
+    return more
+
+
+def workbook(sheets):
+    """Yield the bytes of an .xlsx with `sheets`: iterable of (name, columns, rows); see the module docstring."""
+    out = _Chunks()
+    zf = zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED, compresslevel=XLSX_COMPRESS_LEVEL)
+    names = []
+    for name, columns, rows in sheets:
+        rows = iter(rows)
+        base, part = name, 1
+        while True:
+            names.append(_sheet_name(name, names))
+            with zf.open(f'xl/worksheets/sheet{len(names)}.xml', 'w') as f:
+                more = yield from _write_sheet(f, out, columns, rows)
+            if not more:
+                break
+            part += 1
+            name = f'{base} ({part})'
+    if not names:   # a workbook needs a sheet
+        names.append('Sheet1')
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as f:
+            yield from _write_sheet(f, out, [], [])
+
+    sheet_entries = ''.join(f'<sheet name={quoteattr(n)} sheetId="{i}" r:id="rId{i}"/>'
+                            for i, n in enumerate(names, 1))
+    zf.writestr('xl/workbook.xml', f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<workbook xmlns="{_NS}" xmlns:r="{_REL_NS}"><sheets>{sheet_entries}</sheets></workbook>')
+    rels = ''.join(f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                   for i in range(1, len(names) + 1))
+    rels += f'<Relationship Id="rId{len(names) + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+    zf.writestr('xl/_rels/workbook.xml.rels', '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>')
+    zf.writestr('xl/styles.xml', _STYLES)
+    zf.writestr('_rels/.rels', _ROOT_RELS)
+    overrides = ''.join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="application/'
+                        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                        for i in range(1, len(names) + 1))
+    zf.writestr('[Content_Types].xml', '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                '<Override PartName="/xl/styles.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+                f'{overrides}</Types>')
+    zf.close()
+    yield out.take()
@@ -1,22 +1,23 @@
 """
 Backup specified tables (CREATE + INSERTs) and add missing columns safely.
 
-Usage: set env vars DB_HOST/DB_PORT/DB_USER/DB_PASS/DB_NAME or ensure .env exists.
+The columns are added by migrations/20250829_payment_category_and_file_name.sql
+through the migration runner (land-deals-backend/migrate); payment_parties.role
+comes from migrations/20250901_add_status_and_pay_to.sql.
+
+Usage: set env vars DB_HOST/DB_PORT/DB_USER/DB_PASSWORD/DB_NAME or ensure .env exists.
 Then run:
     python scripts/migrate_add_columns.py
 """
 import os
 import sys
-import mysql.connector
 from datetime import datetime
 
-DB = {
-    'host': os.environ.get('DB_HOST', 'mysql-3ca7d4a2-romitmeher-d46c.g.aivencloud.com'),
-    'port': int(os.environ.get('DB_PORT', 17231)),
-    'user': os.environ.get('DB_USER', 'avnadmin'),
-    'password': os.environ.get('DB_PASS', os.environ.get('DB_PASSWORD', '')),
-    'database': os.environ.get('DB_NAME', os.environ.get('DB_NAME', 'land_deals_db'))
-}
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'land-deals-backend'))
+
+from config import load_env_file  # noqa: E402
+load_env_file()
+from migrate import runner  # noqa: E402
 
 BACKUP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backups')
 os.makedirs(BACKUP_DIR, exist_ok=True)
@@ -24,14 +25,6 @@ os.makedirs(BACKUP_DIR, exist_ok=True)
 TABLES = ['payments', 'payment_proofs', 'payment_parties']
 
 
-def connect():
-    try:
-        return mysql.connector.connect(host=DB['host'], port=DB['port'], user=DB['user'], password=DB['password'], database=DB['database'])
-    except Exception as e:
-        print('Failed to connect to DB:', e)
-        sys.exit(2)
-
-
 def write_backup_for_table(conn, table):
     cur = conn.cursor()
     # SHOW CREATE
@@ -65,41 +58,6 @@ def write_backup_for_table(conn, table):
     return filename
 
 
-def column_exists(conn, table, col):
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA=%s AND TABLE_NAME=%s AND COLUMN_NAME=%s", (DB['database'], table, col))
-    exists = cur.fetchone()[0] > 0
-    cur.close()
-    return exists
-
-
-def alter_add_columns(conn):
-    cur = conn.cursor()
-    changes = []
-    if not column_exists(conn, 'payments', 'category'):
-        changes.append("ALTER TABLE payments ADD COLUMN category ENUM('buy','sell','docs','other') DEFAULT NULL;")
-    if not column_exists(conn, 'payment_proofs', 'file_name'):
-        changes.append("ALTER TABLE payment_proofs ADD COLUMN file_name VARCHAR(255) AFTER file_path;")
-    if not column_exists(conn, 'payment_parties', 'role'):
-        # role allows 'payer','payee','split' to indicate direction
-        changes.append("ALTER TABLE payment_parties ADD COLUMN role ENUM('payer','payee','split') DEFAULT NULL;")
-    if not changes:
-        print('No schema changes required; columns already present.')
-        return
-    try:
-        for sql in changes:
-            print('Executing:', sql)
-            cur.execute(sql)
-        conn.commit()
-        print('Schema changes applied successfully')
-    except Exception as e:
-        print('Schema change failed:', e)
-        conn.rollback()
-        cur.close()
-        sys.exit(3)
-    cur.close()
-
-
 def describe_table(conn, table):
     cur = conn.cursor()
     cur.execute(f"DESCRIBE `{table}`")
@@ -111,15 +69,19 @@ def describe_table(conn, table):
 
 
 if __name__ == '__main__':
-    print('DB:', DB['host'], DB['port'], DB['database'])
-    conn = connect()
+    conn = runner.connect()
     try:
         # create backups
         for t in TABLES:
             write_backup_for_table(conn, t)
-        # apply alter
-        alter_add_columns(conn)
-        # verify
+    finally:
+        conn.close()
+    # apply alter (migrations/20250829_payment_category_and_file_name.sql)
+    if runner.main(['up', '--only', '20250829_payment_category_and_file_name'] + sys.argv[1:]) != 0:
+        sys.exit(3)
+    # verify
+    conn = runner.connect()
+    try:
         for t in TABLES:
             describe_table(conn, t)
     finally: